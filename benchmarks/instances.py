@@ -0,0 +1,104 @@
+"""
+Fixed-seed puzzle instances of increasing size for the benchmarks.
+
+    board = make_board('towers', 5, seed=0)     # the same board on every run and machine
+    solver = make_solver(board, solver_name='sat')
+
+SIZES lists the sizes benchmarked per puzzle, smallest first. The puzzle generators
+draw from the global random module, so it is seeded right before each board is made.
+"""
+
+import random
+import typing as tp
+from dataclasses import dataclass, field
+from logicpuzzles.towers.towers import TowersBoard
+from logicpuzzles.unruly.unruly import UnrulyBoard
+from logicpuzzles.dominosa.dominosa import DominosaBoard
+from logicpuzzles.flip.flip import FlipBoard
+from logicpuzzles.mines.minesweeper import MineBoard
+from logicpuzzles.mines.minesweeper_solver import MinesweeperSolver
+from logicpuzzles.utils.batch import register_solver, solver_for
+
+
+@dataclass
+class MinesPosition:
+    """
+    A Minesweeper game in progress, with what MinesweeperSolver reads from a
+    Minesweeper game but without its window.
+    """
+    width: int
+    height: int
+    mines: int
+    solution: MineBoard = None
+    revealed: tp.Set[tp.Tuple[int, int]] = field(default_factory=set)
+
+    def __post_init__(self):
+        if self.solution is None:
+            self.solution = MineBoard(self.height, self.width)
+
+    def reveal(self, r: int, c: int):
+        # Flood fill from (r, c) through cells with no adjacent mines, as the game does
+        todo = [(r, c)]
+        while todo:
+            idx = todo.pop()
+            if idx in self.revealed:
+                continue
+            self.revealed.add(idx)
+            if self.solution.f[idx].adjacent_mines == 0:
+                todo.extend((f.r, f.c) for f in self.solution.face_to_faces(idx, include_diagonals=True))
+
+
+register_solver(MinesPosition, MinesweeperSolver)
+
+
+def _mines_position(width: int, height: int, mines: int) -> MinesPosition:
+    # Mines anywhere but around the center, which is then opened
+    pos = MinesPosition(width, height, mines)
+    center = (height // 2, width // 2)
+    opening = {center} | {(f.r, f.c) for f in pos.solution.face_to_faces(center, include_diagonals=True)}
+    cells = [idx for idx in pos.solution.f if idx not in opening]
+    for idx in random.sample(cells, mines):
+        pos.solution.f[idx].is_mine = True
+    for idx, cell in pos.solution.f.items():
+        cell.adjacent_mines = sum(f.is_mine for f in pos.solution.face_to_faces(idx, include_diagonals=True))
+    pos.reveal(*center)
+    return pos
+
+
+# puzzle -> (size -> board), sizes as listed in SIZES
+_GENERATORS: tp.Dict[str, tp.Callable[[tp.Any], tp.Any]] = {
+    'towers': TowersBoard,
+    'unruly': UnrulyBoard,
+    'dominosa': DominosaBoard,
+    'flip': FlipBoard,
+    'mines': lambda size: _mines_position(*size),
+}
+
+SIZES: tp.Dict[str, tp.List[tp.Any]] = {
+    'towers': [4, 5, 6],
+    'unruly': [6, 8, 10, 12],
+    'dominosa': [4, 6, 8],
+    'flip': [5, 7, 9],
+    # width, height, mines: the beginner, intermediate and expert games
+    'mines': [(9, 9, 10), (16, 16, 40), (30, 16, 99)],
+}
+
+PUZZLES = tuple(SIZES)
+
+
+def size_name(size) -> str:
+    if isinstance(size, tuple):
+        return "x".join(map(str, size))
+    return str(size)
+
+
+def make_board(puzzle: str, size, seed: int):
+    """The board of the given puzzle and size generated from seed"""
+    if puzzle not in _GENERATORS:
+        raise ValueError(f"puzzle must be one of {PUZZLES}")
+    random.seed(seed)
+    return _GENERATORS[puzzle](size)
+
+
+def make_solver(board, **solver_kwargs):
+    return solver_for(board)(board, **solver_kwargs)
@@ -0,0 +1,186 @@
+"""
+Benchmarks of every puzzle solver on fixed-seed instances of increasing size.
+
+    python -m benchmarks.run -o results.json                  # every puzzle, size and solver
+    python -m benchmarks.run --puzzles towers flip --solvers sat --seeds 0 1
+    python -m benchmarks.run -o new.json --compare results.json   # exit 1 on regressions
+
+Run from the repository root. For each instance and solver it measures
+    build       constructing the solver and running its build()
+    first       the first solution (or the proof there is none) on the built solver
+    unique      deciding whether the solution is unique: count_solutions(2)
+    enumerate   enumerating up to --max-models models, with the models per second
+Each time is taken --repeat times on a fresh solver and reported as its min and median.
+
+The results are written as JSON: 'meta' (machine, commit, arguments) and one entry
+per instance and solver in 'results'. --compare matches them with an earlier run
+and reports every time that grew by more than --threshold.
+"""
+
+import argparse
+import datetime
+import itertools as it
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+import typing as tp
+from logicpuzzles.utils.smt_utils import SMTConstraintProblem
+from .instances import PUZZLES, SIZES, make_board, make_solver, size_name
+
+SOLVERS = ('z3', 'z3-native', 'sat', 'sat-bundled')
+METRICS = ('build', 'first', 'unique', 'enumerate')
+
+
+def _models(solver: SMTConstraintProblem, num_sols: int) -> list:
+    # Raw models, so every puzzle is timed the same way whatever its solve() decodes
+    solver.ensure_built()
+    return list(SMTConstraintProblem.solve(solver, num_sols))
+
+
+def bench_instance(puzzle: str, size, seed: int, solver_name: str, repeat: int = 3, max_models: int = 100, timeout: int = 60000) -> dict:
+    """Every metric for one instance and solver; see the module docstring"""
+    board = make_board(puzzle, size, seed)
+    kwargs = dict(solver_name=solver_name, timeout=timeout)
+
+    def measure(run=None):
+        # Time run on a freshly built solver, or the build itself if run is None
+        times, out = [], None
+        for _ in range(repeat):
+            t = timeit.default_timer()
+            solver = make_solver(board, **kwargs)
+            solver.ensure_built()
+            if run is not None:
+                t = timeit.default_timer()
+                out = run(solver)
+            times.append(timeit.default_timer() - t)
+            solver.close()
+        return {'min': min(times), 'median': statistics.median(times)}, out, solver
+
+    res = {'puzzle': puzzle, 'size': size_name(size), 'seed': seed, 'solver': solver_name}
+    res['build'], _, _ = measure()
+    res['first'], models, solver = measure(lambda s: _models(s, 1))
+    res['first']['status'] = solver.status.name
+    res['unique'], count, solver = measure(lambda s: s.count_solutions(2))
+    res['unique']['solutions'] = count
+    res['enumerate'], models, solver = measure(lambda s: _models(s, max_models))
+    stats = solver.enum_stats
+    res['enumerate'].update(models=len(models), status=stats.status.name, models_per_sec=stats.models_per_sec)
+    return res
+
+
+def run_suite(
+    puzzles: tp.Sequence[str] = PUZZLES,
+    solvers: tp.Sequence[str] = SOLVERS,
+    seeds: tp.Sequence[int] = (0,),
+    max_size: tp.Optional[int] = None,
+    log: tp.Optional[tp.TextIO] = None,
+    **bench_kwargs,
+) -> tp.List[dict]:
+    """
+    bench_instance over every puzzle, size, seed and solver.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        Only the first max_size sizes of each puzzle.
+    log : file, optional
+        A line per instance is written here as it finishes.
+    **bench_kwargs :
+        Passed to bench_instance.
+    """
+    results = []
+    for puzzle in puzzles:
+        for size, seed, solver_name in it.product(SIZES[puzzle][:max_size], seeds, solvers):
+            res = bench_instance(puzzle, size, seed, solver_name, **bench_kwargs)
+            results.append(res)
+            if log is not None:
+                print(
+                    f"{puzzle:9} {res['size']:9} seed={seed} {solver_name:12}"
+                    + "".join(f" {m}={res[m]['min']:.4f}s" for m in METRICS)
+                    + f" models={res['enumerate']['models']}",
+                    file=log, flush=True,
+                )
+    return results
+
+
+def _commit() -> tp.Optional[str]:
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def compare(results: tp.Sequence[dict], baseline: tp.Sequence[dict], threshold: float = 1.25, floor: float = 0.005) -> tp.List[dict]:
+    """
+    Metrics of results whose min time grew by more than threshold over the matching
+    entry of baseline. Times under floor seconds in both runs are noise and skipped.
+    """
+    def key(r):
+        return r['puzzle'], r['size'], r['seed'], r['solver']
+
+    old = {key(r): r for r in baseline}
+    regressions = []
+    for r in results:
+        if key(r) not in old:
+            continue
+        for m in METRICS:
+            before, after = old[key(r)][m]['min'], r[m]['min']
+            if max(before, after) >= floor and after > threshold * before:
+                regressions.append(dict(zip(('puzzle', 'size', 'seed', 'solver'), key(r)), metric=m, before=before, after=after))
+    return regressions
+
+
+def main(argv: tp.Optional[tp.Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the puzzle solvers on fixed-seed instances")
+    parser.add_argument('--puzzles', nargs='+', choices=PUZZLES, default=list(PUZZLES))
+    parser.add_argument('--solvers', nargs='+', choices=SOLVERS, default=list(SOLVERS))
+    parser.add_argument('--seeds', nargs='+', type=int, default=[0])
+    parser.add_argument('--max-size', type=int, default=None, help="only the first N sizes of each puzzle")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-models', type=int, default=100)
+    parser.add_argument('--timeout', type=int, default=60000, help="solver budget per call in ms")
+    parser.add_argument('-o', '--output', default=None, help="JSON results file, stdout if not given")
+    parser.add_argument('--compare', default=None, help="JSON results of an earlier run")
+    parser.add_argument('--threshold', type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    results = run_suite(
+        args.puzzles, args.solvers, args.seeds, args.max_size, log=sys.stderr,
+        repeat=args.repeat, max_models=args.max_models, timeout=args.timeout,
+    )
+    out = {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    if args.output is None:
+        json.dump(out, sys.stdout, indent=1)
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(out, f, indent=1)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions:
+            print(
+                f"REGRESSION {r['puzzle']} {r['size']} seed={r['seed']} {r['solver']} {r['metric']}: "
+                f"{r['before']:.4f}s -> {r['after']:.4f}s",
+                file=sys.stderr,
+            )
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -78,6 +78,56 @@ class Vertex:
         return "+"
 
 
+@dataclass(frozen=True)
+class BoardSymmetry:
+    """
+    A rotation or reflection of an nR x nC grid: rows and/or columns are reversed,
+    then the grid is transposed if transpose is set (square grids only).
+
+    Positions are also given in doubled coordinates, where vertex (r, c) is at
+    (2r, 2c), face (r, c) at (2r+1, 2c+1) and edges at the midpoints between. Points
+    just outside the grid, like the clues around a Towers board, map the same way.
+    """
+    nR: int
+    nC: int
+    flip_r: bool
+    flip_c: bool
+    transpose: bool
+
+    def point(self, y: int, x: int) -> tuple[int, int]:
+        if self.flip_r:
+            y = 2*self.nR - y
+        if self.flip_c:
+            x = 2*self.nC - x
+        return (x, y) if self.transpose else (y, x)
+
+    def face(self, face_idx: tuple[int, int]) -> tuple[int, int]:
+        r, c = face_idx
+        y, x = self.point(2*r+1, 2*c+1)
+        return (y//2, x//2)
+
+    def vertex(self, vertex_idx: tuple[int, int]) -> tuple[int, int]:
+        r, c = vertex_idx
+        y, x = self.point(2*r, 2*c)
+        return (y//2, x//2)
+
+    def edge(self, edge_idx: tuple[EDir, int, int]) -> tuple[EDir, int, int]:
+        dir, r, c = edge_idx
+        y, x = self.point(2*r+1, 2*c) if dir is EDir.v else self.point(2*r, 2*c+1)
+        # A vertical edge midpoint has an odd row
+        return (EDir.v, y//2, x//2) if y % 2 else (EDir.h, y//2, x//2)
+
+
+def grid_symmetries(nR: int, nC: int) -> tp.List[BoardSymmetry]:
+    """The rotations and reflections of an nR x nC grid, except the identity"""
+    transposes = (False, True) if nR == nC else (False,)
+    return [
+        BoardSymmetry(nR, nC, flip_r, flip_c, transpose)
+        for transpose, flip_r, flip_c in it.product(transposes, (False, True), (False, True))
+        if flip_r or flip_c or transpose
+    ]
+
+
 class Board:
     edge_t: tp.Type[Edge] = Edge
     face_t: tp.Type[Face] = Face
@@ -321,6 +371,10 @@ class Board:
                 for r in range(self.nR - n + 1):
                     yield [self.f[(r+i, c)] for i in range(n)]
 
+    def grid_symmetries(self) -> tp.List[BoardSymmetry]:
+        """The rotations and reflections of the grid, except the identity"""
+        return grid_symmetries(self.nR, self.nC)
+
     def iter_boundary_edges(self) -> tp.Iterator[Edge]:
         """Yields edges that are on the boundary of the board.
         
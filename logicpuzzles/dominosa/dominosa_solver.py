@@ -1,8 +1,11 @@
 from hwtypes import smt_utils as fc
 from ..utils.smt_utils import SMTConstraintProblem
+from ..utils.model_array import ModelLayout
 from ..board import Board, Face, Edge, EDir
 from .dominosa import DominosaBoard
 import itertools as it
+from functools import cached_property
+from ..utils.solve_cache import CacheEntry, canonical_orientation, face_orientation
 
 class DominosaSolver(SMTConstraintProblem, Board):
     class DominosaFace(Face):
@@ -33,9 +36,32 @@ class DominosaSolver(SMTConstraintProblem, Board):
             raise TypeError("board must be an instance of DominosaBoard")
         
         self.input_board = board
+        # Every tiling uses the same number of dominoes, so blocking on the placed
+        # dominoes alone is enough to exclude a solution
+        kwargs.setdefault('block_mode', 'positive')
         SMTConstraintProblem.__init__(self, **kwargs)
         Board.__init__(self, board.nR, board.nC)  # This already creates all faces
 
+    @classmethod
+    def cache_entry(cls, board: DominosaBoard, **kwargs) -> CacheEntry:
+        """Solutions are cached by the numbers on the board"""
+        key, sym = canonical_orientation(
+            board.nR, board.nC, lambda sym: face_orientation(board.f, sym)[0]({idx: f.val for idx, f in board.f.items()})
+        )
+        dirs = {0: EDir.v, 1: EDir.h}
+        inverse = {sym.edge(idx): idx for idx in board.e}
+        order = {idx: i for i, idx in enumerate(board.e)}
+
+        def encode(sol):
+            edges = (sym.edge((dirs[d], r, c)) for r, c, d in sol)
+            return tuple(sorted((r, c, 1 if d == EDir.h else 0) for d, r, c in edges))
+
+        def decode(stored):
+            edges = sorted((inverse[(dirs[d], r, c)] for r, c, d in stored), key=order.get)
+            return [(r, c, 1 if d == EDir.h else 0) for d, r, c in edges]
+
+        return CacheEntry((cls.__name__, key), encode, decode)
+
     def constraint_edge(self):
         """No dominoes can be placed on boundary edges"""
         for edge in self.iter_boundary_edges():
@@ -68,16 +94,35 @@ class DominosaSolver(SMTConstraintProblem, Board):
             if vs1 == vs2:
                 self.add_constraint(~(d1 & d2))
 
-    def solve(self, N: int):
+    def constraint_symmetries(self):
+        """Declare the rotations and reflections of the board that keep every number in place"""
+        for sym in self.grid_symmetries():
+            if all(face.val == self.f[sym.face(fidx)].val for fidx, face in self.f.items()):
+                self.add_symmetry([(edge.var, self.e[sym.edge(eidx)].var) for eidx, edge in self.e.items()])
+
+    def build(self):
         self.constraint_edge()
         self.constraint_one_domino()
         self.constraint_num()
-        
-        for model in super().solve(N):
-            sol = []
-            for (dir, r, c), edge in self.e.items():
-                if model[edge.var.value]:
-                    # Convert to original format where 0=vertical, 1=horizontal
-                    dir_val = 1 if dir == EDir.h else 0
-                    sol.append((r,c,dir_val))
-            yield sol 
\ No newline at end of file
+        self.constraint_symmetries()
+
+    @cached_property
+    def edge_layout(self) -> ModelLayout:
+        return ModelLayout.edges(self)
+
+    def board_from_array(self, placed):
+        sol = []
+        for (dir, r, c), on in zip(self.e, placed.tolist()):
+            if on:
+                # Convert to original format where 0=vertical, 1=horizontal
+                dir_val = 1 if dir == EDir.h else 0
+                sol.append((r,c,dir_val))
+        return sol
+
+    def board_from_model(self, model: dict):
+        return self.board_from_array(self.edge_layout.from_model(model))
+
+    def solve(self, N: int = 1):
+        self.ensure_built()
+        for placed in self.solve_arrays(self.edge_layout, N):
+            yield self.board_from_array(placed) 
\ No newline at end of file
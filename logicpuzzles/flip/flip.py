@@ -15,6 +15,9 @@ In this implementation:
 
 
 from ..utils.smt_utils import SMTConstraintProblem
+from ..utils.model_array import ModelLayout
+from ..board import grid_symmetries
+from ..utils.solve_cache import CacheEntry, canonical_orientation, face_orientation
 import random
 import itertools as it
 import hwtypes.smt_utils as fc
@@ -44,13 +47,33 @@ class FlipBoard:
 
 
 class FlipSolver(SMTConstraintProblem):
-    def __init__(self, board, goal_value=0, verbose=False):
-        super().__init__(verbose=verbose)
+    def __init__(self, board, goal_value=0, **kwargs):
+        super().__init__(**kwargs)
         self.board = board
         self.goal_value = goal_value
 
         # Create the problem variables
         self.vars = [[self.new_var(f"x_{r}_{c}", 0) for c in range(self.board.N)] for r in range(self.board.N)]
+        self.layout = ModelLayout.grid(self.vars)
+
+    @classmethod
+    def cache_entry(cls, board, goal_value=0, **kwargs) -> CacheEntry:
+        N = board.N
+        cells = list(it.product(range(N), range(N)))
+        key, sym = canonical_orientation(
+            N, N, lambda sym: face_orientation(cells, sym)[0]({(r, c): board.board[r][c] for r, c in cells})
+        )
+        encode, decode = face_orientation(cells, sym)
+
+        def to_grid(stored):
+            vals = decode(stored)
+            return [[vals[(r, c)] for c in range(N)] for r in range(N)]
+
+        return CacheEntry(
+            (cls.__name__, goal_value, key),
+            lambda sol: encode({(r, c): sol[r][c] for r, c in cells}),
+            to_grid,
+        )
 
     def constraint_flip(self):
         board_counts = [[self.Bit(v) for v in row] for row in self.board.board]
@@ -61,10 +84,32 @@ class FlipSolver(SMTConstraintProblem):
                     board_counts[r][c] ^= self.vars[r2][c2]
         self.add_constraint(fc.And([board_counts[r][c] == self.goal_value for r, c in it.product(range(self.board.N), range(self.board.N))]))
 
-    def solve(self):
+    def constraint_symmetries(self):
+        # The rotations and reflections of the grid that leave the board unchanged
+        N = self.board.N
+        cells = list(it.product(range(N), range(N)))
+        for sym in grid_symmetries(N, N):
+            if all(self.board.board[r][c] == self.board.board[r2][c2] for (r, c), (r2, c2) in zip(cells, map(sym.face, cells))):
+                self.add_symmetry([(self.vars[r][c], self.vars[r2][c2]) for (r, c), (r2, c2) in zip(cells, map(sym.face, cells))])
+
+    def build(self):
         self.constraint_flip()
-        for model in super().solve():
-            yield [[model[self.vars[r][c].value] for c in range(self.board.N)] for r in range(self.board.N)]
+        self.constraint_symmetries()
+
+    def board_from_model(self, model):
+        return self.layout.from_model(model).tolist()
+
+    def solve(self):
+        self.ensure_built()
+        for grid in self.solve_arrays(self.layout):
+            yield grid.tolist()
+
+    def solve_fewest(self):
+        """The solution with the fewest presses, None if there is none"""
+        self.ensure_built()
+        if self.minimize(self.gen_total([v for row in self.vars for v in row])).value is None:
+            return None
+        return self.board_from_model(self.model())
 
 
 
@@ -5,6 +5,7 @@ from pysmt.logics import BV
 from ..utils.smt_utils import SMTConstraintProblem
 from ..board import Board, Face
 from .minesweeper import MineBoard
+import math
 import typing as tp
 
 class MinesweeperSolver(SMTConstraintProblem, Board):
@@ -12,7 +13,7 @@ class MinesweeperSolver(SMTConstraintProblem, Board):
         def __init__(self, r: int, c: int, solver: 'MinesweeperSolver', is_solved: bool = False, adjacent_mines: int = -1):
             super().__init__(r, c)
             self.is_solved = is_solved
-            self.mine_var = solver.new_var(f"mine_{r}_{c}")  # BitVector for mine/no-mine
+            self.mine_var = solver.new_var(f"mine_{r}_{c}", 0)  # Bit for mine/no-mine
             self.adjacent_mines = adjacent_mines
 
         def __str__(self):
@@ -31,12 +32,12 @@ class MinesweeperSolver(SMTConstraintProblem, Board):
         adjacent_mines = cell.adjacent_mines if is_solved else -1
         return self.face_t(r, c, self, is_solved, adjacent_mines)
 
-    def __init__(self, game: 'Minesweeper', verbose=False):
+    def __init__(self, game: 'Minesweeper', **kwargs):
         self.game_board = game
         # Calculate required bits to store sum of all cells
         max_sum = game.width * game.height
         required_bits = max_sum.bit_length()  # Number of bits needed to represent max_sum
-        SMTConstraintProblem.__init__(self, default_bvlen=required_bits, verbose=verbose)
+        SMTConstraintProblem.__init__(self, default_bvlen=required_bits, **kwargs)
         Board.__init__(self, game.height, game.width)
 
     def constraint_minesweeper(self):
@@ -64,6 +65,11 @@ class MinesweeperSolver(SMTConstraintProblem, Board):
             if cell.is_solved:
                 self.add_constraint(cell.mine_var == 0)
 
+    def build(self):
+        self.constraint_revealed_numbers()
+        self.constraint_total_mines()
+        self.constraint_revealed_safe()
+
     def solve(self) -> tp.Iterator[MineBoard]:
         self.constraint_minesweeper()
         for model in super().solve():
@@ -80,29 +86,64 @@ class MinesweeperSolver(SMTConstraintProblem, Board):
         Yields (row, col), is_mine for each determinable cell."""
         
         # First add all the basic game constraints
-        self.constraint_revealed_numbers()
-        self.constraint_total_mines()
-        self.constraint_revealed_safe()
+        self.ensure_built()
         
-        # Find unsolved cells that have at least one solved neighbor
-        for (r, c), cell in self.f.items():
-            if not cell.is_solved:
-                # Check if this cell has any solved neighbors
-                has_solved_neighbor = any(adj.is_solved and adj.adjacent_mines >= 0 
-                                       for adj in self.face_to_faces((r, c), include_diagonals=True))
-                if has_solved_neighbor:
-                    # Try assuming it's a mine
-                    with self.solve_context():
-                        self.add_constraint(cell.mine_var == 1)
-                        mine_possible = self.is_sat()
-                    
-                    # Try assuming it's safe
-                    with self.solve_context():
-                        self.add_constraint(cell.mine_var == 0)
-                        safe_possible = self.is_sat()
-                    
-                    # If only one possibility is satisfiable, we found a determinable cell
-                    if mine_possible and not safe_possible:
-                        yield (r, c), True
-                    elif safe_possible and not mine_possible:
-                        yield (r, c), False 
\ No newline at end of file
+        # Unsolved cells that have at least one solved neighbor
+        frontier = [
+            cell for (r, c), cell in self.f.items()
+            if not cell.is_solved and any(
+                adj.is_solved and adj.adjacent_mines >= 0
+                for adj in self.face_to_faces((r, c), include_diagonals=True)
+            )
+        ]
+        # A cell is determinable exactly when its mine var is in the backbone
+        fixed = self.backbone([cell.mine_var for cell in frontier])
+        if fixed is None:
+            return
+        for cell in frontier:
+            if cell.mine_var.value in fixed:
+                yield (cell.r, cell.c), bool(fixed[cell.mine_var.value])
+
+    def mine_probabilities(self) -> tp.Dict[tuple[int, int], float]:
+        """Probability that each unrevealed cell is a mine, with every mine layout that
+        agrees with the revealed numbers equally likely."""
+        # Count frontier layouts by their number of mines on a CNF copy of the local
+        # constraints. The rest of the mines are spread over the interior cells, which
+        # only the total mine count constrains, in comb(len(interior), rest) ways.
+        with MinesweeperSolver(self.game_board, solver_name='sat') as counter:
+            return self._mine_probabilities(counter)
+
+    def _mine_probabilities(self, counter: 'MinesweeperSolver') -> tp.Dict[tuple[int, int], float]:
+        # Only the local constraints: build() would also add the total mine count, a
+        # totalizer over the whole board that the interior weights below already cover
+        counter._built = True
+        counter.constraint_revealed_numbers()
+        counter.constraint_revealed_safe()
+        frontier, interior = [], []
+        for (r, c), cell in counter.f.items():
+            if cell.is_solved:
+                continue
+            on_frontier = any(adj.is_solved and adj.adjacent_mines >= 0
+                              for adj in counter.face_to_faces((r, c), include_diagonals=True))
+            (frontier if on_frontier else interior).append(cell)
+        frontier_vars = [cell.mine_var for cell in frontier]
+        mines = self.game_board.mines
+
+        def weight(counts):
+            return sum(n * math.comb(len(interior), mines - k)
+                       for k, n in enumerate(counts) if 0 <= mines - k <= len(interior))
+
+        counts = counter.count_models_by_total(frontier_vars, projection=frontier_vars)
+        total = weight(counts)
+        if total == 0:
+            raise ValueError("No mine layout agrees with the revealed cells")
+        probs = {}
+        for cell in frontier:
+            with_mine = counter.count_models_by_total(frontier_vars, projection=frontier_vars, assumptions=[cell.mine_var])
+            probs[(cell.r, cell.c)] = weight(with_mine) / total
+        if interior:
+            interior_mines = sum(n * math.comb(len(interior), mines - k) * (mines - k)
+                                 for k, n in enumerate(counts) if 0 <= mines - k <= len(interior))
+            for cell in interior:
+                probs[(cell.r, cell.c)] = interior_mines / (total * len(interior))
+        return probs
@@ -18,7 +18,7 @@ Rules:
 
 import random
 import typing as tp
-from ..board import Board, Face, Vertex, Edge
+from ..board import Board, BoardSymmetry, Face, Vertex, Edge
 
 class TowersBoard(Board):
     class face_t(Face):
@@ -123,6 +123,23 @@ class TowersBoard(Board):
     def create_face(self, r: int, c: int) -> face_t:
         return self.face_t(r, c)
 
+    def transformed_clues(self, sym: BoardSymmetry) -> tp.Dict[str, tp.List[int]]:
+        """The clues of the board rotated or reflected by sym"""
+        N = self.N
+        # Clues sit just outside the grid, in BoardSymmetry's doubled coordinates
+        points = {}
+        for i in range(N):
+            points[('T', i)] = (-1, 2*i+1)
+            points[('B', i)] = (2*N+1, 2*i+1)
+            points[('L', i)] = (2*i+1, -1)
+            points[('R', i)] = (2*i+1, 2*N+1)
+        at = {p: clue for clue, p in points.items()}
+        clues = {kind: [None] * N for kind in ("T", "B", "L", "R")}
+        for (kind, i), p in points.items():
+            kind2, i2 = at[sym.point(*p)]
+            clues[kind2][i2] = self.clues[kind][i]
+        return clues
+
     def pretty(self, h_len: int = 8, v_len: int = 4) -> str:
         # Calculate left padding needed for left clues
         left_padding = 3  # Width of left clues + space
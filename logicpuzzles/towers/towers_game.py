@@ -1,7 +1,7 @@
 import pygame
 import typing as tp
 from .towers import TowersBoard
-from .towers_solver import TowersSolver
+from .towers_solver import TowersSession
 
 class TowersGame:
     # Colors
@@ -40,9 +40,12 @@ class TowersGame:
         
         # Game state
         self.board = TowersBoard(N)
+        self.session = TowersSession(self.board)
         self.selected_cell = None
         self.won = False
         self.solving = False
+        # Cells whose entries the last solve had to change
+        self.corrected = set()
         
         # Create button rectangles
         button_x = self.total_size + 15
@@ -88,37 +91,22 @@ class TowersGame:
             value = key - pygame.K_0  # Convert key to number
             if value <= self.N:
                 self.board.f[(row, col)].val = value
+                self.session.set_cell(row, col, value)
+                self.corrected.discard((row, col))
                 self.check_win()
         # Handle backspace/delete to clear cell
         elif key in (pygame.K_BACKSPACE, pygame.K_DELETE):
             self.board.f[(row, col)].val = None
+            self.session.clear_cell(row, col)
+            self.corrected.discard((row, col))
 
     def check_win(self) -> bool:
         """Check if the current board state is a winning state"""
-        # Check if all cells are filled
-        for r in range(self.N):
-            for c in range(self.N):
-                if self.board.f[(r, c)].val is None:
-                    return False
-
-        # Create solver to verify solution
-        solver = TowersSolver(self.board)
-        
-        # Add constraints for current values
-        for r in range(self.N):
-            for c in range(self.N):
-                val = self.board.f[(r, c)].val
-                if val is not None:
-                    solver.add_constraint(solver.f[(r, c)].var == val)
-
-        # If solution exists with current values, it must match current board
-        # (since all cells are filled)
-        try:
-            next(solver.solve())
+        # The session has every cell filled in and a solution matching them
+        if self.session.is_solved():
             self.won = True
             return True
-        except StopIteration:
-            return False
+        return False
 
     def solve_game(self):
         """Use solver to complete the puzzle"""
@@ -127,23 +115,22 @@ class TowersGame:
             
         self.solving = True
         self.error_message = None  # Clear any previous error
-        solver = TowersSolver(self.board)
-        
-        # Add constraints for current values
-        for r in range(self.N):
-            for c in range(self.N):
-                val = self.board.f[(r, c)].val
-                if val is not None:
-                    solver.add_constraint(solver.f[(r, c)].var == val)
-        
-        try:
-            solution = next(solver.solve())
+
+        # The session already holds the current values as assumptions. Wrong entries
+        # are corrected to the nearest solution instead of failing the solve.
+        solution, changed = self.session.nearest_solution()
+        if solution is not None:
             # Copy solution to game board
             for r in range(self.N):
                 for c in range(self.N):
                     self.board.f[(r, c)].val = solution.f[(r, c)].val
+                    self.session.set_cell(r, c, solution.f[(r, c)].val)
+            self.corrected = set(changed)
+            if changed:
+                self.error_message = f"{len(changed)} corrected"
+                self.error_timer = pygame.time.get_ticks()
             self.won = True
-        except StopIteration:
+        else:
             # No solution exists - show error message with timer
             self.error_message = "No solution exists!"
             self.error_timer = pygame.time.get_ticks()
@@ -153,9 +140,11 @@ class TowersGame:
     def restart_game(self):
         """Reset the game with a new random board"""
         self.board = TowersBoard(self.N)
+        self.session = TowersSession(self.board)
         self.selected_cell = None
         self.won = False
         self.solving = False
+        self.corrected = set()
         self.error_message = None  # Clear any error message
 
     def draw_cell(self, row: int, col: int):
@@ -177,7 +166,8 @@ class TowersGame:
         # Draw cell value
         val = self.board.f[(row, col)].val
         if val is not None:
-            text = self.font.render(str(val), True, self.BLACK)
+            color = self.RED if (row, col) in self.corrected else self.BLACK
+            text = self.font.render(str(val), True, color)
             text_rect = text.get_rect(center=(x + self.CELL_SIZE // 2,
                                             y + self.CELL_SIZE // 2))
             self.screen.blit(text, text_rect)
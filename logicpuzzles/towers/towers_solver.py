@@ -1,7 +1,10 @@
 import math
-import itertools as it
 import typing as tp
-from ..utils.smt_utils import SMTConstraintProblem
+from functools import cached_property, reduce
+from ..utils.smt_utils import SMTConstraintProblem, SolveStatus
+from ..utils.model_array import ModelLayout
+from ..utils.int_var import INT_ENCODINGS
+from ..utils.solve_cache import CacheEntry, canonical_orientation, face_orientation
 from ..board import Board, Face
 from .towers import TowersBoard
 
@@ -9,7 +12,10 @@ class TowersSolver(SMTConstraintProblem, Board):
     class TowersFace(Face):
         def __init__(self, r: int, c: int, solver: 'TowersSolver', input_face: tp.Optional[TowersBoard.face_t] = None):
             super().__init__(r, c)
-            self.var = solver.new_var(f"face_{r}_{c}")
+            if solver.int_encoding is None:
+                self.var = solver.new_var(f"face_{r}_{c}")
+            else:
+                self.var = solver.new_int_var(f"face_{r}_{c}", 1, solver.input_board.N, solver.int_encoding)
             # Initialize from input face if provided
             self.is_solved = input_face.is_solved if input_face else False
             self.solved_val = input_face.solved_val if input_face else None
@@ -25,17 +31,30 @@ class TowersSolver(SMTConstraintProblem, Board):
         input_face = self.input_board.f[(r, c)]
         return self.face_t(r, c, self, input_face)
 
-    def __init__(self, board: TowersBoard, verbose=False):
+    # distinct selects the all_different encoding of rows and columns, one of
+    # SMTConstraintProblem.ALL_DIFFERENT_ENCODINGS
+    # int_encoding makes the cells IntVars with that encoding (one of INT_ENCODINGS)
+    # instead of bit-vectors; None keeps bit-vectors
+    def __init__(self, board: TowersBoard, distinct: str = 'auto', int_encoding: tp.Optional[str] = None, **kwargs):
         if not isinstance(board, TowersBoard):
             raise TypeError("board must be an instance of TowersBoard")
-            
+        if distinct not in self.ALL_DIFFERENT_ENCODINGS:
+            raise ValueError(f"distinct must be one of {self.ALL_DIFFERENT_ENCODINGS}")
+        if int_encoding is not None and int_encoding not in INT_ENCODINGS:
+            raise ValueError(f"int_encoding must be one of {INT_ENCODINGS}")
+        self.distinct = distinct
+        self.int_encoding = int_encoding
+
         bvlen = math.ceil(math.log2(board.N)+2)
         self.input_board = board
-        SMTConstraintProblem.__init__(self, default_bvlen=bvlen, verbose=verbose)
+        SMTConstraintProblem.__init__(self, default_bvlen=bvlen, **kwargs)
         Board.__init__(self, board.nR, board.nC)
 
     def constraint_vals(self):
         # Each cell must be between 1 and N
+        if self.int_encoding is not None:
+            # Part of the IntVar domains
+            return
         for face in self.f.values():
             self.add_constraint(face.var >= 1)
             self.add_constraint(face.var <= self.input_board.N)
@@ -43,18 +62,29 @@ class TowersSolver(SMTConstraintProblem, Board):
     def constraint_rows(self):
         # Each row must have unique values
         for faces in self.iter_consecutive_faces(self.nR, 'row'):
-            for f1, f2 in it.combinations(faces, 2):
-                self.add_constraint(f1.var != f2.var)
+            self.all_different([f.var for f in faces], range(1, self.input_board.N + 1), self.distinct)
 
     def constraint_cols(self):
         # Each column must have unique values
         for faces in self.iter_consecutive_faces(self.nC, 'col'):
-            for f1, f2 in it.combinations(faces, 2):
-                self.add_constraint(f1.var != f2.var)
+            self.all_different([f.var for f in faces], range(1, self.input_board.N + 1), self.distinct)
 
     def constraint_clues(self):
         # Given a list of faces, symbolically count the number of visible towers
         def count_visible(faces: tp.List['TowersSolver.TowersFace']):
+            if self.int_encoding is not None:
+                # A tower is visible iff it is taller than every tower before it. The
+                # tallest tower so far is kept as its x >= d literals.
+                N = self.input_board.N
+                max_ge = [self.Bit(0)] * (N + 1)
+                visible = []
+                for face in faces:
+                    visible.append(reduce(
+                        lambda a, b: a & b,
+                        (~max_ge[d] | face.var.ge(d + 1) for d in range(1, N + 1)),
+                    ))
+                    max_ge = [m | face.var.ge(d) for d, m in enumerate(max_ge)]
+                return self.gen_total(visible)
             visible = self.BV(0)
             max_height = self.BV(0)
             for face in faces:
@@ -82,17 +112,163 @@ class TowersSolver(SMTConstraintProblem, Board):
                 visible = count_visible(faces)
                 self.add_constraint(visible == self.input_board.clues[kind][i])
 
-    def solve(self) -> tp.Iterator[TowersBoard]:
+    def constraint_symmetries(self):
+        # The rotations and reflections of the grid that map the clues onto themselves
+        for sym in self.grid_symmetries():
+            if self.input_board.transformed_clues(sym) == self.input_board.clues:
+                self.add_symmetry([(face.var, self.f[sym.face(idx)].var) for idx, face in self.f.items()])
+
+    def build(self):
         self.constraint_vals()
         self.constraint_rows()
         self.constraint_cols()
         self.constraint_clues()
-        for model in super().solve():
-            # Create new board with solution values
-            board = TowersBoard(self.nR, self.input_board.clues)
-            for (r, c), face in self.f.items():
-                val = model[face.var.value]
-                board.f[(r, c)].val = val
-                board.f[(r, c)].is_solved = face.is_solved
-                board.f[(r, c)].solved_val = face.solved_val
-            yield board 
\ No newline at end of file
+        self.constraint_symmetries()
+
+    @classmethod
+    def cache_entry(cls, board: TowersBoard, **kwargs) -> CacheEntry:
+        # The clues decide the solutions
+        def clue_form(sym):
+            clues = board.transformed_clues(sym)
+            return tuple(tuple(clues[kind]) for kind in ("T", "B", "L", "R"))
+
+        key, sym = canonical_orientation(board.N, board.N, clue_form)
+        encode, decode = face_orientation(board.f, sym)
+
+        def to_board(stored) -> TowersBoard:
+            solution = TowersBoard(board.N, board.clues)
+            for idx, val in decode(stored).items():
+                solution.f[idx].val = val
+                solution.f[idx].is_solved = board.f[idx].is_solved
+                solution.f[idx].solved_val = board.f[idx].solved_val
+            return solution
+
+        return CacheEntry(
+            (cls.__name__, key),
+            lambda solution: encode({idx: face.val for idx, face in solution.f.items()}),
+            to_board,
+        )
+
+    @cached_property
+    def face_layout(self) -> ModelLayout:
+        return ModelLayout.faces(self)
+
+    def board_from_array(self, grid) -> TowersBoard:
+        # Create new board with solution values
+        board = TowersBoard(self.nR, self.input_board.clues)
+        vals = grid.tolist()
+        for (r, c), face in self.f.items():
+            board.f[(r, c)].val = vals[r][c]
+            board.f[(r, c)].is_solved = face.is_solved
+            board.f[(r, c)].solved_val = face.solved_val
+        return board
+
+    def board_from_model(self, model: dict) -> TowersBoard:
+        return self.board_from_array(self.face_layout.from_model(model))
+
+    def solve(self) -> tp.Iterator[TowersBoard]:
+        self.ensure_built()
+        for grid in self.solve_arrays(self.face_layout):
+            yield self.board_from_array(grid)
+
+
+class TowersSession:
+    """
+    A solver for one board that is built once and then follows the player's edits.
+
+    The puzzle constraints stay loaded; the filled in cells are passed as assumptions
+    on each check, so an edit costs one incremental solver call instead of a rebuild,
+    and the solver keeps what it learned between edits.
+
+        session = TowersSession(board)
+        session.set_cell(0, 0, 3)
+        session.check()         # SolveStatus.SAT if the entries extend to a solution
+        session.solution()      # a completed TowersBoard, or None
+        session.conflicts()     # cells that can't all be right together
+        session.nearest_solution()  # a solution keeping most entries, and the changed cells
+
+    Parameters
+    ----------
+    board : TowersBoard
+        The board being played. Its filled in cells are taken as the initial entries.
+    **kwargs :
+        Passed to TowersSolver. On 7x7 boards its default z3 backend finds a first
+        solution in under a second, and a check after an edit averages well under a
+        second but can take up to a few seconds. solver_name='sat' is only worth it with
+        python-sat installed: the bundled pure-Python SAT solver takes several seconds
+        for the first solution.
+    """
+
+    def __init__(self, board: TowersBoard, **kwargs):
+        self.solver = TowersSolver(board, **kwargs)
+        self.solver.ensure_built()
+        self.entries: tp.Dict[tp.Tuple[int, int], int] = {}
+        # (r, c, val) -> the Bit for cell (r, c) == val, so terms are built once
+        self._lits: tp.Dict[tp.Tuple[int, int, int], tp.Any] = {}
+        self._status: tp.Optional[SolveStatus] = None
+        self._checked: tp.List[tp.Tuple[int, int]] = []
+        for (r, c), face in board.f.items():
+            if face.val is not None:
+                self.set_cell(r, c, face.val)
+
+    def set_cell(self, r: int, c: int, val: int):
+        if not 1 <= val <= self.solver.input_board.N:
+            raise ValueError(f"Cell values must be between 1 and {self.solver.input_board.N}")
+        if self.entries.get((r, c)) != val:
+            self.entries[(r, c)] = val
+            self._status = None
+
+    def clear_cell(self, r: int, c: int):
+        if self.entries.pop((r, c), None) is not None:
+            self._status = None
+
+    def _lit(self, r: int, c: int, val: int):
+        key = (r, c, val)
+        if key not in self._lits:
+            self._lits[key] = self.solver.f[(r, c)].var == val
+        return self._lits[key]
+
+    def check(self) -> SolveStatus:
+        """Whether the current entries are part of some solution"""
+        if self._status is None:
+            self._checked = list(self.entries)
+            self._status = self.solver.check_assumptions([self._lit(r, c, self.entries[(r, c)]) for r, c in self._checked])
+        return self._status
+
+    def is_solved(self) -> bool:
+        """Whether every cell is filled in and the board is a solution"""
+        N = self.solver.input_board.N
+        return len(self.entries) == N * N and self.check() == SolveStatus.SAT
+
+    def solution(self) -> tp.Optional[TowersBoard]:
+        """A solution that keeps the current entries, None if there is none"""
+        if self.check() != SolveStatus.SAT:
+            return None
+        return self.solver.board_from_model(self.solver.model())
+
+    def conflicts(self) -> tp.List[tp.Tuple[int, int]]:
+        """Cells whose entries together rule out every solution, empty if there are none"""
+        if self.check() != SolveStatus.UNSAT:
+            return []
+        core = self.solver.unsat_core()
+        return [(r, c) for r, c in self._checked if any(self._lit(r, c, self.entries[(r, c)]) is a for a in core)]
+
+    def nearest_solution(self) -> tp.Tuple[tp.Optional[TowersBoard], tp.List[tp.Tuple[int, int]]]:
+        """
+        A solution that keeps as many of the current entries as it can, and the cells
+        whose entries it changes: a minimal set, so keeping any one of them as well
+        rules out every solution. (None, []) if the puzzle has no solution at all.
+        """
+        if self.check() == SolveStatus.SAT:
+            return self.solution(), []
+        cells = list(self.entries)
+        lits = [self._lit(r, c, self.entries[(r, c)]) for r, c in cells]
+        # Start the search from the entries, so the first solutions found keep most of them
+        self.solver.set_phases([(self.solver.f[cell].var, self.entries[cell]) for cell in cells])
+        dropped = self.solver.minimal_correction(lits)
+        # The checks above replaced the one check() remembers
+        self._status = None
+        if dropped is None:
+            return None, []
+        changed = [cell for cell, lit in zip(cells, lits) if any(lit is d for d in dropped)]
+        return self.solver.board_from_model(self.solver.model()), changed
@@ -1,10 +1,14 @@
 from hwtypes import SMTBitVector as SBV
 from hwtypes import SMTBit
+from hwtypes import smt_utils as fc
 import pysmt.shortcuts as smt
 from pysmt.logics import BV
 import itertools as it
 import typing as tp
+from functools import cached_property
 from ..utils.smt_utils import SMTConstraintProblem
+from ..utils.model_array import ModelLayout
+from ..utils.solve_cache import CacheEntry, canonical_orientation, face_orientation
 from ..board import Board, Face
 from .unruly import UnrulyBoard
 
@@ -12,7 +16,7 @@ class UnrulySolver(SMTConstraintProblem, Board):
     class UnrulyFace(Face):
         def __init__(self, r: int, c: int, solver: 'UnrulySolver', initial_val: int | None):
             super().__init__(r, c)
-            self.var = solver.new_var(f"face_{r}_{c}")
+            self.var = solver.new_var(f"face_{r}_{c}", 0)
             self.initial_val = initial_val
 
         def __str__(self):
@@ -28,20 +32,23 @@ class UnrulySolver(SMTConstraintProblem, Board):
         initial_val = self.input_board.f[(r, c)].val
         return self.face_t(r, c, self, initial_val)
 
-    def __init__(self, board: UnrulyBoard, verbose=False):
+    # no_consecutive selects the encoding of the no-three-in-a-row rule:
+    #   'total':  the count over each triple is neither 0 nor 3
+    #   'clause': one clause forbidding all ones and one forbidding all zeros
+    NO_CONSECUTIVE_ENCODINGS = ('total', 'clause')
+
+    def __init__(self, board: UnrulyBoard, no_consecutive: str = 'total', **kwargs):
         if not isinstance(board, UnrulyBoard):
             raise TypeError("board must be an instance of UnrulyBoard")
-            
+        if no_consecutive not in self.NO_CONSECUTIVE_ENCODINGS:
+            raise ValueError(f"no_consecutive must be one of {self.NO_CONSECUTIVE_ENCODINGS}")
+        self.no_consecutive = no_consecutive
+
         bvlen = len(bin(max(board.nR, board.nC)))  # Use max of dimensions for bit vector length
         self.input_board = board  # Store input board for create_face to access
-        SMTConstraintProblem.__init__(self, default_bvlen=bvlen, verbose=verbose)
+        SMTConstraintProblem.__init__(self, default_bvlen=bvlen, **kwargs)
         Board.__init__(self, board.nR, board.nC)
 
-    def constraint_binary(self):
-        # Each cell must be either 0 or 1
-        for face in self.f.values():
-            self.add_constraint((face.var < 2))
-
     def constraint_initial_board(self):
         # Each cell must match initial board where specified
         for face in self.f.values():
@@ -51,7 +58,12 @@ class UnrulySolver(SMTConstraintProblem, Board):
     def constraint_no_consecutive(self):
         # No three consecutive cells can be same color in rows or columns
         for faces in self.iter_consecutive_faces(3, 'both'):
-            total = self.gen_total([face.var for face in faces])
+            vs = [face.var for face in faces]
+            if self.no_consecutive == 'clause':
+                self.add_constraint(fc.Or(vs))  # Not all zeros
+                self.add_constraint(fc.Or([~v for v in vs]))  # Not all ones
+                continue
+            total = self.gen_total(vs)
             self.add_constraint(total != 0)  # Not all zeros
             self.add_constraint(total != 3)  # Not all ones
 
@@ -71,11 +83,35 @@ class UnrulySolver(SMTConstraintProblem, Board):
         self.constraint_initial_board()
         self.constraint_no_consecutive() 
         self.constraint_equal_counts()
-        self.constraint_binary()
 
-    def solve(self) -> tp.Iterator[UnrulyBoard]:
+    def build(self):
         self.constraint_unruly()
-        for model in super().solve():
-            solution = {idx: model[face.var.value] for idx, face in self.f.items()}
-            faces = [[solution[(r, c)] for c in range(self.nC)] for r in range(self.nR)]
-            yield UnrulyBoard(self.nR, faces)
\ No newline at end of file
+
+    @classmethod
+    def cache_entry(cls, board: UnrulyBoard, **kwargs) -> CacheEntry:
+        # The given cells decide the solutions; 2 marks an empty one as in UnrulyBoard
+        given = {idx: 2 if f.val is None else f.val for idx, f in board.f.items()}
+        key, sym = canonical_orientation(board.nR, board.nC, lambda sym: face_orientation(board.f, sym)[0](given))
+        encode, decode = face_orientation(board.f, sym)
+
+        def to_board(stored) -> UnrulyBoard:
+            vals = decode(stored)
+            return UnrulyBoard(board.nR, [[vals[(r, c)] for c in range(board.nC)] for r in range(board.nR)])
+
+        return CacheEntry(
+            (cls.__name__, key),
+            lambda solution: encode({idx: f.val for idx, f in solution.f.items()}),
+            to_board,
+        )
+
+    @cached_property
+    def face_layout(self) -> ModelLayout:
+        return ModelLayout.faces(self)
+
+    def board_from_model(self, model: dict) -> UnrulyBoard:
+        return UnrulyBoard(self.nR, self.face_layout.from_model(model).tolist())
+
+    def solve(self) -> tp.Iterator[UnrulyBoard]:
+        self.ensure_built()
+        for grid in self.solve_arrays(self.face_layout):
+            yield UnrulyBoard(self.nR, grid.tolist())
\ No newline at end of file
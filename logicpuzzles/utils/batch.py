@@ -0,0 +1,181 @@
+"""
+Batch solving of many puzzle instances over a process pool.
+
+    for res in solve_many(boards, workers=8, chunksize=4):
+        print(res.index, res.elapsed, res.solution)
+
+Each worker builds its own solver (and so its own backend and var registry) per board.
+Results stream back as chunks complete; pass ordered=True to get them in input order.
+Closing the iterator (e.g. breaking out of the loop) or setting cancel cancels every
+chunk that has not started yet. Chunks already running finish in the background.
+"""
+
+import concurrent.futures as cf
+import itertools as it
+import multiprocessing as mp
+import os
+import threading
+import timeit
+import traceback
+import typing as tp
+from dataclasses import dataclass
+from .smt_utils import SolveStatus
+
+_solvers = {}
+_defaults_registered = False
+
+
+def register_solver(board_t: type, solver_t: type):
+    """Use solver_t(board, **solver_kwargs) to solve boards of type board_t"""
+    _solvers[board_t] = solver_t
+
+
+def _register_defaults():
+    from ..towers.towers import TowersBoard
+    from ..towers.towers_solver import TowersSolver
+    from ..unruly.unruly import UnrulyBoard
+    from ..unruly.unruly_solver import UnrulySolver
+    from ..dominosa.dominosa import DominosaBoard
+    from ..dominosa.dominosa_solver import DominosaSolver
+    from ..flip.flip import FlipBoard, FlipSolver
+    for board_t, solver_t in (
+        (TowersBoard, TowersSolver),
+        (UnrulyBoard, UnrulySolver),
+        (DominosaBoard, DominosaSolver),
+        (FlipBoard, FlipSolver),
+    ):
+        _solvers.setdefault(board_t, solver_t)
+
+
+def solver_for(board) -> type:
+    global _defaults_registered
+    # Solvers registered before the first lookup take precedence over the defaults
+    if not _defaults_registered:
+        _defaults_registered = True
+        _register_defaults()
+    for t in type(board).__mro__:
+        if t in _solvers:
+            return _solvers[t]
+    raise TypeError(f"No solver registered for {type(board).__name__}")
+
+
+@dataclass
+class BatchResult:
+    index: int
+    # First solution yielded by the puzzle solver, None if there is none
+    solution: tp.Any = None
+    # Wall time spent in the worker building and solving this instance
+    elapsed: float = 0.0
+    # Formatted traceback if solving raised
+    error: tp.Optional[str] = None
+    # Outcome of the solve: UNSAT if the board has no solution, UNKNOWN if the solver
+    # ran out of budget first. None if solving raised.
+    status: tp.Optional[SolveStatus] = None
+
+    @property
+    def solved(self) -> bool:
+        return self.status == SolveStatus.SAT and self.solution is not None
+
+
+def _solve_one(index, board, solver_kwargs) -> BatchResult:
+    t = timeit.default_timer()
+    res = BatchResult(index)
+    try:
+        solver = solver_for(board)(board, **solver_kwargs)
+        with solver:
+            res.solution = next(iter(solver.solve()), None)
+            res.status = solver.status
+    except Exception:
+        res.error = traceback.format_exc()
+    res.elapsed = timeit.default_timer() - t
+    return res
+
+
+def _solve_chunk(chunk, solver_kwargs) -> tp.List[BatchResult]:
+    return [_solve_one(index, board, solver_kwargs) for index, board in chunk]
+
+
+def _chunks(boards, chunksize):
+    items = enumerate(boards)
+    while True:
+        chunk = list(it.islice(items, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def solve_many(
+    boards: tp.Iterable,
+    workers: tp.Optional[int] = None,
+    chunksize: int = 1,
+    ordered: bool = False,
+    solver_kwargs: tp.Optional[dict] = None,
+    cancel: tp.Optional[threading.Event] = None,
+    mp_context: tp.Optional[str] = None,
+) -> tp.Iterator[BatchResult]:
+    """
+    Solve every board, fanning the work out over a process pool.
+
+    Parameters
+    ----------
+    boards : Iterable
+        Puzzle boards. Consumed lazily, so this can be a generator.
+    workers : int, optional
+        Number of worker processes, os.cpu_count() by default. 0 solves in this process.
+    chunksize : int, optional
+        Number of boards sent to a worker at a time.
+    ordered : bool, optional
+        Yield results in input order instead of completion order.
+    solver_kwargs : dict, optional
+        Extra arguments for the puzzle solver (e.g. solver_name).
+    cancel : threading.Event, optional
+        When set, pending chunks are cancelled and iteration stops.
+    mp_context : str, optional
+        multiprocessing start method for the pool.
+
+    Returns
+    -------
+    Iterator[BatchResult]
+        One result per board, as it completes.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    solver_kwargs = solver_kwargs or {}
+    chunks = _chunks(boards, chunksize)
+    if workers == 0:
+        for chunk in chunks:
+            if cancel is not None and cancel.is_set():
+                return
+            yield from _solve_chunk(chunk, solver_kwargs)
+        return
+
+    workers = workers or os.cpu_count()
+    ctx = mp.get_context(mp_context) if mp_context else None
+    pool = cf.ProcessPoolExecutor(workers, mp_context=ctx)
+    pending = set()
+    buffered = {}
+    next_index = 0
+    try:
+        while True:
+            # Keep a couple of chunks queued per worker so they never go idle
+            while len(pending) < 2 * workers:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.add(pool.submit(_solve_chunk, chunk, solver_kwargs))
+            if not pending:
+                return
+            done, pending = cf.wait(pending, timeout=0.1, return_when=cf.FIRST_COMPLETED)
+            if cancel is not None and cancel.is_set():
+                return
+            for f in done:
+                for res in f.result():
+                    if not ordered:
+                        yield res
+                        continue
+                    buffered[res.index] = res
+                    while next_index in buffered:
+                        yield buffered.pop(next_index)
+                        next_index += 1
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
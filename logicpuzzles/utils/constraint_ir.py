@@ -0,0 +1,124 @@
+"""
+Constraint IR for SMTConstraintProblem.
+
+add_constraint only records constraints here; they are lowered to backend terms and
+asserted when the problem is next checked. Nodes are hash-consed: an atom (a Bit) is
+identified by its backend term up to the operand order of its top-level commutative
+operator (see Backend.term_key), and And/Or nodes by their set of children. So a
+constraint added twice, or a != b next to b != a, is asserted once.
+
+The IR is simplified as nodes are created:
+    And/Or      nested nodes are flattened, duplicate children dropped, constants folded
+    Implies     becomes Or(~p, q)
+    Not         double negation and constants fold away
+"""
+
+import typing as tp
+from functools import reduce
+from hwtypes import smt_utils as fc
+
+TRUE = 0
+FALSE = 1
+
+
+class ConstraintIR:
+    """
+    Hash-consed constraint DAG over the terms of one backend.
+
+    Parameters
+    ----------
+    backend : Backend
+        Supplies the Bit type, constant detection and term keys.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        # node id -> (op, payload); op is 'const', 'atom', 'not', 'and' or 'or'
+        self._defs: tp.List[tp.Tuple[str, tp.Any]] = [('const', True), ('const', False)]
+        self._ids: tp.Dict[tp.Tuple, int] = {}
+        self._lowered: tp.Dict[int, tp.Any] = {}
+
+    def __len__(self):
+        return len(self._defs)
+
+    def _intern(self, key, payload) -> int:
+        i = self._ids.get(key)
+        if i is None:
+            i = self._ids[key] = len(self._defs)
+            self._defs.append((key[0], payload))
+        return i
+
+    def node(self, c) -> int:
+        """The node for a Bit or FormulaConstructor"""
+        if isinstance(c, fc.And):
+            return self.and_([self.node(v) for v in c.values])
+        elif isinstance(c, fc.Or):
+            return self.or_([self.node(v) for v in c.values])
+        elif isinstance(c, fc.Implies):
+            return self.or_([self.not_(self.node(c.p)), self.node(c.q)])
+        elif isinstance(c, fc.FormulaConstructor):
+            c = c.to_hwtypes()
+        if not isinstance(c, self.backend.Bit):
+            raise ValueError(f"Invalid constraint type: {type(c)}")
+        const = self.backend.constant(c)
+        if const is not None:
+            return TRUE if const else FALSE
+        return self._intern(('atom', self.backend.term_key(c)), c)
+
+    def not_(self, i: int) -> int:
+        op, payload = self._defs[i]
+        if op == 'const':
+            return FALSE if payload else TRUE
+        if op == 'not':
+            return payload
+        return self._intern(('not', i), i)
+
+    def _nary(self, op: str, ids: tp.Iterable[int], unit: int, zero: int) -> int:
+        children = {}
+        for i in ids:
+            sub_op, payload = self._defs[i]
+            for j in payload if sub_op == op else (i,):
+                if j == zero:
+                    return zero
+                if j != unit:
+                    children[j] = None
+        if not children:
+            return unit
+        if len(children) == 1:
+            return next(iter(children))
+        return self._intern((op, frozenset(children)), tuple(children))
+
+    def and_(self, ids: tp.Iterable[int]) -> int:
+        return self._nary('and', ids, TRUE, FALSE)
+
+    def or_(self, ids: tp.Iterable[int]) -> int:
+        return self._nary('or', ids, FALSE, TRUE)
+
+    def conjuncts(self, i: int) -> tp.Tuple[int, ...]:
+        """The top-level conjuncts of a node, asserted one by one"""
+        op, payload = self._defs[i]
+        if op == 'and':
+            return payload
+        if i == TRUE:
+            return ()
+        return (i,)
+
+    def lower(self, i: int):
+        """The backend Bit for a node"""
+        bit = self._lowered.get(i)
+        if bit is not None:
+            return bit
+        Bit = self.backend.Bit
+        op, payload = self._defs[i]
+        if op == 'const':
+            bit = Bit(payload)
+        elif op == 'atom':
+            bit = payload
+        elif op == 'not':
+            bit = ~self.lower(payload)
+        elif op == 'and':
+            bit = reduce(lambda a, b: a & b, (self.lower(j) for j in payload))
+        else:
+            bit = reduce(lambda a, b: a | b, (self.lower(j) for j in payload))
+        self._lowered[i] = bit
+        return bit
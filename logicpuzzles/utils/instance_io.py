@@ -0,0 +1,162 @@
+"""
+Reading and writing standalone solver instances, for solving problems out of process.
+
+    problem.dump("hard.smt2")                   # any backend
+    problem.dump("hard.cnf", format='dimacs')   # the CNF backend ('sat', 'sat-<name>')
+
+    $ z3 hard.smt2 > hard.out                   # or cvc5, bitwuzla, ...
+    $ kissat hard.cnf > hard.out                # or any DIMACS solver
+
+    model = problem.load_model("hard.out")      # keyed like the models of solve()
+    board = solver.board_from_model(model)
+
+The files are written a command or clause at a time. An smt2 file ends with
+(check-sat) and a (get-value ...) of every var of the problem, so the solver's output
+alone is enough to rebuild the model. A DIMACS file lists its vars as comments
+("c var <name> <literals, LSB first>"). Its model is read back by literal, so load it
+into the dumped problem or one built the same way.
+"""
+
+import re
+import typing as tp
+
+DUMP_FORMATS = ('smt2', 'dimacs')
+
+_SIMPLE_SYMBOL = re.compile(r"[A-Za-z~!@$%^&*_+=<>.?/\-][A-Za-z0-9~!@$%^&*_+=<>.?/\-]*")
+_TOKEN = re.compile(r"\s+|;[^\n]*|\(|\)|\|[^|]*\||\"(?:[^\"]|\"\")*\"|[^\s()|\";]+")
+
+
+def quote_symbol(name: str) -> str:
+    if _SIMPLE_SYMBOL.fullmatch(name):
+        return name
+    return f"|{name}|"
+
+
+def write_smt2_header(out: tp.TextIO, logic=None):
+    out.write("(set-option :produce-models true)\n")
+    out.write(f"(set-logic {logic if logic is not None else 'QF_BV'})\n")
+
+
+def write_smt2_footer(out: tp.TextIO, names: tp.Iterable[str]):
+    out.write("(check-sat)\n")
+    names = list(names)
+    if names:
+        out.write("(get-value (")
+        out.write(" ".join(map(quote_symbol, names)))
+        out.write("))\n")
+    out.write("(exit)\n")
+
+
+def _parse_sexprs(text: str) -> list:
+    stack = [[]]
+    for m in _TOKEN.finditer(text):
+        tok = m.group()
+        if tok[0].isspace() or tok[0] == ';':
+            continue
+        if tok == '(':
+            stack.append([])
+        elif tok == ')':
+            if len(stack) == 1:
+                raise ValueError("Unbalanced ')' in solver output")
+            done = stack.pop()
+            stack[-1].append(done)
+        else:
+            stack[-1].append(tok[1:-1] if tok[0] == '|' else tok)
+    if len(stack) != 1:
+        raise ValueError("Unbalanced '(' in solver output")
+    return stack[0]
+
+
+def _smt2_value(v) -> tp.Optional[int]:
+    if v == 'true':
+        return 1
+    if v == 'false':
+        return 0
+    if isinstance(v, str):
+        if v.startswith('#b'):
+            return int(v[2:], 2)
+        if v.startswith('#x'):
+            return int(v[2:], 16)
+        if v.isdigit():
+            return int(v)
+    elif len(v) == 3 and v[0] == '_' and isinstance(v[1], str) and v[1].startswith('bv'):
+        return int(v[1][2:])
+    return None
+
+
+def parse_smt2_model(text: str) -> tp.Optional[tp.Dict[str, int]]:
+    """
+    Values by name from an SMT solver's output: the response to get-value and/or
+    get-model. None if the solver answered unsat.
+
+    Raises
+    ------
+    ValueError
+        If the solver answered unknown or the output holds no model.
+    """
+    items = _parse_sexprs(text)
+    statuses = [i for i in items if isinstance(i, str)]
+    if 'unsat' in statuses:
+        return None
+    if 'unknown' in statuses:
+        raise ValueError("The solver answered unknown")
+    if any(isinstance(i, list) and i and i[0] == 'error' for i in items):
+        raise ValueError(f"The solver reported an error: {text.strip()}")
+    values = {}
+
+    def visit(node):
+        if not isinstance(node, list) or not node:
+            return
+        if node[0] == 'define-fun' and len(node) == 5 and node[2] == []:
+            val = _smt2_value(node[4])
+            if val is not None:
+                values[node[1]] = val
+        elif all(isinstance(p, list) and len(p) == 2 and isinstance(p[0], str) for p in node):
+            # A get-value response
+            for name, v in node:
+                val = _smt2_value(v)
+                if val is not None:
+                    values[name] = val
+        else:
+            for child in node:
+                visit(child)
+
+    for item in items:
+        visit(item)
+    if not values and 'sat' not in statuses:
+        raise ValueError("No model found in the solver output")
+    return values
+
+
+def parse_dimacs_model(text: str) -> tp.Optional[tp.List[int]]:
+    """
+    The true literals from a SAT solver's output, in the competition format
+    ("s SATISFIABLE" and "v" lines) or MiniSat's ("SAT" then the literals). None if
+    the solver answered unsatisfiable.
+
+    Raises
+    ------
+    ValueError
+        If the solver gave up or the output holds no model.
+    """
+    lits, status = [], None
+    for line in text.splitlines():
+        words = line.split()
+        if not words or words[0] == 'c':
+            continue
+        if words[0] == 's':
+            status = ' '.join(words[1:])
+            continue
+        if words[0] in ('SAT', 'UNSAT', 'INDET', 'INDETERMINATE', 'UNKNOWN'):
+            status = words[0]
+            continue
+        if words[0] == 'v':
+            words = words[1:]
+        lits.extend(int(w) for w in words if w != '0')
+    if status in ('UNSATISFIABLE', 'UNSAT'):
+        return None
+    if status in ('UNKNOWN', 'INDET', 'INDETERMINATE'):
+        raise ValueError("The solver gave up")
+    if not lits and status not in ('SATISFIABLE', 'SAT'):
+        raise ValueError("No model found in the solver output")
+    return lits
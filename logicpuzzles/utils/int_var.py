@@ -0,0 +1,239 @@
+"""
+Finite-domain integer variables for SMTConstraintProblem.
+
+    x = problem.new_int_var("x", 1, 9, encoding='order')
+    problem.add_constraint(x >= 3)      # a single literal instead of a bit-vector compare
+    problem.add_constraint(x < y)       # y another IntVar, compared value by value
+    for model in problem.solve():
+        model[x.value]                  # the decoded int, as for bit-vector vars
+
+Encodings:
+    'onehot'    a Bit per value, exactly one of them true. x == d is a literal.
+    'order'     a Bit per value above lo meaning x >= d, each implying the one below.
+                x >= d is a literal and x == d a conjunction of two.
+    'log'       a bit-vector holding x - lo, bounded by hi - lo. The most compact
+                encoding, comparisons are bit-vector compares.
+
+Comparisons with ints and other IntVars give Bits. Adding or subtracting an int gives
+a view of the same variable with a shifted domain, and bv() gives a bit-vector for any
+other arithmetic.
+"""
+
+import typing as tp
+from functools import reduce
+
+INT_ENCODINGS = ('onehot', 'order', 'log')
+
+
+def _any(Bit, bits):
+    return reduce(lambda a, b: a | b, bits, Bit(0))
+
+
+class IntVar:
+    """
+    An integer variable with values in [lo, hi].
+
+    Created by SMTConstraintProblem.new_int_var, which also adds the constraints of the
+    encoding. An IntVar is its own model key: value returns self, so model[x.value]
+    works as it does for bit-vector vars.
+
+    Parameters
+    ----------
+    name : str
+        The name of the variable.
+    lo, hi : int
+        The domain bounds, inclusive.
+    encoding : str
+        One of INT_ENCODINGS.
+    bits : Sequence[Bit] or BitVector
+        'onehot': the Bit for each value lo..hi. 'order': the Bit for x >= d for each d
+        in lo+1..hi. 'log': the bit-vector holding x - lo.
+    Bit, BitVector :
+        The types of the backend the bits belong to.
+    """
+
+    def __init__(self, name: str, lo: int, hi: int, encoding: str, bits, Bit, BitVector):
+        if encoding not in INT_ENCODINGS:
+            raise ValueError(f"encoding must be one of {INT_ENCODINGS}")
+        if lo > hi:
+            raise ValueError(f"Empty domain [{lo}, {hi}]")
+        self.name = name
+        self.lo = lo
+        self.hi = hi
+        self.encoding = encoding
+        self.bits = bits
+        self.Bit = Bit
+        self.BitVector = BitVector
+
+    def __repr__(self):
+        return f"IntVar({self.name}, {self.lo}..{self.hi}, {self.encoding})"
+
+    __hash__ = object.__hash__
+
+    @property
+    def value(self) -> 'IntVar':
+        return self
+
+    @property
+    def raws(self) -> tp.List:
+        """The raw vars of the encoding"""
+        if self.encoding == 'log':
+            return [self.bits.value]
+        return [b.value for b in self.bits]
+
+    @property
+    def domain(self) -> range:
+        return range(self.lo, self.hi + 1)
+
+    def _shifted(self, k: int) -> 'IntVar':
+        # The same bits read as x + k
+        return IntVar(self.name, self.lo + k, self.hi + k, self.encoding, self.bits, self.Bit, self.BitVector)
+
+    def _log_const(self, c: int):
+        return self.BitVector[self.bits.size](c - self.lo)
+
+    def eq(self, c: int) -> 'Bit':
+        """x == c"""
+        if c < self.lo or c > self.hi:
+            return self.Bit(0)
+        if self.encoding == 'onehot':
+            return self.bits[c - self.lo]
+        if self.encoding == 'order':
+            return self.ge(c) & ~self.ge(c + 1)
+        return self.bits == self._log_const(c)
+
+    def ge(self, c: int) -> 'Bit':
+        """x >= c"""
+        if c <= self.lo:
+            return self.Bit(1)
+        if c > self.hi:
+            return self.Bit(0)
+        if self.encoding == 'order':
+            return self.bits[c - self.lo - 1]
+        if self.encoding == 'onehot':
+            # Whichever side of c has fewer values
+            if c - self.lo <= self.hi - c + 1:
+                return ~_any(self.Bit, self.bits[:c - self.lo])
+            return _any(self.Bit, self.bits[c - self.lo:])
+        return self.bits >= self._log_const(c)
+
+    def _le_var(self, other: 'IntVar', strict: bool) -> 'Bit':
+        # x <= y (x < y if strict): whenever x >= d, y >= d (d + 1 if strict)
+        k = 1 if strict else 0
+        terms = []
+        for d in self.domain:
+            if d + k <= other.lo:
+                continue
+            t = other.ge(d + k)
+            terms.append(t if d == self.lo else ~self.ge(d) | t)
+        return reduce(lambda a, b: a & b, terms, self.Bit(1))
+
+    def _cmp(self, other, op: str) -> 'Bit':
+        if isinstance(other, int):
+            return {
+                '==': lambda: self.eq(other),
+                '!=': lambda: ~self.eq(other),
+                '>=': lambda: self.ge(other),
+                '>': lambda: self.ge(other + 1),
+                '<=': lambda: ~self.ge(other + 1),
+                '<': lambda: ~self.ge(other),
+            }[op]()
+        if isinstance(other, IntVar):
+            if op == '==':
+                if self.encoding == 'onehot' and other.encoding == 'onehot':
+                    lo, hi = max(self.lo, other.lo), min(self.hi, other.hi)
+                    return _any(self.Bit, [self.eq(d) & other.eq(d) for d in range(lo, hi + 1)])
+                return self._le_var(other, False) & other._le_var(self, False)
+            if op == '!=':
+                return ~self._cmp(other, '==')
+            if op == '<=':
+                return self._le_var(other, False)
+            if op == '<':
+                return self._le_var(other, True)
+            if op == '>=':
+                return other._le_var(self, False)
+            return other._le_var(self, True)
+        if isinstance(other, self.BitVector):
+            a = self.bv(other.size)
+            return {
+                '==': lambda: a == other,
+                '!=': lambda: a != other,
+                '>=': lambda: a >= other,
+                '>': lambda: a > other,
+                '<=': lambda: a <= other,
+                '<': lambda: a < other,
+            }[op]()
+        raise TypeError(f"Can't compare IntVar with {type(other)}")
+
+    def __eq__(self, other):
+        return self._cmp(other, '==')
+
+    def __ne__(self, other):
+        return self._cmp(other, '!=')
+
+    def __lt__(self, other):
+        return self._cmp(other, '<')
+
+    def __le__(self, other):
+        return self._cmp(other, '<=')
+
+    def __gt__(self, other):
+        return self._cmp(other, '>')
+
+    def __ge__(self, other):
+        return self._cmp(other, '>=')
+
+    def __add__(self, other):
+        if isinstance(other, int):
+            return self._shifted(other)
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, int):
+            return self._shifted(-other)
+        return NotImplemented
+
+    def bv(self, width: tp.Optional[int] = None) -> 'BitVector':
+        """
+        The value as an unsigned bit-vector, for arithmetic the IntVar does not cover.
+
+        Parameters
+        ----------
+        width : int, optional
+            Defaults to the fewest bits that hold hi.
+        """
+        if self.lo < 0:
+            raise ValueError("bv() needs a non-negative domain")
+        if width is None:
+            width = max(self.hi.bit_length(), 1)
+        if self.hi >= 1 << width:
+            raise ValueError(f"{self.hi} does not fit in {width} bits")
+        BV = self.BitVector[width]
+        if self.encoding == 'log':
+            return self.bits.zext(width - self.bits.size) + BV(self.lo)
+        # Bit i of the value is set iff x is one of the values with bit i set
+        eqs = [(d, self.eq(d)) for d in self.domain]
+        return BV([_any(self.Bit, [e for d, e in eqs if d >> i & 1]) for i in range(width)])
+
+    def encode(self, c: int) -> tp.Dict:
+        """The values of the raw vars for x == c, the inverse of decode"""
+        if c < self.lo or c > self.hi:
+            raise ValueError(f"{c} is outside [{self.lo}, {self.hi}]")
+        i = c - self.lo
+        if self.encoding == 'onehot':
+            return {b.value: int(k == i) for k, b in enumerate(self.bits)}
+        if self.encoding == 'order':
+            return {b.value: int(k < i) for k, b in enumerate(self.bits)}
+        return {self.bits.value: i}
+
+    def decode(self, model: tp.Mapping) -> int:
+        """The value of the variable in a model keyed by raw vars"""
+        if self.encoding == 'onehot':
+            i = next(i for i, b in enumerate(self.bits) if model[b.value])
+        elif self.encoding == 'order':
+            i = sum(1 for b in self.bits if model[b.value])
+        else:
+            i = model[self.bits.value]
+        return self.lo + i
@@ -0,0 +1,105 @@
+"""
+Models as NumPy arrays laid out like the puzzle, for reading many solutions cheaply.
+
+    layout = ModelLayout.faces(solver)                # face (r, c) -> grid[r, c]
+    for grid in solver.solve_arrays(layout, 0):       # nR x nC int64 arrays
+        ...
+    grid = layout.from_model(model)                   # the same array from a solve() model
+
+solve_arrays reads the values of every var in the layout with one backend call per
+model (see Backend.values_reader) and never builds a dict for the model. IntVars are
+decoded for the whole array at once.
+"""
+
+import numpy as np
+import typing as tp
+from .int_var import IntVar
+
+
+class ModelLayout:
+    """
+    Where the value of each var goes in the arrays made from models.
+
+    Parameters
+    ----------
+    vars : Sequence
+        Bits, bit-vectors or IntVars of one problem, flattened in C order. None
+        entries have no var and get fill.
+    shape : tuple, optional
+        Shape of the arrays, (len(vars),) by default.
+    fill : int, optional
+        The value of the None entries.
+    """
+
+    def __init__(self, vars: tp.Sequence, shape: tp.Optional[tp.Tuple[int, ...]] = None, fill: int = -1):
+        vars = list(vars)
+        self.shape = (len(vars),) if shape is None else tuple(shape)
+        if int(np.prod(self.shape)) != len(vars):
+            raise ValueError(f"{len(vars)} vars do not fit shape {self.shape}")
+        self.fill = fill
+        # The raw vars read from each model
+        index = {}
+
+        def raw_index(raw) -> int:
+            if raw not in index:
+                index[raw] = len(index)
+            return index[raw]
+
+        plain_pos, plain_idx = [], []
+        groups = {}
+        for pos, v in enumerate(vars):
+            if v is None:
+                continue
+            if isinstance(v, IntVar):
+                raws = v.raws
+                group = groups.setdefault((v.encoding, len(raws)), ([], [], []))
+                group[0].append(pos)
+                group[1].append(v.lo)
+                group[2].append([raw_index(r) for r in raws])
+            else:
+                plain_pos.append(pos)
+                plain_idx.append(raw_index(v.value))
+        self.raws = list(index)
+        self._plain_pos = np.array(plain_pos, dtype=np.intp)
+        self._plain_idx = np.array(plain_idx, dtype=np.intp)
+        self._int_groups = [
+            (encoding, np.array(pos, dtype=np.intp), np.array(lo, dtype=np.int64), np.array(idx, dtype=np.intp))
+            for (encoding, _), (pos, lo, idx) in groups.items()
+        ]
+
+    @classmethod
+    def faces(cls, board, attr: str = 'var', fill: int = -1) -> 'ModelLayout':
+        """The face vars (getattr(face, attr)) of a Board as an nR x nC grid"""
+        return cls(
+            [getattr(board.f[(r, c)], attr, None) for r in range(board.nR) for c in range(board.nC)],
+            (board.nR, board.nC), fill,
+        )
+
+    @classmethod
+    def edges(cls, board, attr: str = 'var', fill: int = -1) -> 'ModelLayout':
+        """The edge vars (getattr(edge, attr)) of a Board, in the order of board.e"""
+        return cls([getattr(edge, attr, None) for edge in board.e.values()], fill=fill)
+
+    @classmethod
+    def grid(cls, rows: tp.Sequence[tp.Sequence], fill: int = -1) -> 'ModelLayout':
+        """Vars given as a list of equally long rows"""
+        return cls([v for row in rows for v in row], (len(rows), len(rows[0]) if rows else 0), fill)
+
+    def decode(self, vals: np.ndarray) -> np.ndarray:
+        """The array for the values of self.raws, in that order"""
+        vals = np.asarray(vals, dtype=np.int64)
+        out = np.full(int(np.prod(self.shape)), self.fill, dtype=np.int64)
+        out[self._plain_pos] = vals[self._plain_idx]
+        for encoding, pos, lo, idx in self._int_groups:
+            bits = vals[idx]
+            if encoding == 'onehot':
+                out[pos] = lo + bits.argmax(axis=1)
+            elif encoding == 'order':
+                out[pos] = lo + bits.sum(axis=1)
+            else:
+                out[pos] = lo + bits[:, 0]
+        return out.reshape(self.shape)
+
+    def from_model(self, model: tp.Mapping) -> np.ndarray:
+        """The array for a model keyed by raw vars, as solve() yields them"""
+        return self.decode(np.fromiter((model[r] for r in self.raws), dtype=np.int64, count=len(self.raws)))
@@ -0,0 +1,219 @@
+"""
+Exact projected model counting over CNF.
+
+    counter = ModelCounter(clauses, projection=[1, 2, 3])
+    counter.count()                  # number of assignments to 1, 2, 3 that extend to a model
+    counter.count(assumptions=[-2])  # the same with var 2 false
+
+Counting is DPLL style: unit propagation, then the remaining clauses are split into
+connected components that are counted independently and multiplied. Component counts
+are cached by their clauses, so the same sub-problem reached through different branches
+(or a later call with other assumptions) is only counted once. Only projection vars are
+branched on; a component without any is just checked for satisfiability by a CDCL
+solver (see sat_solver), which makes auxiliary vars (Tseitin gates, counters) count
+once instead of once per assignment.
+
+Counts are polynomials in the number of true tracked vars: coefficient k is the number
+of models with exactly k of them true. Without tracked vars this is a single number.
+"""
+
+import typing as tp
+from .sat_solver import make_sat_solver
+
+Poly = tp.Tuple[int, ...]
+ZERO: Poly = ()
+ONE: Poly = (1,)
+
+
+def _mul(a: Poly, b: Poly) -> Poly:
+    if not a or not b:
+        return ZERO
+    out = [0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                out[i + j] += x * y
+    return tuple(out)
+
+
+def _add(a: Poly, b: Poly) -> Poly:
+    if len(a) < len(b):
+        a, b = b, a
+    return tuple(x + (b[i] if i < len(b) else 0) for i, x in enumerate(a))
+
+
+def _normalize(clause: tp.Iterable[int]) -> tp.Optional[tp.Tuple[int, ...]]:
+    lits = set(clause)
+    if any(-l in lits for l in lits):
+        return None
+    return tuple(sorted(lits))
+
+
+def _propagate(clauses: tp.List[tp.Tuple[int, ...]]):
+    """
+    Unit propagate. Returns the simplified clauses and the implied literals, or None on
+    a conflict.
+    """
+    occurs = {}
+    queue = []
+    for i, c in enumerate(clauses):
+        if len(c) == 1:
+            queue.append(c[0])
+        for l in c:
+            occurs.setdefault(l, []).append(i)
+    if not queue:
+        return clauses, set()
+    assigned = set()
+    satisfied = set()
+    # Number of literals of each clause that are not yet false
+    left = [len(c) for c in clauses]
+    while queue:
+        lit = queue.pop()
+        if lit in assigned:
+            continue
+        if -lit in assigned:
+            return None
+        assigned.add(lit)
+        satisfied.update(occurs.get(lit, ()))
+        for i in occurs.get(-lit, ()):
+            if i in satisfied:
+                continue
+            left[i] -= 1
+            if left[i] == 0:
+                return None
+            if left[i] == 1:
+                for l in clauses[i]:
+                    if -l not in assigned:
+                        queue.append(l)
+                        break
+    simplified = []
+    for i, c in enumerate(clauses):
+        if i in satisfied:
+            continue
+        if left[i] < len(c):
+            c = tuple(l for l in c if -l not in assigned)
+        simplified.append(c)
+    return simplified, assigned
+
+
+def _components(clauses: tp.List[tp.Tuple[int, ...]]) -> tp.List[tp.List[tp.Tuple[int, ...]]]:
+    parent = {}
+
+    def find(v):
+        root = v
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        while v != root:
+            parent[v], v = root, parent[v]
+        return root
+
+    for c in clauses:
+        r = find(abs(c[0]))
+        for l in c[1:]:
+            s = find(abs(l))
+            if s != r:
+                parent[s] = r
+    comps = {}
+    for c in clauses:
+        comps.setdefault(find(abs(c[0])), []).append(c)
+    return list(comps.values())
+
+
+class ModelCounter:
+    """
+    Exact model counter for a fixed clause set, projected onto some of its vars.
+
+    Parameters
+    ----------
+    clauses : Iterable[Sequence[int]]
+        CNF clauses over DIMACS literals.
+    projection : Iterable[int]
+        The vars whose assignments are counted. Vars that appear in no clause still
+        double the count.
+    track : Iterable[int], optional
+        Projection vars whose number of true values the counts are split by.
+    sat_solver : str, optional
+        make_sat_solver name of the solver for the satisfiability checks.
+    """
+
+    def __init__(self, clauses, projection, track=(), sat_solver=None):
+        self.clauses = [c for c in map(_normalize, clauses) if c is not None]
+        self.projection = frozenset(projection)
+        self.track = frozenset(track)
+        if not self.track <= self.projection:
+            raise ValueError("tracked vars must be part of the projection")
+        self.sat_solver = sat_solver
+        self._cache: tp.Dict[tp.Tuple, Poly] = {}
+        self.decisions = 0
+        self.cache_hits = 0
+        self.sat_checks = 0
+
+    def count(self, assumptions: tp.Iterable[int] = ()) -> tp.List[int]:
+        """
+        Count the models with every assumption literal true.
+
+        Returns
+        -------
+        List[int]
+            Entry k is the number of models with exactly k tracked vars true; a single
+            entry when nothing is tracked. Empty if there are no models.
+        """
+        clauses = self.clauses + [(a,) for a in assumptions]
+        return list(self._count(clauses, self.projection))
+
+    def _count(self, clauses, scope) -> Poly:
+        # scope: the projection vars this (sub-)formula is responsible for
+        res = _propagate(clauses)
+        if res is None:
+            return ZERO
+        clauses, assigned = res
+        poly = ONE
+        for l in assigned:
+            if l > 0 and l in self.track and l in scope:
+                poly = (0,) + poly
+        occurring = {abs(l) for c in clauses for l in c}
+        for v in scope:
+            if v in occurring or v in assigned or -v in assigned:
+                continue
+            poly = _mul(poly, (1, 1) if v in self.track else (2,))
+        for comp in _components(clauses):
+            poly = _mul(poly, self._count_component(comp))
+            if not poly:
+                return ZERO
+        return poly
+
+    def _count_component(self, comp) -> Poly:
+        key = tuple(sorted(comp))
+        res = self._cache.get(key)
+        if res is not None:
+            self.cache_hits += 1
+            return res
+        occurrences = {}
+        for c in comp:
+            for l in c:
+                v = abs(l)
+                if v in self.projection:
+                    occurrences[v] = occurrences.get(v, 0) + 1
+        if not occurrences:
+            res = ONE if self._sat(comp) else ZERO
+        else:
+            self.decisions += 1
+            scope = frozenset(occurrences)
+            v = max(occurrences, key=occurrences.get)
+            res = _add(self._count(comp + [(v,)], scope), self._count(comp + [(-v,)], scope))
+        self._cache[key] = res
+        return res
+
+    def _sat(self, clauses) -> bool:
+        # Auxiliary-only components (totalizers, cardinality networks) can be large and
+        # tightly constrained, so they go to a clause learning solver with their vars
+        # renumbered from 1
+        solver = make_sat_solver(self.sat_solver)
+        try:
+            index = {}
+            for c in clauses:
+                solver.add_clause([index.setdefault(abs(l), len(index) + 1) * (1 if l > 0 else -1) for l in c])
+            self.sat_checks += 1
+            return solver.solve()
+        finally:
+            solver.delete()
@@ -0,0 +1,114 @@
+"""
+Build and solve profiling for SMTConstraintProblem.
+
+    profiler = Profiler()
+    solver = TowersSolver(board, profiler=profiler)
+    next(solver.solve())
+    profiler.report()                       # per constraint_* method, flushes and solves
+    profiler.write_chrome_trace("t.json")   # open in chrome://tracing or Perfetto
+
+Spans are recorded for:
+    build   every constraint_* method of the problem: wall time, the number of
+            assertions it added and the DAG size of their terms. A method nested in
+            another is left out of its caller's assertions and self time, so report()
+            counts each constraint and each second of building once.
+    assert  lowering the pending constraints and handing them to the solver
+    check   every solver call
+    solve   every AllSAT run: the EnumStats counters and the solver's statistics
+
+So term building (build), conversion to the solver (assert) and solving (check) can
+be told apart. A profiler can be shared by several problems.
+"""
+
+import json
+import os
+import threading
+import timeit
+import typing as tp
+
+
+class Profiler:
+    """Spans recorded by the problems it is passed to, in seconds since its creation"""
+
+    def __init__(self):
+        self.events: tp.List[dict] = []
+        self._t0 = timeit.default_timer()
+
+    def now(self) -> float:
+        return timeit.default_timer()
+
+    def record(self, name: str, cat: str, start: float, duration: float, **args) -> dict:
+        """Add a finished span; args are mutable until the report is made"""
+        event = {
+            'name': name, 'cat': cat, 'start': start - self._t0, 'duration': duration,
+            'tid': threading.get_ident(), 'args': args,
+        }
+        self.events.append(event)
+        return event
+
+    def clear(self):
+        self.events.clear()
+        self._t0 = timeit.default_timer()
+
+    def report(self) -> dict:
+        """
+        Totals per category.
+
+        Returns
+        -------
+        dict
+            'build': per constraint method, its calls, self time (s) without the
+            constraint methods it calls, and its own assertions and dag_size. 'assert' and 'check': their calls, time and the number of
+            constraints asserted / the outcome counts. 'solve': one entry per AllSAT
+            run with its counters and solver statistics.
+        """
+        build = {}
+        for e in self.events:
+            if e['cat'] != 'build':
+                continue
+            entry = build.setdefault(e['name'], {'calls': 0, 'time': 0.0, 'assertions': 0, 'dag_size': 0})
+            entry['calls'] += 1
+            entry['time'] += e['args'].get('self_time', e['duration'])
+            entry['assertions'] += e['args'].get('assertions', 0)
+            if e['args'].get('dag_size') is None:
+                entry['dag_size'] = None
+            elif entry['dag_size'] is not None:
+                entry['dag_size'] += e['args']['dag_size']
+        asserted = [e for e in self.events if e['cat'] == 'assert']
+        checks = [e for e in self.events if e['cat'] == 'check']
+        outcomes = {}
+        for e in checks:
+            outcomes[e['args'].get('result')] = outcomes.get(e['args'].get('result'), 0) + 1
+        return {
+            'build': build,
+            'assert': {
+                'calls': len(asserted),
+                'time': sum(e['duration'] for e in asserted),
+                'constraints': sum(e['args'].get('constraints', 0) for e in asserted),
+            },
+            'check': {
+                'calls': len(checks),
+                'time': sum(e['duration'] for e in checks),
+                'results': outcomes,
+            },
+            'solve': [dict(e['args'], time=e['duration']) for e in self.events if e['cat'] == 'solve'],
+        }
+
+    def write_chrome_trace(self, path: str):
+        """Write the spans in the Chrome trace event format"""
+        pid = os.getpid()
+        events = [
+            {
+                'name': e['name'],
+                'cat': e['cat'],
+                'ph': 'X',
+                'ts': e['start'] * 1e6,
+                'dur': e['duration'] * 1e6,
+                'pid': pid,
+                'tid': e['tid'],
+                'args': e['args'],
+            }
+            for e in self.events
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
@@ -0,0 +1,879 @@
+"""
+Pure SAT (CNF) backend for SMTConstraintProblem.
+
+Terms are built with a hwtypes-compatible family (CNFBit / CNFBitVector) whose values
+are DIMACS literals (tuples of literals, LSB first, for bit-vectors). Gates are
+structurally hashed and their Tseitin clauses are only emitted once a gate is actually
+used by an asserted clause, so top-level conjunctions and disjunctions become plain
+clauses. Bit-vector arithmetic and comparisons are bit-blasted.
+
+gen_total over Bits returns a Total, whose comparisons with integers are lowered to
+cardinality encodings instead of adders:
+    asserted directly   pairwise at-most-one / sequential counters
+    used as a sub-term  a totalizer with full equivalence on its unary outputs
+
+Literal 1 is reserved for the constant true.
+"""
+
+import hwtypes as ht
+import itertools as it
+import numpy as np
+import time
+import typing as tp
+from .smt_backends import Backend
+from .instance_io import quote_symbol, write_smt2_header, write_smt2_footer
+from .sat_solver import make_sat_solver
+
+TRUE = 1
+FALSE = -1
+
+
+class CNF:
+    """Literal allocator, gate table and clause sink for one SATBackend"""
+
+    def __init__(self, solver):
+        self.solver = solver
+        self.nvars = 1
+        # Every clause given to the solver, kept for model counting
+        self.clauses: tp.List[tp.List[int]] = []
+        # Indices in clauses of the clauses blocking enumerated models
+        self.blocking: tp.Set[int] = set()
+        self.add_clause([TRUE])
+        self._gates = {}
+        # gate var -> definition, for gates whose clauses have not been emitted yet
+        self._pending = {}
+        self._defs = {}
+        self._totalizers = {}
+        # activation literals of the open push levels
+        self.guards: tp.List[int] = []
+
+    def new_var(self) -> int:
+        self.nvars += 1
+        return self.nvars
+
+    # Clause emission
+    def add_clause(self, clause: tp.Sequence[int]):
+        clause = list(clause)
+        self.clauses.append(clause)
+        self.solver.add_clause(clause)
+
+    def define(self, clause: tp.Sequence[int]):
+        """Add a clause that holds at every push level (definitions of aux vars)"""
+        self._use(clause)
+        self.add_clause(clause)
+
+    def require(self, clause: tp.Sequence[int]):
+        """Add a clause that is retracted when the current push level is popped"""
+        self._use(clause)
+        if self.guards:
+            clause = list(clause) + [-self.guards[-1]]
+        self.add_clause(clause)
+
+    def _use(self, lits: tp.Iterable[int]):
+        stack = [abs(l) for l in lits]
+        while stack:
+            v = stack.pop()
+            d = self._pending.pop(v, None)
+            if d is None:
+                continue
+            kind, args = d[0], d[1:]
+            stack.extend(abs(a) for a in args)
+            for clause in self._gate_clauses(v, kind, args):
+                self.add_clause(clause)
+
+    @staticmethod
+    def _gate_clauses(x, kind, args):
+        if kind == 'and':
+            a, b = args
+            return [[-x, a], [-x, b], [x, -a, -b]]
+        elif kind == 'xor':
+            a, b = args
+            return [[-x, a, b], [-x, -a, -b], [x, -a, b], [x, a, -b]]
+        else:  # ite
+            c, t, e = args
+            return [[-c, -t, x], [-c, t, -x], [c, -e, x], [c, e, -x], [-t, -e, x], [t, e, -x]]
+
+    def _gate(self, key) -> int:
+        x = self._gates.get(key)
+        if x is None:
+            x = self._gates[key] = self.new_var()
+            self._pending[x] = key
+            self._defs[x] = key
+        return x
+
+    # Gates with constant folding and structural hashing
+    def AND(self, a: int, b: int) -> int:
+        if a == FALSE or b == FALSE or a == -b:
+            return FALSE
+        if a == TRUE or a == b:
+            return b
+        if b == TRUE:
+            return a
+        return self._gate(('and', min(a, b), max(a, b)))
+
+    def OR(self, a: int, b: int) -> int:
+        return -self.AND(-a, -b)
+
+    def XOR(self, a: int, b: int) -> int:
+        if abs(a) == TRUE:
+            return -b if a == TRUE else b
+        if abs(b) == TRUE:
+            return -a if b == TRUE else a
+        if a == b:
+            return FALSE
+        if a == -b:
+            return TRUE
+        sign = (a < 0) ^ (b < 0)
+        a, b = abs(a), abs(b)
+        x = self._gate(('xor', min(a, b), max(a, b)))
+        return -x if sign else x
+
+    def ITE(self, c: int, t: int, e: int) -> int:
+        if c == TRUE or t == e:
+            return t
+        if c == FALSE:
+            return e
+        if c < 0:
+            c, t, e = -c, e, t
+        if t == TRUE or t == c:
+            return self.OR(c, e)
+        if t == FALSE or t == -c:
+            return self.AND(-c, e)
+        if e == TRUE or e == -c:
+            return self.OR(-c, t)
+        if e == FALSE or e == c:
+            return self.AND(c, t)
+        return self._gate(('ite', c, t, e))
+
+    def conjuncts(self, lit: int) -> tp.List[int]:
+        # Split a literal into the literals of a top-level conjunction
+        out, stack = [], [lit]
+        while stack:
+            l = stack.pop()
+            d = self._defs.get(l) if l > 0 else None
+            if d is not None and d[0] == 'and':
+                stack.extend(d[1:])
+            else:
+                out.append(l)
+        return out
+
+    def disjuncts(self, lit: int) -> tp.List[int]:
+        # Split a literal into the literals of a clause
+        out, stack = [], [lit]
+        while stack:
+            l = stack.pop()
+            d = self._defs.get(-l) if l < 0 else None
+            if d is not None and d[0] == 'and':
+                stack.extend(-a for a in d[1:])
+            else:
+                out.append(l)
+        return out
+
+    # Cardinality
+    def at_most(self, lits: tp.Sequence[int], k: int):
+        n = len(lits)
+        if k >= n:
+            return
+        if k < 0:
+            self.require([])
+        elif k == 0:
+            for l in lits:
+                self.require([-l])
+        elif k == n - 1:
+            self.require([-l for l in lits])
+        elif k == 1 and n <= 6:
+            for a, b in it.combinations(lits, 2):
+                self.require([-a, -b])
+        elif n - k < k:
+            # At least n-k false: a totalizer counting up to n-k is smaller than a counter up to k
+            outs = self.totalizer([-l for l in lits], n - k)
+            self.require([outs[n - k - 1]])
+        else:
+            # Sinz's sequential counter: s[i][j] <- at least j+1 of lits[:i+1] are true
+            s = [[self.new_var() for _ in range(k)] for _ in range(n - 1)]
+            self.require([-lits[0], s[0][0]])
+            for j in range(1, k):
+                self.require([-s[0][j]])
+            for i in range(1, n - 1):
+                self.require([-lits[i], s[i][0]])
+                self.require([-s[i-1][0], s[i][0]])
+                for j in range(1, k):
+                    self.require([-lits[i], -s[i-1][j-1], s[i][j]])
+                    self.require([-s[i-1][j], s[i][j]])
+                self.require([-lits[i], -s[i-1][k-1]])
+            self.require([-lits[n-1], -s[n-2][k-1]])
+
+    def at_least(self, lits: tp.Sequence[int], k: int):
+        self.at_most([-l for l in lits], len(lits) - k)
+
+    def totalizer(self, lits: tp.Sequence[int], limit: tp.Optional[int] = None) -> tp.List[int]:
+        """
+        Unary outputs o where o[j-1] <-> (at least j of lits are true), for j up to
+        limit (all of them by default). Limiting the count keeps it O(n * limit).
+        """
+        m = len(lits) if limit is None else min(limit, len(lits))
+        key = (tuple(lits), m)
+        if key in self._totalizers:
+            return self._totalizers[key]
+        if len(lits) == 1:
+            outs = list(lits)
+        else:
+            mid = len(lits) // 2
+            a = self.totalizer(lits[:mid], m)
+            b = self.totalizer(lits[mid:], m)
+            outs = [self.new_var() for _ in range(m)]
+            # a[i]/b[j] with index 0 standing for "at least 0" (true). A child can only
+            # be indexed past its end when it was not truncated, where "more than all" is false
+            A = [TRUE] + a + [FALSE]
+            B = [TRUE] + b + [FALSE]
+            R = [TRUE] + outs
+            for i in range(len(a) + 1):
+                for j in range(min(len(b), m - i) + 1):
+                    if i + j > 0:
+                        self._define_const(-A[i], -B[j], R[i+j])
+                    if i + j < m:
+                        self._define_const(A[i+1], B[j+1], -R[i+j+1])
+        self._totalizers[key] = outs
+        return outs
+
+    def _define_const(self, *clause):
+        # define() for clauses that may contain the constants
+        if TRUE not in clause:
+            self.define([l for l in clause if l != FALSE])
+
+    def in_range(self, lits: tp.Sequence[int], lo: int, hi: int) -> int:
+        n = len(lits)
+        outs = [TRUE] + self.totalizer(lits, max(lo, min(hi + 1, n)))
+        return self.AND(outs[max(lo, 0)], -outs[hi + 1] if hi < n else TRUE)
+
+
+def _const_lit(value) -> int:
+    return TRUE if value else FALSE
+
+
+class CNFBit(ht.AbstractBit):
+    cnf: CNF = None
+    _family_ = None
+
+    def __init__(self, value):
+        self._card = None
+        if isinstance(value, CNFBit):
+            self._lit = value.value
+        elif isinstance(value, (bool, int)) and value in (0, 1):
+            self._lit = _const_lit(value)
+        else:
+            raise TypeError(f"Can't coerce {value} to Bit")
+
+    @classmethod
+    def from_lit(cls, lit: int) -> 'CNFBit':
+        obj = cls.__new__(cls)
+        obj._lit = lit
+        obj._card = None
+        return obj
+
+    @classmethod
+    def from_card(cls, lits: tp.Tuple[int, ...], lo: int, hi: int, positive: bool = True) -> 'CNFBit':
+        n = len(lits)
+        if lo > hi or lo > n or hi < 0:
+            return cls.from_lit(_const_lit(not positive))
+        if lo <= 0 and hi >= n:
+            return cls.from_lit(_const_lit(positive))
+        obj = cls.__new__(cls)
+        obj._lit = None
+        obj._card = (lits, lo, hi, positive)
+        return obj
+
+    def get_family(self) -> ht.TypeFamily:
+        return self._family_
+
+    @property
+    def value(self) -> int:
+        if self._lit is None:
+            lits, lo, hi, positive = self._card
+            lit = self.cnf.in_range(lits, lo, hi)
+            self._lit = lit if positive else -lit
+        return self._lit
+
+    def __repr__(self):
+        if self._lit is None:
+            return f'{type(self).__name__}(card{self._card})'
+        return f'{type(self).__name__}({self._lit})'
+
+    def _coerce(self, other) -> 'CNFBit':
+        if isinstance(other, CNFBit):
+            return other
+        return type(self)(other)
+
+    def __eq__(self, other):
+        return type(self).from_lit(-self.cnf.XOR(self.value, self._coerce(other).value))
+
+    def __ne__(self, other):
+        return type(self).from_lit(self.cnf.XOR(self.value, self._coerce(other).value))
+
+    def __invert__(self):
+        if self._lit is None:
+            lits, lo, hi, positive = self._card
+            return type(self).from_card(lits, lo, hi, not positive)
+        return type(self).from_lit(-self._lit)
+
+    def __and__(self, other):
+        return type(self).from_lit(self.cnf.AND(self.value, self._coerce(other).value))
+
+    def __or__(self, other):
+        return type(self).from_lit(self.cnf.OR(self.value, self._coerce(other).value))
+
+    def __xor__(self, other):
+        return type(self).from_lit(self.cnf.XOR(self.value, self._coerce(other).value))
+
+    def ite(self, t_branch, f_branch):
+        BV_t = self._family_.BitVector
+        if isinstance(t_branch, BV_t) or isinstance(f_branch, BV_t):
+            T = type(t_branch) if isinstance(t_branch, BV_t) else type(f_branch)
+            t_branch, f_branch = T(t_branch), T(f_branch)
+            if t_branch.size != f_branch.size:
+                raise TypeError('Both branches must have the same size')
+            c = self.value
+            return T.from_bits([self.cnf.ITE(c, t, f) for t, f in zip(t_branch.value, f_branch.value)])
+        t_branch, f_branch = self._coerce(t_branch), self._coerce(f_branch)
+        return type(self).from_lit(self.cnf.ITE(self.value, t_branch.value, f_branch.value))
+
+
+class CNFBitVector(ht.AbstractBitVector):
+    cnf: CNF = None
+    _family_ = None
+
+    def __init__(self, value):
+        n = self.size
+        if isinstance(value, CNFBitVector):
+            bits = value.value
+            bits = bits[:n] + (FALSE,) * (n - len(bits))
+        elif isinstance(value, CNFBit):
+            bits = (value.value,) + (FALSE,) * (n - 1)
+        elif isinstance(value, (list, tuple)) and len(value) == n and all(isinstance(b, CNFBit) for b in value):
+            # Bits, least significant first
+            bits = tuple(b.value for b in value)
+        elif isinstance(value, int):
+            bits = tuple(_const_lit((value >> i) & 1) for i in range(n))
+        elif hasattr(value, '__int__'):
+            bits = tuple(_const_lit((int(value) >> i) & 1) for i in range(n))
+        else:
+            raise TypeError(f"Can't coerce {value} to {type(self)}")
+        self._bits = bits
+
+    @classmethod
+    def from_bits(cls, bits: tp.Sequence[int]) -> 'CNFBitVector':
+        T = cls if cls.is_sized else cls[len(bits)]
+        assert T.size == len(bits)
+        obj = T.__new__(T)
+        obj._bits = tuple(bits)
+        return obj
+
+    def get_family(self) -> ht.TypeFamily:
+        return self._family_
+
+    @property
+    def value(self) -> tp.Tuple[int, ...]:
+        return self._bits
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self._bits})'
+
+    def _coerce(self, other) -> 'CNFBitVector':
+        if isinstance(other, CNFBitVector):
+            if other.size != self.size:
+                raise ht.InconsistentSizeError('Inconsistent size')
+            return other
+        return type(self)(other)
+
+    def _bit(self, lit):
+        return self._family_.Bit.from_lit(lit)
+
+    def _new(self, bits):
+        return type(self).unsized_t.from_bits(bits)
+
+    def make_constant(self, value, size: tp.Optional[int] = None):
+        return type(self).unsized_t[self.size if size is None else size](value)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._new(self._bits[index])
+        return self._bit(self._bits[index])
+
+    def __setitem__(self, index, value):
+        raise NotImplementedError()
+
+    def __len__(self):
+        return self.size
+
+    def concat(self, other):
+        return self._new(self._bits + other.value)
+
+    def bvnot(self):
+        return self._new([-b for b in self._bits])
+
+    def bvand(self, other):
+        other = self._coerce(other)
+        return self._new([self.cnf.AND(a, b) for a, b in zip(self._bits, other.value)])
+
+    def bvor(self, other):
+        other = self._coerce(other)
+        return self._new([self.cnf.OR(a, b) for a, b in zip(self._bits, other.value)])
+
+    def bvxor(self, other):
+        other = self._coerce(other)
+        return self._new([self.cnf.XOR(a, b) for a, b in zip(self._bits, other.value)])
+
+    def _shift(self, other, fill, left):
+        other = self._coerce(other)
+        bits = list(self._bits)
+        n = self.size
+        for i, s in enumerate(other.value):
+            amount = 1 << i
+            if amount >= n:
+                # Any higher set bit shifts everything out
+                shifted = [fill(bits)] * n
+            elif left:
+                shifted = [FALSE] * amount + bits[:n - amount]
+            else:
+                shifted = bits[amount:] + [fill(bits)] * amount
+            bits = [self.cnf.ITE(s, a, b) for a, b in zip(shifted, bits)]
+        return self._new(bits)
+
+    def bvshl(self, other):
+        return self._shift(other, lambda bits: FALSE, True)
+
+    def bvlshr(self, other):
+        return self._shift(other, lambda bits: FALSE, False)
+
+    def bvashr(self, other):
+        return self._shift(other, lambda bits: bits[-1], False)
+
+    def bvrol(self, other):
+        k = int(other) % self.size
+        return self._new(self._bits[-k:] + self._bits[:-k] if k else self._bits)
+
+    def bvror(self, other):
+        k = int(other) % self.size
+        return self._new(self._bits[k:] + self._bits[:k])
+
+    def bvcomp(self, other):
+        return self._new([self.bveq(other).value])
+
+    def bveq(self, other):
+        other = self._coerce(other)
+        res = TRUE
+        for a, b in zip(self._bits, other.value):
+            res = self.cnf.AND(res, -self.cnf.XOR(a, b))
+        return self._bit(res)
+
+    def _ult(self, a_bits, b_bits):
+        # Scan from the LSB: a < b on bits[:i+1] is b_i if the bits differ, else the result below
+        lt = FALSE
+        for a, b in zip(a_bits, b_bits):
+            lt = self.cnf.ITE(self.cnf.XOR(a, b), b, lt)
+        return lt
+
+    def bvult(self, other):
+        other = self._coerce(other)
+        return self._bit(self._ult(self._bits, other.value))
+
+    def bvslt(self, other):
+        other = self._coerce(other)
+        # Flipping the sign bits turns a signed comparison into an unsigned one
+        a = self._bits[:-1] + (-self._bits[-1],)
+        b = other.value[:-1] + (-other.value[-1],)
+        return self._bit(self._ult(a, b))
+
+    def _add(self, a_bits, b_bits, carry):
+        out = []
+        for a, b in zip(a_bits, b_bits):
+            axb = self.cnf.XOR(a, b)
+            out.append(self.cnf.XOR(axb, carry))
+            carry = self.cnf.OR(self.cnf.AND(a, b), self.cnf.AND(axb, carry))
+        return out, carry
+
+    def adc(self, other, carry):
+        other = self._coerce(other)
+        carry = self._family_.Bit(carry) if not isinstance(carry, CNFBit) else carry
+        bits, c = self._add(self._bits, other.value, carry.value)
+        return self._new(bits), self._bit(c)
+
+    def ite(self, t_branch, f_branch):
+        return self.bvne(0).ite(t_branch, f_branch)
+
+    def bvneg(self):
+        return self.bvnot().bvadd(1)
+
+    def bvadd(self, other):
+        other = self._coerce(other)
+        return self._new(self._add(self._bits, other.value, FALSE)[0])
+
+    def bvsub(self, other):
+        other = self._coerce(other)
+        return self._new(self._add(self._bits, [-b for b in other.value], TRUE)[0])
+
+    def bvmul(self, other):
+        other = self._coerce(other)
+        n = self.size
+        acc = [FALSE] * n
+        for i, b in enumerate(other.value):
+            partial = [FALSE] * i + [self.cnf.AND(a, b) for a in self._bits[:n - i]]
+            acc = self._add(acc, partial, FALSE)[0]
+        return self._new(acc)
+
+    def bvudiv(self, other):
+        raise NotImplementedError("Division is not supported by the CNF backend")
+
+    bvurem = bvsdiv = bvsrem = bvudiv
+
+    def repeat(self, n):
+        return self._new(self._bits * int(n))
+
+    def sext(self, ext):
+        return self._new(self._bits + (self._bits[-1],) * int(ext))
+
+    def ext(self, ext):
+        return self.zext(ext)
+
+    def zext(self, ext):
+        return self._new(self._bits + (FALSE,) * int(ext))
+
+    __invert__ = bvnot
+    __and__ = bvand
+    __or__ = bvor
+    __xor__ = bvxor
+
+    __lshift__ = bvshl
+    __rshift__ = bvlshr
+
+    __neg__ = bvneg
+    __add__ = bvadd
+    __sub__ = bvsub
+    __mul__ = bvmul
+    __floordiv__ = bvudiv
+    __mod__ = bvurem
+
+    def bvule(self, other):
+        other = self._coerce(other)
+        return self._bit(-self._ult(other.value, self._bits))
+
+    def bvugt(self, other):
+        other = self._coerce(other)
+        return self._bit(self._ult(other.value, self._bits))
+
+    __eq__ = bveq
+    __ne__ = ht.AbstractBitVector.bvne
+    __ge__ = ht.AbstractBitVector.bvuge
+    __gt__ = bvugt
+    __le__ = bvule
+    __lt__ = bvult
+
+
+class Total:
+    """Sum of Bits, compared against integers with cardinality constraints"""
+
+    def __init__(self, Bit: tp.Type[CNFBit], BitVector, lits: tp.Sequence[int]):
+        self.Bit = Bit
+        self.BitVector = BitVector
+        # Constant inputs only shift the bound
+        self.offset = sum(1 for l in lits if l == TRUE)
+        self.lits = tuple(l for l in lits if abs(l) != TRUE)
+        self.n = self.offset + len(self.lits)
+
+    def _range(self, lo, hi):
+        return self.Bit.from_card(self.lits, lo - self.offset, hi - self.offset)
+
+    @property
+    def bv(self):
+        """The sum as a bit-vector, for anything other than comparing with a constant"""
+        width = max(self.n.bit_length(), 1)
+        BV = self.BitVector[width]
+        return sum((BV(self.Bit.from_lit(l)) for l in self.lits), BV(self.offset))
+
+    def __eq__(self, other):
+        if isinstance(other, int):
+            return self._range(other, other)
+        return self.bv == other
+
+    def __ne__(self, other):
+        return ~(self == other)
+
+    def __le__(self, other):
+        if isinstance(other, int):
+            return self._range(0, other)
+        return self.bv <= other
+
+    def __lt__(self, other):
+        if isinstance(other, int):
+            return self._range(0, other - 1)
+        return self.bv < other
+
+    def __ge__(self, other):
+        if isinstance(other, int):
+            return self._range(other, self.n)
+        return self.bv >= other
+
+    def __gt__(self, other):
+        if isinstance(other, int):
+            return self._range(other + 1, self.n)
+        return self.bv > other
+
+    def __add__(self, other):
+        return self.bv + other
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self.bv - other
+
+
+class SATBackend(Backend):
+    name = 'sat'
+
+    def __init__(self, sat_solver=None, logic=None, timeout=None):
+        self.sat_solver = sat_solver
+        super().__init__(logic=logic, timeout=timeout)
+
+    def reset(self):
+        self.solver = make_sat_solver(self.sat_solver)
+        self.cnf = CNF(self.solver)
+        ns = {'cnf': self.cnf}
+        self.Bit = type('CNFBit', (CNFBit,), ns)
+        self.BitVector = type(CNFBitVector)('CNFBitVector', (CNFBitVector,), ns)
+        self.Bit._family_ = self.BitVector._family_ = ht.TypeFamily(self.Bit, self.BitVector, None, None)
+        self._model = None
+
+    def close(self):
+        if self.solver is not None:
+            self.solver.delete()
+        self.solver = self.cnf = None
+
+    def new_var(self, name, bvlen):
+        if bvlen == 0:
+            return self.Bit.from_lit(self.cnf.new_var())
+        return self.BitVector[bvlen].from_bits([self.cnf.new_var() for _ in range(bvlen)])
+
+    def is_bool(self, var):
+        return isinstance(var, int)
+
+    def constant(self, c):
+        if c._lit is not None and abs(c._lit) == TRUE:
+            return c._lit == TRUE
+        return None
+
+    def term_key(self, c):
+        # Gates are structurally hashed with sorted operands, so literals are canonical
+        return c._lit if c._lit is not None else c._card
+
+    def total(self, vals):
+        if vals and all(isinstance(v, self.Bit) for v in vals):
+            return Total(self.Bit, self.BitVector, [v.value for v in vals])
+        return None
+
+    def add(self, c):
+        if c._lit is None:
+            lits, lo, hi, positive = c._card
+            if positive:
+                self.cnf.at_least(lits, lo)
+                self.cnf.at_most(lits, hi)
+                return
+            elif lo <= 0:
+                self.cnf.at_least(lits, hi + 1)
+                return
+            elif hi >= len(lits):
+                self.cnf.at_most(lits, lo - 1)
+                return
+        for lit in self.cnf.conjuncts(c.value):
+            self.cnf.require(self.cnf.disjuncts(lit))
+
+    def push(self):
+        self.cnf.guards.append(self.cnf.new_var())
+
+    def pop(self):
+        self.cnf.add_clause([-self.cnf.guards.pop()])
+
+    def check(self, timeout=None, conflicts=None, assumptions=()):
+        self._assumptions = list(assumptions)
+        # Gates only get their clauses once used
+        self.cnf._use(self._assumptions)
+        deadline = None if timeout is None else time.monotonic() + timeout / 1000
+        res = self.solver.solve_limited(
+            assumptions=self.cnf.guards + self._assumptions, conflicts=conflicts, deadline=deadline,
+        )
+        if res is None:
+            return None
+        if res:
+            self._model = self._assignment(self.solver.get_model())
+        return bool(res)
+
+    def cnf_clauses(self, assumptions=()):
+        self.cnf._use(assumptions)
+        return self.cnf.clauses + [[g] for g in self.cnf.guards]
+
+    def term_size(self, bits):
+        # Gates and input vars reachable from the literals
+        seen = set()
+        stack = [abs(b.value) for b in bits]
+        while stack:
+            v = stack.pop()
+            if v in seen or v == TRUE:
+                continue
+            seen.add(v)
+            d = self.cnf._defs.get(v)
+            if d is not None:
+                stack.extend(abs(a) for a in d[1:])
+        return len(seen)
+
+    def statistics(self):
+        stats = self.solver.accum_stats() or {}
+        return dict(stats, vars=self.cnf.nvars, clauses=len(self.cnf.clauses))
+
+    def dump(self, out, terms, vars, format):
+        # The clauses were emitted when the terms were added; models blocked by AllSAT
+        # are left out and the open push levels are in force
+        clauses = it.chain(
+            (c for i, c in enumerate(self.cnf.clauses) if i not in self.cnf.blocking),
+            ([g] for g in self.cnf.guards),
+        )
+        if format == 'dimacs':
+            for name, var in vars.items():
+                lits = [var] if isinstance(var, int) else var
+                out.write(f"c var {name} {' '.join(map(str, lits))}\n")
+            nclauses = len(self.cnf.clauses) - len(self.cnf.blocking) + len(self.cnf.guards)
+            out.write(f"p cnf {self.cnf.nvars} {nclauses}\n")
+            for clause in clauses:
+                out.write(" ".join(map(str, clause)))
+                out.write(" 0\n")
+        elif format == 'smt2':
+            def term(lit):
+                if abs(lit) == TRUE:
+                    return 'true' if lit == TRUE else 'false'
+                return f"l{lit}" if lit > 0 else f"(not l{-lit})"
+
+            write_smt2_header(out, 'QF_BV' if self.logic is None else self.logic)
+            for v in range(2, self.cnf.nvars + 1):
+                out.write(f"(declare-fun l{v} () Bool)\n")
+            for clause in clauses:
+                if len(clause) == 1:
+                    out.write(f"(assert {term(clause[0])})\n")
+                else:
+                    out.write(f"(assert (or {' '.join(map(term, clause))}))\n")
+            # The vars as terms over the literals, so they can be asked for by name
+            for name, var in vars.items():
+                if isinstance(var, int):
+                    out.write(f"(define-fun {quote_symbol(name)} () Bool {term(var)})\n")
+                else:
+                    bits = " ".join(f"(ite {term(b)} #b1 #b0)" for b in reversed(var))
+                    value = f"(concat {bits})" if len(var) > 1 else bits
+                    out.write(f"(define-fun {quote_symbol(name)} () (_ BitVec {len(var)}) {value})\n")
+            write_smt2_footer(out, vars)
+        else:
+            super().dump(out, terms, vars, format)
+
+    def assignment_values(self, lits, vars):
+        return self._values(self._assignment(lits), vars)
+
+    def _assignment(self, lits) -> np.ndarray:
+        # The truth value of each var, indexed by var. Index 0 is never a var and
+        # stays false, so it can pad literal arrays.
+        lits = np.asarray(lits, dtype=np.int64)
+        a = np.zeros(max(self.cnf.nvars, int(np.abs(lits).max(initial=0))) + 1, dtype=bool)
+        a[np.abs(lits)] = lits > 0
+        a[TRUE] = True
+        return a
+
+    def values_reader(self, vars):
+        vars = list(vars)
+        widths = [1 if isinstance(v, int) else len(v) for v in vars]
+        width = max(widths, default=1)
+        if width > 62:
+            return super().values_reader(vars)
+        # One row of literals per var, LSB first, padded with 0
+        lits = np.zeros((len(vars), width), dtype=np.int64)
+        for i, v in enumerate(vars):
+            lits[i, :widths[i]] = [v] if isinstance(v, int) else v
+        index, negated = np.abs(lits), lits < 0
+        weights = np.left_shift(1, np.arange(width, dtype=np.int64))
+        gates = self._pending_gates(vars)
+
+        def read():
+            model = self._with_gates(self._model, gates)
+            if len(model) <= index.max(initial=0):
+                model = np.pad(model, (0, index.max() + 1 - len(model)))
+            return (model[index] ^ negated).astype(np.int64) @ weights
+
+        return read
+
+    def core(self):
+        core = set(self.solver.get_core() or ())
+        return [i for i, a in enumerate(self._assumptions) if a in core]
+
+    @staticmethod
+    def _values(model: np.ndarray, vars):
+        def lit_value(lit):
+            val = abs(lit) < len(model) and bool(model[abs(lit)])
+            return val if lit > 0 else not val
+
+        vals = []
+        for v in vars:
+            if isinstance(v, int):
+                vals.append(int(lit_value(v)))
+            else:
+                vals.append(sum(lit_value(b) << i for i, b in enumerate(v)))
+        return vals
+
+    def _pending_gates(self, vars) -> tp.List[int]:
+        # Gates under vars that nothing has used yet, in definition order
+        pending = self.cnf._pending
+        need = set()
+        stack = [abs(l) for v in vars for l in ([v] if isinstance(v, int) else v)]
+        while stack:
+            v = stack.pop()
+            if v in need or v not in pending:
+                continue
+            need.add(v)
+            stack.extend(abs(a) for a in pending[v][1:])
+        return sorted(need)
+
+    def _with_gates(self, model: np.ndarray, gates: tp.Sequence[int]) -> np.ndarray:
+        # Unused gates have no clauses yet, so the solver's value for them is arbitrary:
+        # evaluate them from their definitions instead. Arguments precede their gates.
+        if not gates:
+            return model
+        model = np.pad(model, (0, max(gates[-1] + 1 - len(model), 0)))
+
+        def val(lit):
+            return bool(model[abs(lit)]) == (lit > 0)
+
+        for x in gates:
+            kind, *args = self.cnf._defs[x]
+            if kind == 'and':
+                model[x] = val(args[0]) and val(args[1])
+            elif kind == 'xor':
+                model[x] = val(args[0]) != val(args[1])
+            else:
+                model[x] = val(args[1]) if val(args[0]) else val(args[2])
+        return model
+
+    def values(self, vars):
+        vars = list(vars)
+        return self._values(self._with_gates(self._model, self._pending_gates(vars)), vars)
+
+    def set_phases(self, assignment):
+        lits = []
+        for var, val in assignment:
+            if isinstance(var, int):
+                lits.append(var if val else -var)
+            else:
+                lits.extend(b if (val >> i) & 1 else -b for i, b in enumerate(var))
+        self.solver.set_phases([l for l in lits if abs(l) != TRUE])
+
+    def block(self, lits):
+        clause = []
+        for var, val in lits:
+            if isinstance(var, int):
+                clause.append(-var if val else var)
+            else:
+                clause.extend(-b if (val >> i) & 1 else b for i, b in enumerate(var))
+        self.cnf.require(clause)
+        self.cnf.blocking.add(len(self.cnf.clauses) - 1)
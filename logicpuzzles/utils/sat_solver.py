@@ -0,0 +1,467 @@
+"""
+SAT solver drivers for the CNF backend.
+
+Both drivers share a pysat-style interface on DIMACS literals (non-zero ints, -x is
+the negation of x):
+
+    add_clause(lits)
+    solve_limited(assumptions=(), conflicts=None, deadline=None) -> True / False / None
+    get_model()    -> [±1, ±2, ...] after a True result
+    get_core()     -> failing subset of the assumptions after a False result
+    set_phases(lits)
+    accum_stats()  -> {'conflicts': .., 'decisions': .., 'propagations': .., 'restarts': ..}
+
+solve_limited returns None when the conflict budget or the deadline (a
+time.monotonic() timestamp) is exhausted before an answer is found.
+
+PySATSolver wraps python-sat (pip install python-sat) when it is installed.
+CDCLSolver is a small bundled conflict-driven clause learning solver (two watched
+literals, 1UIP learning, VSIDS, phase saving, Luby restarts, assumptions with
+final-conflict cores) so the CNF backend always works, just more slowly.
+"""
+
+import heapq
+import time
+import typing as tp
+
+try:
+    from pysat.solvers import Solver as _PySATSolver
+except ImportError:
+    _PySATSolver = None
+
+
+def _luby(i: int) -> int:
+    # i-th element (1-indexed) of the Luby sequence 1 1 2 1 1 2 4 ...
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while True:
+        if i == (1 << k) - 1:
+            return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+
+
+class CDCLSolver:
+    # Internally a literal for var v is 2*v (positive) or 2*v+1 (negative), so
+    # negation is lit ^ 1 and lits index straight into the per-literal lists.
+    RESTART_BASE = 100
+    VAR_DECAY = 1 / 0.95
+
+    def __init__(self):
+        self.nvars = 0
+        self.clauses: tp.List[tp.Optional[tp.List[int]]] = []
+        self.learnts: tp.List[int] = []
+        self.watches: tp.List[tp.List[int]] = [[], []]
+        self.lval = [0, 0]
+        self.level = [0]
+        self.reason: tp.List[tp.Optional[int]] = [None]
+        self.seen = [False]
+        self.activity = [0.0]
+        self.polarity = [1]
+        self.heap = []
+        self.var_inc = 1.0
+        self.trail: tp.List[int] = []
+        self.trail_lim: tp.List[int] = []
+        self.qhead = 0
+        self.ok = True
+        self.model = None
+        self.core = None
+        self.max_learnts = 2000
+        self.stats = {'conflicts': 0, 'decisions': 0, 'propagations': 0, 'restarts': 0}
+
+    # Literal conversion
+    @staticmethod
+    def _lit(l: int) -> int:
+        return 2 * l if l > 0 else -2 * l + 1
+
+    @staticmethod
+    def _ext(lit: int) -> int:
+        return -(lit >> 1) if lit & 1 else lit >> 1
+
+    def _ensure_var(self, v: int):
+        while self.nvars < v:
+            self.nvars += 1
+            self.watches += [[], []]
+            self.lval += [0, 0]
+            self.level.append(0)
+            self.reason.append(None)
+            self.seen.append(False)
+            self.activity.append(0.0)
+            # Default to false first: puzzle encodings are mostly one-hot
+            self.polarity.append(1)
+            heapq.heappush(self.heap, (0.0, self.nvars))
+
+    def nof_vars(self) -> int:
+        return self.nvars
+
+    def nof_clauses(self) -> int:
+        return sum(1 for c in self.clauses if c is not None)
+
+    def accum_stats(self) -> tp.Dict[str, int]:
+        return dict(self.stats)
+
+    def set_phases(self, lits: tp.Iterable[int]):
+        for l in lits:
+            self._ensure_var(abs(l))
+            self.polarity[abs(l)] = 0 if l > 0 else 1
+
+    def add_clause(self, clause: tp.Iterable[int]):
+        if not self.ok:
+            return
+        lits = []
+        for l in clause:
+            self._ensure_var(abs(l))
+            lits.append(self._lit(l))
+        self._cancel_until(0)
+        lval = self.lval
+        out = []
+        for lit in set(lits):
+            if lit ^ 1 in lits or lval[lit] == 1:
+                return
+            if lval[lit] == 0:
+                out.append(lit)
+        if not out:
+            self.ok = False
+        elif len(out) == 1:
+            self._enqueue(out[0], None)
+            if self._propagate() is not None:
+                self.ok = False
+        else:
+            self._attach(out)
+
+    def _attach(self, c: tp.List[int]) -> int:
+        ci = len(self.clauses)
+        self.clauses.append(c)
+        self.watches[c[0] ^ 1].append(ci)
+        self.watches[c[1] ^ 1].append(ci)
+        return ci
+
+    def _enqueue(self, lit: int, reason: tp.Optional[int]):
+        v = lit >> 1
+        self.lval[lit] = 1
+        self.lval[lit ^ 1] = -1
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    def _cancel_until(self, lvl: int):
+        if len(self.trail_lim) <= lvl:
+            return
+        lval, polarity, heap, activity = self.lval, self.polarity, self.heap, self.activity
+        start = self.trail_lim[lvl]
+        for lit in self.trail[start:]:
+            v = lit >> 1
+            lval[lit] = 0
+            lval[lit ^ 1] = 0
+            self.reason[v] = None
+            polarity[v] = lit & 1
+            heapq.heappush(heap, (-activity[v], v))
+        del self.trail[start:]
+        del self.trail_lim[lvl:]
+        self.qhead = len(self.trail)
+
+    def _propagate(self) -> tp.Optional[int]:
+        trail, lval, clauses, watches = self.trail, self.lval, self.clauses, self.watches
+        props = 0
+        while self.qhead < len(trail):
+            p = trail[self.qhead]
+            self.qhead += 1
+            props += 1
+            false_lit = p ^ 1
+            ws = watches[p]
+            i = j = 0
+            n = len(ws)
+            while i < n:
+                ci = ws[i]
+                i += 1
+                c = clauses[ci]
+                if c is None:
+                    continue
+                if c[0] == false_lit:
+                    c[0] = c[1]
+                    c[1] = false_lit
+                first = c[0]
+                if lval[first] == 1:
+                    ws[j] = ci
+                    j += 1
+                    continue
+                for k in range(2, len(c)):
+                    lk = c[k]
+                    if lval[lk] != -1:
+                        c[1] = lk
+                        c[k] = false_lit
+                        watches[lk ^ 1].append(ci)
+                        break
+                else:
+                    ws[j] = ci
+                    j += 1
+                    if lval[first] == -1:
+                        while i < n:
+                            ws[j] = ws[i]
+                            j += 1
+                            i += 1
+                        del ws[j:]
+                        self.qhead = len(trail)
+                        self.stats['propagations'] += props
+                        return ci
+                    self._enqueue(first, ci)
+            del ws[j:]
+        self.stats['propagations'] += props
+        return None
+
+    def _bump(self, v: int):
+        self.activity[v] += self.var_inc
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.var_inc *= 1e-100
+            self.heap = [(-self.activity[u], u) for u in range(1, self.nvars + 1) if self.lval[2 * u] == 0]
+            heapq.heapify(self.heap)
+        if self.lval[2 * v] == 0:
+            heapq.heappush(self.heap, (-self.activity[v], v))
+
+    def _analyze(self, confl: int) -> tp.Tuple[tp.List[int], int]:
+        seen, level, reason, trail = self.seen, self.level, self.reason, self.trail
+        cur = len(self.trail_lim)
+        learnt = [0]
+        path = 0
+        p = None
+        idx = len(trail) - 1
+        c = self.clauses[confl]
+        while True:
+            for q in (c if p is None else c[1:]):
+                v = q >> 1
+                if not seen[v] and level[v] > 0:
+                    self._bump(v)
+                    seen[v] = True
+                    if level[v] >= cur:
+                        path += 1
+                    else:
+                        learnt.append(q)
+            while not seen[trail[idx] >> 1]:
+                idx -= 1
+            p = trail[idx]
+            idx -= 1
+            seen[p >> 1] = False
+            path -= 1
+            if path == 0:
+                break
+            c = self.clauses[reason[p >> 1]]
+        learnt[0] = p ^ 1
+        for q in learnt[1:]:
+            seen[q >> 1] = False
+        if len(learnt) == 1:
+            return learnt, 0
+        # Watch the highest level literal second so the clause is asserting after backjump
+        mi = max(range(1, len(learnt)), key=lambda i: level[learnt[i] >> 1])
+        learnt[1], learnt[mi] = learnt[mi], learnt[1]
+        return learnt, level[learnt[1] >> 1]
+
+    def _analyze_final(self, p: int) -> tp.List[int]:
+        # p is true and contradicts an assumption; collect the assumptions implying it
+        core = [p ^ 1]
+        if not self.trail_lim:
+            return core
+        seen, level, reason = self.seen, self.level, self.reason
+        seen[p >> 1] = True
+        for lit in reversed(self.trail[self.trail_lim[0]:]):
+            v = lit >> 1
+            if not seen[v]:
+                continue
+            if reason[v] is None:
+                if level[v] > 0:
+                    core.append(lit)
+            else:
+                for q in self.clauses[reason[v]][1:]:
+                    if level[q >> 1] > 0:
+                        seen[q >> 1] = True
+            seen[v] = False
+        seen[p >> 1] = False
+        return core
+
+    def _reduce_db(self):
+        # Drop the longer half of the learnt clauses that are not currently reasons
+        locked = {self.reason[lit >> 1] for lit in self.trail}
+        self.learnts.sort(key=lambda ci: len(self.clauses[ci]))
+        keep = len(self.learnts) // 2
+        for ci in self.learnts[keep:]:
+            if ci in locked:
+                continue
+            self.clauses[ci] = None
+        self.learnts = [ci for ci in self.learnts if self.clauses[ci] is not None]
+        self.max_learnts = int(self.max_learnts * 1.1)
+
+    def _pick_branch(self) -> tp.Optional[int]:
+        if len(self.heap) > 8 * self.nvars + 64:
+            # Backtracking re-pushes vars lazily, so compact the stale entries now and then
+            self.heap = [(-self.activity[u], u) for u in range(1, self.nvars + 1) if self.lval[2 * u] == 0]
+            heapq.heapify(self.heap)
+        heap, lval = self.heap, self.lval
+        while heap:
+            _, v = heapq.heappop(heap)
+            if lval[2 * v] == 0:
+                return 2 * v + self.polarity[v]
+        return None
+
+    def _search(self, assumptions, nof_conflicts, conflicts_left, deadline):
+        conflicts = 0
+        while True:
+            confl = self._propagate()
+            if confl is not None:
+                conflicts += 1
+                self.stats['conflicts'] += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learnt, bt = self._analyze(confl)
+                self._cancel_until(bt)
+                if len(learnt) == 1:
+                    self._enqueue(learnt[0], None)
+                else:
+                    ci = self._attach(learnt)
+                    self.learnts.append(ci)
+                    self._enqueue(learnt[0], ci)
+                self.var_inc *= self.VAR_DECAY
+                if conflicts_left is not None and conflicts >= conflicts_left:
+                    return None, conflicts
+                if deadline is not None and time.monotonic() > deadline:
+                    return None, conflicts
+                continue
+            if conflicts >= nof_conflicts:
+                self._cancel_until(0)
+                return 'restart', conflicts
+            if len(self.learnts) - len(self.trail) >= self.max_learnts:
+                self._reduce_db()
+            lit = None
+            while len(self.trail_lim) < len(assumptions):
+                a = assumptions[len(self.trail_lim)]
+                if self.lval[a] == 1:
+                    self.trail_lim.append(len(self.trail))
+                elif self.lval[a] == -1:
+                    self.core = self._analyze_final(a ^ 1)
+                    return False
+                else:
+                    lit = a
+                    break
+            if lit is None:
+                lit = self._pick_branch()
+                if lit is None:
+                    return True
+                self.stats['decisions'] += 1
+            self.trail_lim.append(len(self.trail))
+            self._enqueue(lit, None)
+
+    def solve_limited(self, assumptions: tp.Sequence[int] = (), conflicts: tp.Optional[int] = None,
+                      deadline: tp.Optional[float] = None) -> tp.Optional[bool]:
+        self.model = None
+        self.core = None
+        if not self.ok:
+            self.core = []
+            return False
+        for a in assumptions:
+            self._ensure_var(abs(a))
+        assumptions = [self._lit(a) for a in assumptions]
+        self._cancel_until(0)
+        restarts = 0
+        used = 0
+        while True:
+            restarts += 1
+            left = None if conflicts is None else conflicts - used
+            res = self._search(assumptions, _luby(restarts) * self.RESTART_BASE, left, deadline)
+            if res is True:
+                self.model = [v if self.lval[2 * v] == 1 else -v for v in range(1, self.nvars + 1)]
+                self._cancel_until(0)
+                return True
+            if res is False:
+                if self.core is None:
+                    self.core = []
+                self.core = [self._ext(l) for l in self.core]
+                self._cancel_until(0)
+                return False
+            status, n = res
+            used += n
+            if status is None:
+                self._cancel_until(0)
+                return None
+            self.stats['restarts'] += 1
+
+    def solve(self, assumptions: tp.Sequence[int] = ()) -> bool:
+        return self.solve_limited(assumptions)
+
+    def get_model(self) -> tp.Optional[tp.List[int]]:
+        return self.model
+
+    def get_core(self) -> tp.Optional[tp.List[int]]:
+        return self.core
+
+    def delete(self):
+        pass
+
+
+class PySATSolver:
+    """Adapter giving a python-sat solver the same solve_limited signature"""
+
+    def __init__(self, name: str = 'glucose4'):
+        self.name = name
+        self.solver = _PySATSolver(name=name)
+
+    def add_clause(self, clause):
+        self.solver.add_clause(list(clause))
+
+    def set_phases(self, lits):
+        self.solver.set_phases(list(lits))
+
+    def solve_limited(self, assumptions=(), conflicts=None, deadline=None):
+        if conflicts is None and deadline is None:
+            return self.solver.solve(assumptions=list(assumptions))
+        # The budget sticks to the solver, so it has to be cleared as well as set
+        self.solver.conf_budget(conflicts if conflicts is not None else -1)
+        timer = None
+        if deadline is not None:
+            import threading
+            timer = threading.Timer(max(deadline - time.monotonic(), 0), self.solver.interrupt)
+            timer.start()
+        try:
+            res = self.solver.solve_limited(assumptions=list(assumptions), expect_interrupt=timer is not None)
+        finally:
+            if timer is not None:
+                timer.cancel()
+                self.solver.clear_interrupt()
+        return res
+
+    def solve(self, assumptions=()):
+        return self.solver.solve(assumptions=list(assumptions))
+
+    def get_model(self):
+        return self.solver.get_model()
+
+    def get_core(self):
+        return self.solver.get_core()
+
+    def nof_vars(self):
+        return self.solver.nof_vars()
+
+    def nof_clauses(self):
+        return self.solver.nof_clauses()
+
+    def accum_stats(self):
+        return self.solver.accum_stats()
+
+    def delete(self):
+        self.solver.delete()
+
+
+def make_sat_solver(name: tp.Optional[str] = None):
+    """
+    Create a SAT solver driver.
+
+    name is None for the best available (python-sat's glucose4 if installed, otherwise
+    the bundled solver), 'bundled' for CDCLSolver, or any python-sat solver name.
+    """
+    if name == 'bundled' or (name is None and _PySATSolver is None):
+        return CDCLSolver()
+    if _PySATSolver is None:
+        raise ImportError(f"SAT solver '{name}' requires python-sat (pip install python-sat)")
+    return PySATSolver(name or 'glucose4')
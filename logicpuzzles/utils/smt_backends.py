@@ -0,0 +1,581 @@
+"""
+Solver backends for SMTConstraintProblem.
+
+A backend owns the underlying solver and the hwtypes family (Bit / BitVector) used to
+build terms for it. SMTConstraintProblem only talks to the backend through the small
+interface below, so puzzles can switch solvers with solver_name without changing how
+their constraints are written.
+
+    solver_name        backend
+    'z3-native'        Z3Backend: z3 ASTs built directly through hwtypes' z3 family
+    'sat'              SATBackend: CNF through python-sat if installed, else the bundled CDCL
+    'sat-<name>'       SATBackend with the named python-sat solver, or 'sat-bundled'
+    'pysmt-<name>'     PysmtBackend using the named pysmt solver
+    anything else      PysmtBackend, passing the name through to pysmt (default 'z3')
+"""
+
+import functools
+import hwtypes as ht
+import numpy as np
+import pysmt.shortcuts as smt
+from pysmt.exceptions import SolverReturnedUnknownResultError
+import pysmt.operators as op
+import threading
+import typing as tp
+import z3
+from pysmt.typing import BOOL, BVType
+from pysmt.oracles import SizeOracle
+from pysmt.smtlib.printers import SmtDagPrinter
+from pysmt.smtlib.script import SmtLibCommand
+import pysmt.smtlib.commands as smtcmd
+from .instance_io import write_smt2_header, write_smt2_footer
+
+
+# z3's "no limit" value for the timeout and max_conflicts parameters
+_Z3_UNLIMITED = 2**32 - 1
+
+
+def _z3_set_phases(solver: z3.Solver, assignment):
+    # Initial values arrived in z3 4.13.1; older versions just go without the hint
+    if not hasattr(solver, 'set_initial_value'):
+        return
+    for t, val in assignment:
+        if z3.is_bool(t):
+            solver.set_initial_value(t, z3.BoolVal(bool(val), t.ctx))
+        else:
+            solver.set_initial_value(t, z3.BitVecVal(val, t.size(), t.ctx))
+
+
+def _z3_core(solver: z3.Solver, assumptions) -> tp.List[int]:
+    index = {a.get_id(): i for i, a in enumerate(assumptions)}
+    return sorted(index[c.get_id()] for c in solver.unsat_core())
+
+
+def _to_int(val):
+    if isinstance(val, z3.BoolRef):
+        return bool(val)
+    elif isinstance(val, z3.BitVecRef):
+        return int(val.as_long())
+    else:
+        try:
+            return int(val.constant_value())
+        except Exception as e:
+            print(f"Error converting {val} of type {type(val)}: {e}")
+            raise
+
+
+# Operators whose operands can be reordered when hash-consing constraints
+_PYSMT_COMMUTATIVE = frozenset([
+    op.AND, op.OR, op.IFF, op.EQUALS, op.BV_ADD, op.BV_MUL, op.BV_AND, op.BV_OR, op.BV_XOR,
+])
+_Z3_COMMUTATIVE = frozenset([
+    z3.Z3_OP_AND, z3.Z3_OP_OR, z3.Z3_OP_XOR, z3.Z3_OP_EQ, z3.Z3_OP_DISTINCT, z3.Z3_OP_BADD,
+    z3.Z3_OP_BMUL, z3.Z3_OP_BAND, z3.Z3_OP_BOR, z3.Z3_OP_BXOR,
+])
+
+
+def _locked(f):
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return f(self, *args, **kwargs)
+    return wrapper
+
+
+class Backend:
+    name: str = None
+    Bit: tp.Type[ht.AbstractBit] = None
+    BitVector: tp.Type[ht.AbstractBitVector] = None
+    # Whether a var is fully determined by its name and sort, so the same var can be
+    # handed to several problems (see VarCache)
+    shared_vars: bool = False
+
+    def __init__(self, logic=None, timeout=None):
+        self.logic = logic
+        self.timeout = timeout
+        self.reset()
+
+    def reset(self):
+        """Drop all assertions and start from a fresh solver"""
+        raise NotImplementedError()
+
+    def close(self):
+        """Release the underlying solver"""
+        self.solver = None
+
+    def new_var(self, name: str, bvlen: int):
+        """Create a Bit (bvlen == 0) or BitVector[bvlen] variable called name"""
+        raise NotImplementedError()
+
+    def is_bool(self, var) -> bool:
+        """Whether the raw term var (a Bit's .value) is boolean"""
+        raise NotImplementedError()
+
+    def add(self, c: ht.AbstractBit):
+        raise NotImplementedError()
+
+    def push(self):
+        raise NotImplementedError()
+
+    def pop(self):
+        raise NotImplementedError()
+
+    def check(self, timeout: tp.Optional[float] = None, conflicts: tp.Optional[int] = None,
+              assumptions: tp.Sequence = ()) -> tp.Optional[bool]:
+        """
+        Whether the assertions together with the raw boolean terms in assumptions are
+        satisfiable, or None if the time budget (timeout, in ms) or the conflict budget
+        ran out first. Assumptions only hold for this call.
+        """
+        raise NotImplementedError()
+
+    def core(self) -> tp.List[int]:
+        """
+        Indices of a subset of the assumptions of the last check that is unsatisfiable
+        together with the assertions. Only valid after a check that returned False.
+        """
+        raise NotImplementedError()
+
+    def set_phases(self, assignment: tp.Sequence[tp.Tuple[tp.Any, int]]):
+        """
+        Have later checks try the given values of raw vars, as (var, value) pairs, before
+        the others. Only a hint: no model is excluded. Ignored by default.
+        """
+
+    def values(self, vars: tp.Sequence) -> tp.List[int]:
+        """Values of the raw terms vars in the current model, booleans as 0/1"""
+        raise NotImplementedError()
+
+    def values_reader(self, vars: tp.Sequence) -> tp.Callable[[], np.ndarray]:
+        """
+        A function reading the values of the raw terms vars in the current model into
+        an int64 array, for reading the same vars from many models
+        """
+        vars = list(vars)
+        return lambda: np.fromiter(self.values(vars), dtype=np.int64, count=len(vars))
+
+    def block(self, lits: tp.Sequence[tp.Tuple[tp.Any, int]]):
+        """Assert that at least one (var, val) pair in lits does not hold"""
+        raise NotImplementedError()
+
+    def total(self, vals: tp.Sequence) -> tp.Optional[tp.Any]:
+        """Backend specific sum of vals for gen_total, or None to use a bit-vector adder"""
+        return None
+
+    def distinct(self, vals: tp.Sequence[ht.AbstractBitVector]) -> tp.Optional[ht.AbstractBit]:
+        """A native all-different over vals, or None to fall back to pairwise !="""
+        return None
+
+    def constant(self, c: ht.AbstractBit) -> tp.Optional[bool]:
+        """The value of c if it is a constant, else None"""
+        return None
+
+    def term_key(self, c: ht.AbstractBit) -> tp.Hashable:
+        """
+        Key identifying c for hash-consing constraints. Terms that only differ in the
+        operand order of their top-level commutative operator (a != b, b != a) should get
+        the same key.
+        """
+        return c.value
+
+    def cnf_clauses(self, assumptions: tp.Sequence = ()) -> tp.Optional[tp.List[tp.List[int]]]:
+        """
+        The asserted constraints as DIMACS clauses (with the open push levels in force)
+        for exact model counting, or None if the backend does not work on CNF. Clauses for
+        the raw literals in assumptions are included too.
+        """
+        return None
+
+    def term_size(self, bits: tp.Sequence[ht.AbstractBit]) -> tp.Optional[int]:
+        """Number of distinct nodes in the DAG of the terms bits, None if unknown"""
+        return None
+
+    def statistics(self) -> tp.Dict[str, tp.Any]:
+        """The solver's own counters (conflicts, decisions, ...), accumulated so far"""
+        return {}
+
+    def dump(self, out: tp.TextIO, terms: tp.Sequence[ht.AbstractBit], vars: tp.Mapping[str, tp.Any], format: str):
+        """
+        Write the asserted constraints terms to the text stream out as a standalone
+        instance in format (see instance_io), reporting the raw terms vars by name.
+        Raises ValueError for a format the backend can't write.
+        """
+        raise ValueError(f"The {self.name} backend can't write {format}")
+
+    def assignment_values(self, lits: tp.Sequence[int], vars: tp.Sequence) -> tp.List[int]:
+        """Values of the raw terms vars under the true DIMACS literals lits"""
+        raise ValueError(f"The {self.name} backend has no DIMACS literals")
+
+
+def _z3_dag_size(terms) -> int:
+    seen = set()
+    stack = list(terms)
+    while stack:
+        t = stack.pop()
+        i = t.get_id()
+        if i in seen:
+            continue
+        seen.add(i)
+        if z3.is_app(t):
+            stack.extend(t.children())
+    return len(seen)
+
+
+def _z3_dump(out: tp.TextIO, terms, vars: tp.Mapping[str, tp.Any], logic):
+    # Declare every constant the terms use, not just the named vars
+    consts, seen = dict.fromkeys(vars.values()), set()
+    stack = list(terms)
+    while stack:
+        t = stack.pop()
+        if t.get_id() in seen:
+            continue
+        seen.add(t.get_id())
+        if z3.is_const(t) and t.decl().kind() == z3.Z3_OP_UNINTERPRETED:
+            consts[t] = None
+        elif z3.is_app(t):
+            stack.extend(t.children())
+    write_smt2_header(out, logic)
+    for c in consts:
+        out.write(c.decl().sexpr())
+        out.write("\n")
+    for t in terms:
+        out.write(f"(assert {t.sexpr()})\n")
+    write_smt2_footer(out, vars)
+
+
+def _z3_values_reader(model: tp.Callable[[], z3.ModelRef], terms) -> tp.Optional[tp.Callable[[], np.ndarray]]:
+    # Evaluates all the terms at once as one bit-vector (the first term lowest), which
+    # is far cheaper than a model eval per term. None for terms wider than an int64.
+    widths = [1 if z3.is_bool(t) else t.size() for t in terms]
+    if not terms or max(widths) > 62:
+        return None
+    one, zero = z3.BitVecVal(1, 1), z3.BitVecVal(0, 1)
+    parts = [z3.If(t, one, zero) if z3.is_bool(t) else t for t in reversed(terms)]
+    packed = parts[0] if len(parts) == 1 else z3.Concat(parts)
+    total, width = sum(widths), max(widths)
+    # Positions of the bits of each term in the packed value, padded with position
+    # total, which is always 0
+    index = np.full((len(terms), width), total, dtype=np.intp)
+    offset = 0
+    for i, w in enumerate(widths):
+        index[i, :w] = np.arange(offset, offset + w)
+        offset += w
+    weights = np.left_shift(1, np.arange(width, dtype=np.int64))
+
+    def read():
+        x = model().eval(packed, model_completion=True).as_long()
+        bits = np.unpackbits(np.frombuffer(x.to_bytes(total // 8 + 1, 'little'), dtype=np.uint8), bitorder='little')
+        return bits[index].astype(np.int64) @ weights
+
+    return read
+
+
+def _z3_statistics(solver) -> tp.Dict[str, tp.Any]:
+    stats = solver.statistics()
+    return {k: stats.get_key_value(k) for k in stats.keys()}
+
+
+class PysmtBackend(Backend):
+    name = 'pysmt'
+    Bit = ht.SMTBit
+    BitVector = ht.SMTBitVector
+    shared_vars = True
+
+    # pysmt's environment is process global (symbol creation is check-then-insert, solvers
+    # are imported lazily) and its z3 solvers share z3's main context, so every call
+    # that touches them is serialized
+    _lock = threading.RLock()
+
+    def __init__(self, solver_name='z3', logic=None, timeout=None):
+        self.solver_name = solver_name
+        super().__init__(logic=logic, timeout=timeout)
+
+    @_locked
+    def reset(self):
+        self.solver = smt.Solver(
+            name=self.solver_name,
+            logic=self.logic,
+        )
+        # z3 lets us skip pysmt's per-variable get_value/back-conversion entirely
+        self._native = hasattr(self.solver, 'z3')
+        self._z3_terms = {}
+
+    @_locked
+    def close(self):
+        if self.solver is not None:
+            self.solver.exit()
+        self.solver = None
+        self._z3_terms = {}
+
+    @_locked
+    def term_size(self, bits):
+        if not bits:
+            return 0
+        return smt.get_formula_size(smt.And([b.value for b in bits]), SizeOracle.MEASURE_DAG_NODES)
+
+    @_locked
+    def statistics(self):
+        if not self._native:
+            return {}
+        return _z3_statistics(self.solver.z3)
+
+    @_locked
+    def dump(self, out, terms, vars, format):
+        if format != 'smt2':
+            return super().dump(out, terms, vars, format)
+        formulas = [t.value for t in terms]
+        # Declare every symbol the formulas use, not just the named vars
+        symbols = dict.fromkeys(vars.values())
+        for f in formulas:
+            symbols.update(dict.fromkeys(sorted(smt.get_free_variables(f), key=lambda s: s.symbol_name())))
+        write_smt2_header(out, self.logic)
+        for s in symbols:
+            SmtLibCommand(smtcmd.DECLARE_FUN, [s]).serialize(outstream=out)
+            out.write("\n")
+        # Shared subterms become lets instead of being printed once per use
+        printer = SmtDagPrinter(out)
+        for f in formulas:
+            out.write("(assert ")
+            printer.printer(f)
+            out.write(")\n")
+        write_smt2_footer(out, vars)
+
+    def _z3_term(self, var):
+        t = self._z3_terms.get(var)
+        if t is None:
+            t = self._z3_terms[var] = self.solver.converter.convert(var)
+        return t
+
+    def new_var(self, name, bvlen):
+        # Wrapping the symbol (instead of passing name=) avoids hwtypes' global name
+        # table, which rejects a name while another problem still holds the var
+        with self._lock:
+            if bvlen == 0:
+                return self.Bit(smt.Symbol(name, BOOL))
+            return self.BitVector[bvlen](smt.Symbol(name, BVType(bvlen)))
+
+    def is_bool(self, var):
+        return var.get_type().is_bool_type()
+
+    def constant(self, c):
+        if c.value.is_bool_constant():
+            return c.value.constant_value()
+        return None
+
+    def term_key(self, c):
+        # pysmt formulas are hash-consed, so only the operand order of a top-level
+        # commutative operator (under an optional Not) needs normalizing
+        node, negated = c.value, False
+        if node.is_not():
+            node, negated = node.arg(0), True
+        if node.node_type() in _PYSMT_COMMUTATIVE:
+            return (negated, node.node_type(), tuple(sorted(a.node_id() for a in node.args())))
+        return c.value
+
+    @_locked
+    def add(self, c):
+        self.solver.add_assertion(c.value)
+
+    @_locked
+    def push(self):
+        self.solver.push()
+
+    @_locked
+    def pop(self):
+        self.solver.pop()
+
+    @_locked
+    def check(self, timeout=None, conflicts=None, assumptions=()):
+        self._assumptions = list(assumptions)
+        # Budgets and cores are only supported through z3; other pysmt solvers run
+        # unbounded and report every assumption as the core
+        if self._native:
+            z = self.solver.z3
+            z.set('timeout', _Z3_UNLIMITED if timeout is None else max(int(timeout), 1))
+            z.set('max_conflicts', _Z3_UNLIMITED if conflicts is None else conflicts)
+            res = z.check(*(self._z3_term(a) for a in self._assumptions))
+            if res == z3.unknown:
+                return None
+            return res == z3.sat
+        try:
+            return self.solver.solve(self._assumptions or None)
+        except SolverReturnedUnknownResultError:
+            return None
+
+    @_locked
+    def core(self):
+        if not self._native:
+            return list(range(len(self._assumptions)))
+        return _z3_core(self.solver.z3, [self._z3_term(a) for a in self._assumptions])
+
+    @_locked
+    def set_phases(self, assignment):
+        if self._native:
+            _z3_set_phases(self.solver.z3, [(self._z3_term(var), val) for var, val in assignment])
+
+    @_locked
+    def values(self, vars):
+        if self._native:
+            m = self.solver.z3.model()
+            # int() keeps booleans as 0/1, matching what pysmt's constant_value gives
+            return [int(_to_int(m.eval(self._z3_term(v), model_completion=True))) for v in vars]
+        values = self.solver.get_values(vars)
+        return [_to_int(values[v]) for v in vars]
+
+    @_locked
+    def values_reader(self, vars):
+        if self._native:
+            read = _z3_values_reader(lambda: self.solver.z3.model(), [self._z3_term(v) for v in vars])
+            if read is not None:
+                def locked_read():
+                    with self._lock:
+                        return read()
+                return locked_read
+        return super().values_reader(vars)
+
+    @_locked
+    def block(self, lits):
+        if self._native:
+            clause = []
+            for var, val in lits:
+                t = self._z3_term(var)
+                if z3.is_bool(t):
+                    clause.append(z3.Not(t) if val else t)
+                else:
+                    clause.append(t != val)
+            self.solver.z3.add(z3.Or(clause))
+            return
+        clause = []
+        for var, val in lits:
+            if self.is_bool(var):
+                clause.append(smt.Not(var) if val else var)
+            else:
+                clause.append(smt.NotEquals(var, smt.BV(val, var.bv_width())))
+        self.solver.add_assertion(smt.Or(clause))
+
+
+class Z3Backend(Backend):
+    name = 'z3-native'
+    Bit = ht.z3Bit
+    BitVector = ht.z3BitVector
+    shared_vars = True
+
+    def reset(self):
+        if self.logic is not None:
+            self.solver = z3.SolverFor(str(self.logic))
+        else:
+            self.solver = z3.Solver()
+
+    # Terms are built directly on z3's main context, which is not thread safe: use one
+    # problem per process (e.g. solve_many) rather than threads with this backend
+    def new_var(self, name, bvlen):
+        # Wrapping the z3 constant (instead of passing name=) avoids hwtypes' global
+        # name table, so the same name can be reused across problems
+        if bvlen == 0:
+            return self.Bit(z3.Bool(name))
+        return self.BitVector[bvlen](z3.BitVec(name, bvlen))
+
+    def is_bool(self, var):
+        return z3.is_bool(var)
+
+    def distinct(self, vals):
+        if len(vals) < 2:
+            return self.Bit(True)
+        return self.Bit(z3.Distinct(*(v.value for v in vals)))
+
+    def constant(self, c):
+        if z3.is_true(c.value):
+            return True
+        if z3.is_false(c.value):
+            return False
+        return None
+
+    def term_key(self, c):
+        # As for pysmt: z3 ASTs are hash-consed, so normalizing the top-level operand
+        # order is enough. Ids are only recycled once an AST is freed, and the IR keeps
+        # the first term with each key alive. Uses the C API directly; wrapping every
+        # child in an ExprRef costs more than the rest of adding a constraint.
+        ctx, a = c.value.ctx_ref(), c.value.as_ast()
+        negated = False
+        while z3.Z3_get_ast_kind(ctx, a) == z3.Z3_APP_AST:
+            app = z3.Z3_to_app(ctx, a)
+            kind = z3.Z3_get_decl_kind(ctx, z3.Z3_get_app_decl(ctx, app))
+            n = z3.Z3_get_app_num_args(ctx, app)
+            if kind == z3.Z3_OP_NOT and not negated:
+                a, negated = z3.Z3_get_app_arg(ctx, app, 0), True
+                continue
+            if n > 1 and kind in _Z3_COMMUTATIVE:
+                args = sorted(z3.Z3_get_ast_id(ctx, z3.Z3_get_app_arg(ctx, app, i)) for i in range(n))
+                return (negated, kind, tuple(args))
+            break
+        return c.value.get_id()
+
+    def add(self, c):
+        self.solver.add(c.value)
+
+    def push(self):
+        self.solver.push()
+
+    def pop(self):
+        self.solver.pop()
+
+    def check(self, timeout=None, conflicts=None, assumptions=()):
+        self._assumptions = list(assumptions)
+        self.solver.set(
+            timeout=_Z3_UNLIMITED if timeout is None else max(int(timeout), 1),
+            max_conflicts=_Z3_UNLIMITED if conflicts is None else conflicts,
+        )
+        res = self.solver.check(*self._assumptions)
+        if res == z3.unknown:
+            return None
+        return res == z3.sat
+
+    def core(self):
+        return _z3_core(self.solver, self._assumptions)
+
+    def term_size(self, bits):
+        return _z3_dag_size(b.value for b in bits)
+
+    def statistics(self):
+        return _z3_statistics(self.solver)
+
+    def dump(self, out, terms, vars, format):
+        if format != 'smt2':
+            return super().dump(out, terms, vars, format)
+        _z3_dump(out, [t.value for t in terms], vars, self.logic)
+
+    def set_phases(self, assignment):
+        _z3_set_phases(self.solver, assignment)
+
+    def values(self, vars):
+        m = self.solver.model()
+        return [int(_to_int(m.eval(v, model_completion=True))) for v in vars]
+
+    def values_reader(self, vars):
+        vars = list(vars)
+        return _z3_values_reader(self.solver.model, vars) or super().values_reader(vars)
+
+    def block(self, lits):
+        clause = []
+        for var, val in lits:
+            if z3.is_bool(var):
+                clause.append(z3.Not(var) if val else var)
+            else:
+                clause.append(var != val)
+        self.solver.add(z3.Or(clause))
+
+
+BACKENDS = {
+    'z3-native': Z3Backend,
+}
+
+
+def make_backend(solver_name: str = 'z3', logic=None, timeout=None) -> Backend:
+    if solver_name in BACKENDS:
+        return BACKENDS[solver_name](logic=logic, timeout=timeout)
+    if solver_name == 'sat' or solver_name.startswith('sat-'):
+        from .sat_backend import SATBackend
+        return SATBackend(sat_solver=solver_name[len('sat-'):] or None, logic=logic, timeout=timeout)
+    if solver_name.startswith('pysmt-'):
+        solver_name = solver_name[len('pysmt-'):]
+    return PysmtBackend(solver_name=solver_name, logic=logic, timeout=timeout)
@@ -0,0 +1,214 @@
+"""
+Solutions enumerated in a worker process and consumed lazily from anywhere.
+
+    stream = SolutionStream.for_board(board, solver_kwargs={'solver_name': 'sat'})
+    page = stream.take(10)              # the next 10 solutions, fewer at the end
+    page = stream.take(10, timeout=0.5) # or whatever arrives within half a second
+    for sol in stream: ...              # or iterate
+    stream.cancel()                     # stop early, without waiting
+    stream.close()                      # stop the worker and reap it
+
+    stream = solver.solve_stream(0)     # the same from a problem (see solve_stream)
+
+The worker builds its own solver, enumerates its models and sends the decoded solutions
+(board_from_model) through a bounded queue. Once maxsize solutions wait unread the
+worker stops enumerating until some are taken, so a slow reader holds at most maxsize
+solutions and the solver never runs ahead of it. Solutions must be picklable; problems
+that do not decode models send them keyed by var name.
+
+cancel() only signals the worker, which stops before its next model. close() also
+waits for it to exit, killing it after a grace period if it is stuck in a solver
+call. A stream closes itself when used as a context manager or garbage collected.
+"""
+
+import multiprocessing as mp
+import queue
+import threading
+import timeit
+import traceback
+import typing as tp
+import weakref
+from .smt_utils import SMTConstraintProblem, SolveStatus
+from .batch import solver_for
+from .workers import _named
+
+# Returned by SolutionStream._get when nothing arrived in time
+_EMPTY = object()
+
+
+def _put(out, cancel, item) -> bool:
+    # Block while the queue is full, unless the stream is cancelled
+    while not cancel.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _stream_worker(cls, args, kwargs, num_sols, timeout, conflicts, out, cancel):
+    try:
+        problem = cls(*args, **{**kwargs, 'portfolio': None})
+        with problem:
+            problem.ensure_built()
+            models = SMTConstraintProblem.solve(problem, num_sols, timeout, conflicts)
+            if type(problem).board_from_model is SMTConstraintProblem.board_from_model:
+                solutions = _named(problem, models)
+            else:
+                solutions = map(problem.board_from_model, models)
+            for sol in solutions:
+                if cancel.is_set() or not _put(out, cancel, ('solution', sol)):
+                    break
+            else:
+                _put(out, cancel, ('done', problem.status))
+    except Exception:
+        _put(out, cancel, ('error', traceback.format_exc()))
+    if cancel.is_set():
+        # Nobody reads the queue anymore, so exit without flushing it
+        out.cancel_join_thread()
+
+
+def _shutdown(proc, out, cancel, grace: float):
+    cancel.set()
+    proc.join(grace)
+    if proc.is_alive():
+        proc.kill()
+        proc.join()
+    out.cancel_join_thread()
+    out.close()
+
+
+class SolutionStream:
+    """
+    Solutions of cls(*args, **kwargs) enumerated by a worker process; see the module
+    docstring.
+
+    Parameters
+    ----------
+    cls : type
+        An SMTConstraintProblem subclass whose build() adds the constraints.
+    args, kwargs : optional
+        Its constructor arguments. They must be picklable.
+    num_sols : int, optional
+        Number of solutions to enumerate, 0 for all of them.
+    maxsize : int, optional
+        Number of solutions the worker may enumerate ahead of the reader.
+    timeout, conflicts : optional
+        Solver budgets, as for SMTConstraintProblem.solve.
+    grace : float, optional
+        Seconds close() waits for the worker before killing it.
+    mp_context : str, optional
+        multiprocessing start method for the worker.
+    """
+
+    def __init__(
+        self,
+        cls: type,
+        args: tp.Sequence = (),
+        kwargs: tp.Optional[dict] = None,
+        num_sols: int = 0,
+        maxsize: int = 16,
+        timeout: tp.Optional[float] = None,
+        conflicts: tp.Optional[int] = None,
+        grace: float = 1.0,
+        mp_context: tp.Optional[str] = None,
+    ):
+        if num_sols < 0:
+            raise ValueError("num_sols must be at least 0")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        ctx = mp.get_context(mp_context)
+        self._queue = ctx.Queue(maxsize)
+        self._cancel = ctx.Event()
+        self._proc = ctx.Process(
+            target=_stream_worker,
+            args=(cls, tuple(args), dict(kwargs or {}), num_sols, timeout, conflicts, self._queue, self._cancel),
+            daemon=True,
+        )
+        self._proc.start()
+        self._close = weakref.finalize(self, _shutdown, self._proc, self._queue, self._cancel, grace)
+        self._lock = threading.Lock()
+        self._finished = False
+        # Outcome of the enumeration once the worker sent its last solution, None before
+        self.status: tp.Optional[SolveStatus] = None
+        self.cancelled = False
+        # Number of solutions handed out so far
+        self.count = 0
+
+    @classmethod
+    def for_board(cls, board, solver_kwargs: tp.Optional[dict] = None, **stream_kwargs) -> 'SolutionStream':
+        """The solutions of a puzzle board, solved by its registered solver (see batch.solver_for)"""
+        return cls(solver_for(board), (board,), solver_kwargs, **stream_kwargs)
+
+    @property
+    def done(self) -> bool:
+        """Whether no more solutions will come"""
+        return self._finished
+
+    def _get(self, timeout: tp.Optional[float]):
+        # The next solution, _EMPTY if none arrived within timeout
+        deadline = None if timeout is None else timeit.default_timer() + timeout
+        while not self._finished:
+            wait = 0.1 if deadline is None else min(0.1, deadline - timeit.default_timer())
+            try:
+                kind, payload = self._queue.get(timeout=max(wait, 0))
+            except queue.Empty:
+                if self._proc.exitcode is not None and self._queue.empty():
+                    self._finished = True
+                    raise RuntimeError(f"The solver process exited with code {self._proc.exitcode}")
+                if deadline is not None and timeit.default_timer() >= deadline:
+                    return _EMPTY
+                continue
+            if kind == 'solution':
+                self.count += 1
+                return payload
+            self._finished = True
+            if kind == 'error':
+                raise RuntimeError("The solver process failed:\n" + payload)
+            self.status = payload
+        raise StopIteration
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._lock:
+            return self._get(None)
+
+    def take(self, n: int, timeout: tp.Optional[float] = None) -> list:
+        """
+        The next n solutions. Fewer if the enumeration ends first or timeout seconds
+        pass before all of them arrive.
+        """
+        page = []
+        deadline = None if timeout is None else timeit.default_timer() + timeout
+        with self._lock:
+            while len(page) < n:
+                left = None if deadline is None else max(deadline - timeit.default_timer(), 0)
+                try:
+                    sol = self._get(left)
+                except StopIteration:
+                    break
+                if sol is _EMPTY:
+                    break
+                page.append(sol)
+        return page
+
+    def cancel(self):
+        """Stop the enumeration; the worker exits before its next model. Does not block."""
+        self.cancelled = True
+        self._finished = True
+        self._cancel.set()
+
+    def close(self):
+        """Cancel and wait for the worker to exit"""
+        self.cancel()
+        self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
@@ -0,0 +1,166 @@
+"""
+Cache of puzzle solutions keyed by a canonical encoding of the board.
+
+    cache = SolveCache(maxsize=1024, path="solutions.sqlite")
+    solutions = cache.solve(board, solver_name='sat')   # what solver.solve() yields, as a list
+    solutions = cache.solve(board)                       # the same puzzle again: no solver is built
+
+A board is only looked up by what decides its solutions (the clues of a Towers board,
+the numbers of a Dominosa board, ...), in a canonical orientation: the least of its
+rotations and reflections. So a puzzle seen before, also mirrored or rotated, is
+answered from the cache with its solutions mapped back onto the board as given.
+
+Entries live in an in-memory LRU and, when a path is given, in an SQLite table that
+outlives the process. Solver classes opt in through SMTConstraintProblem.cache_entry;
+boards of other solvers are solved every time.
+"""
+
+import pickle
+import sqlite3
+import threading
+import typing as tp
+from collections import OrderedDict
+from dataclasses import dataclass
+from ..board import BoardSymmetry, grid_symmetries
+
+
+@dataclass
+class CacheEntry:
+    # Canonical encoding of the instance
+    key: tp.Hashable
+    # A solution as yielded by solve() -> plain data in the canonical orientation
+    encode: tp.Callable[[tp.Any], tp.Any]
+    # The inverse: stored data -> a solution of the board as given
+    decode: tp.Callable[[tp.Any], tp.Any]
+
+
+def canonical_orientation(nR: int, nC: int, form: tp.Callable[[BoardSymmetry], tp.Any]) -> tp.Tuple[tp.Any, BoardSymmetry]:
+    """
+    The least form(sym) over the identity and every rotation and reflection sym of an
+    nR x nC grid, and the sym that gives it.
+    """
+    syms = [BoardSymmetry(nR, nC, False, False, False)] + grid_symmetries(nR, nC)
+    return min(((form(sym), sym) for sym in syms), key=lambda fs: fs[0])
+
+
+def face_orientation(faces: tp.Iterable[tp.Tuple[int, int]], sym: BoardSymmetry) -> tp.Tuple[tp.Callable, tp.Callable]:
+    """
+    encode/decode for solutions given as values per face: encode maps {face: val} to
+    a tuple over the faces of the canonical orientation, decode maps it back.
+    """
+    faces = sorted(faces)
+
+    def encode(vals: tp.Mapping[tp.Tuple[int, int], tp.Any]) -> tuple:
+        moved = {sym.face(idx): val for idx, val in vals.items()}
+        return tuple(moved[idx] for idx in faces)
+
+    def decode(stored: tuple) -> tp.Dict[tp.Tuple[int, int], tp.Any]:
+        vals = dict(zip(faces, stored))
+        return {idx: vals[sym.face(idx)] for idx in faces}
+
+    return encode, decode
+
+
+class SolveCache:
+    """
+    Solutions per canonical puzzle instance, in an LRU with an optional SQLite tier.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Maximum number of instances kept in memory.
+    path : str, optional
+        SQLite database holding every instance ever stored. Created if missing.
+    """
+
+    def __init__(self, maxsize: int = 1024, path: tp.Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, value BLOB)")
+            self._db.commit()
+
+    def get(self, key) -> tp.Optional[list]:
+        """The stored solutions of key, None if it is not cached"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                return value
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT value FROM solutions WHERE key = ?", (repr(key),)).fetchone()
+            if row is None:
+                return None
+            value = pickle.loads(row[0])
+            self._remember(key, value)
+            return value
+
+    def put(self, key, value: list):
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO solutions (key, value) VALUES (?, ?)",
+                    (repr(key), pickle.dumps(value)),
+                )
+                self._db.commit()
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def solve(self, board, **solver_kwargs) -> list:
+        """
+        The solutions solver.solve() yields for board, from the cache when the
+        instance (or a rotation or reflection of it) was solved before.
+
+        Parameters
+        ----------
+        board :
+            A puzzle board with a registered solver (see batch.register_solver).
+        **solver_kwargs :
+            Passed to the solver. Those that change the solutions (e.g. Flip's
+            goal_value) are part of the key.
+        """
+        from .batch import solver_for
+        from .smt_utils import SolveStatus
+        solver_t = solver_for(board)
+        entry = solver_t.cache_entry(board, **solver_kwargs)
+        if entry is not None:
+            stored = self.get(entry.key)
+            if stored is not None:
+                self.hits += 1
+                return [entry.decode(s) for s in stored]
+            self.misses += 1
+        with solver_t(board, **solver_kwargs) as solver:
+            solutions = list(solver.solve())
+            status = solver.status
+        # A budget running out says nothing about the instance
+        if entry is not None and status != SolveStatus.UNKNOWN:
+            self.put(entry.key, [entry.encode(s) for s in solutions])
+        return solutions
+
+    def clear(self):
+        """Drop every entry, on disk too"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM solutions")
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __len__(self):
+        return len(self._entries)
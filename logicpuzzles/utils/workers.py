@@ -0,0 +1,69 @@
+"""
+Process entry points for SMTConstraintProblem's parallel solves.
+
+    _portfolio_worker   one config of a portfolio race (see SMTConstraintProblem portfolio)
+    _cube_worker_init   builds the problem once per solve_parallel worker process
+    _cube_task          enumerates one cube on that problem
+    _cube_literals      the Bits a cube fixes, looked up by var name
+    _enumerate_cube     the same on a given problem, for workers=0 and for _cube_task
+
+Workers rebuild the problem from its class and constructor arguments and send back
+models keyed by var name, since var ids differ between processes.
+"""
+
+import traceback
+import typing as tp
+from hwtypes import smt_utils as fc
+
+
+def _named(problem, models) -> tp.Iterator[dict]:
+    # The models keyed by var name, as they are read from models
+    names = [(name, v.value) for name, v in problem.var_registry.items()]
+    return ({name: m[raw] for name, raw in names if raw in m} for m in models)
+
+
+def _portfolio_worker(cls, args, kwargs, config, num_sols, results, index):
+    from .smt_utils import SMTConstraintProblem, SolveStatus
+    try:
+        problem = cls(*args, **{**kwargs, **config, 'portfolio': None})
+        problem.ensure_built()
+        models = list(_named(problem, SMTConstraintProblem.solve(problem, num_sols)))
+        if problem.status == SolveStatus.UNKNOWN and not models:
+            results.put((index, None, None))
+        else:
+            results.put((index, models, None))
+    except Exception:
+        results.put((index, None, traceback.format_exc()))
+
+
+# The problem and cube vars of a solve_parallel worker process
+_cube_problem = None
+
+
+def _cube_literals(problem, cube_bits) -> list:
+    # The Bit of each (var name, bit index or None for a Bit) of cube_bits
+    vars = [problem.var_registry[name] for name, _ in cube_bits]
+    return [v if i is None else v[i] for v, (_, i) in zip(vars, cube_bits)]
+
+
+def _cube_worker_init(cls, args, kwargs, cube_bits):
+    global _cube_problem
+    problem = cls(*args, **{**kwargs, 'portfolio': None})
+    problem.ensure_built()
+    _cube_problem = problem, _cube_literals(problem, cube_bits)
+
+
+def _enumerate_cube(problem, cube_vars, cube, timeout, conflicts):
+    # Every model with cube_vars set to cube, and the stats of enumerating them
+    from .smt_utils import SMTConstraintProblem
+    with problem.solve_context():
+        if cube_vars:
+            problem.add_constraint(fc.And([v if val else ~v for v, val in zip(cube_vars, cube)]))
+        models = list(SMTConstraintProblem.AllSAT(problem, timeout, conflicts))
+    return models, problem.enum_stats
+
+
+def _cube_task(cube, timeout, conflicts):
+    problem, cube_vars = _cube_problem
+    models, stats = _enumerate_cube(problem, cube_vars, cube, timeout, conflicts)
+    return list(_named(problem, models)), stats
@@ -0,0 +1,26 @@
+import copy
+from benchmarks.instances import PUZZLES, SIZES, make_board
+from benchmarks.run import METRICS, compare, run_suite
+
+
+def test_instances_fixed():
+    a, b = make_board('towers', 5, 3), make_board('towers', 5, 3)
+    assert a.clues == b.clues
+    assert a.clues != make_board('towers', 5, 4).clues
+    a, b = make_board('mines', SIZES['mines'][0], 3), make_board('mines', SIZES['mines'][0], 3)
+    assert a.revealed == b.revealed
+    assert [c.is_mine for c in a.solution.f.values()] == [c.is_mine for c in b.solution.f.values()]
+
+
+def test_run_suite():
+    results = run_suite(PUZZLES, ['sat'], max_size=1, repeat=1, max_models=5)
+    assert [r['puzzle'] for r in results] == list(PUZZLES)
+    for r in results:
+        assert all(r[m]['min'] >= 0 for m in METRICS)
+        assert r['enumerate']['models'] <= 5
+        assert r['unique']['solutions'] == min(r['enumerate']['models'], 2)
+    assert compare(results, results) == []
+    slower = copy.deepcopy(results)
+    slower[0]['first']['min'] = 2 * results[0]['first']['min'] + 1
+    [reg] = compare(slower, results)
+    assert reg['metric'] == 'first' and reg['puzzle'] == PUZZLES[0]
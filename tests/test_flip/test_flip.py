@@ -22,4 +22,21 @@ for i in range(N_TRIALS):
             break
     if is_sat:
         num_sat += 1
-print(f"Number of satisfiable solutions: {num_sat} out of {N_TRIALS}")
\ No newline at end of file
+print(f"Number of satisfiable solutions: {num_sat} out of {N_TRIALS}")
+
+
+def test_flip_fewest():
+    # Pressing these cells darkens the board, so pressing them again solves it
+    presses = [(0, 0), (1, 3), (2, 2), (4, 1)]
+    grid = [[0] * 5 for _ in range(5)]
+    for r, c in presses:
+        for dr, dc in [(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1)]:
+            if 0 <= r + dr < 5 and 0 <= c + dc < 5:
+                grid[r + dr][c + dc] ^= 1
+    for solver_name in ['z3', 'sat']:
+        solver = FlipSolver(FlipBoard(5, grid), solver_name=solver_name)
+        sol = solver.solve_fewest()
+        other = FlipSolver(FlipBoard(5, grid), solver_name=solver_name)
+        other.ensure_built()
+        counts = [int(s.sum()) for s in other.solve_arrays(other.layout, 0)]
+        assert sum(map(sum, sol)) == min(counts) <= len(presses)
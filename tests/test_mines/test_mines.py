@@ -0,0 +1,98 @@
+import itertools
+import time
+from fractions import Fraction
+from types import SimpleNamespace
+import pytest
+from logicpuzzles.mines.minesweeper import MineBoard
+from logicpuzzles.mines.minesweeper_solver import MinesweeperSolver
+
+
+def _game(rows, revealed):
+    # rows draws the mines as '*'; revealed lists the opened cells
+    board = MineBoard(len(rows), len(rows[0]))
+    for (r, c), cell in board.f.items():
+        cell.is_mine = rows[r][c] == '*'
+    for idx, cell in board.f.items():
+        cell.adjacent_mines = sum(f.is_mine for f in board.face_to_faces(idx, include_diagonals=True))
+    mines = sum(row.count('*') for row in rows)
+    return SimpleNamespace(width=len(rows[0]), height=len(rows), mines=mines, solution=board, revealed=set(revealed))
+
+
+def _layouts(game):
+    # Every placement of the mines on unrevealed cells that agrees with the revealed numbers
+    board = game.solution
+    hidden = [idx for idx in board.f if idx not in game.revealed]
+    for mines in itertools.combinations(hidden, game.mines):
+        mines = set(mines)
+        if all(
+            sum((f.r, f.c) in mines for f in board.face_to_faces(idx, include_diagonals=True))
+            == board.f[idx].adjacent_mines
+            for idx in game.revealed
+        ):
+            yield mines
+
+
+@pytest.mark.parametrize('solver_name', ['z3', 'sat'])
+def test_determinable_cells(solver_name):
+    game = _game(
+        ["....",
+         "....",
+         "*..*",
+         ".*.."],
+        [(0, 0), (0, 1), (0, 2), (0, 3), (1, 0), (1, 1), (1, 2), (1, 3), (2, 1), (2, 2)],
+    )
+    layouts = list(_layouts(game))
+    expected = {
+        idx: idx in layouts[0]
+        for idx in game.solution.f if idx not in game.revealed
+        if len({idx in mines for mines in layouts}) == 1
+    }
+    assert expected == {(2, 0): True, (2, 3): True, (3, 0): False, (3, 3): False}
+    solver = MinesweeperSolver(game, solver_name=solver_name)
+    assert dict(solver.find_determinable_cells()) == expected
+
+
+def test_mine_probabilities():
+    # (2, 3), (2, 4) and the bottom row are interior: no revealed number touches them
+    game = _game(
+        [".....",
+         "..*..",
+         "*...*",
+         "...*."],
+        [(0, 0), (0, 1), (1, 0), (1, 1), (0, 3), (0, 4)],
+    )
+    layouts = list(_layouts(game))
+    expected = {
+        idx: Fraction(sum(idx in mines for mines in layouts), len(layouts))
+        for idx in game.solution.f if idx not in game.revealed
+    }
+    assert expected[(0, 2)] == Fraction(1, 2) and expected[(1, 3)] == 0 and expected[(3, 0)] == Fraction(2, 7)
+    probs = MinesweeperSolver(game).mine_probabilities()
+    assert probs.keys() == expected.keys()
+    for idx, p in expected.items():
+        assert probs[idx] == pytest.approx(float(p))
+
+
+def test_mine_probabilities_beginner():
+    # 9x9 with 10 mines and the cells with r + c <= 7 opened
+    game = _game(
+        ["........*",
+         ".........",
+         ".......*.",
+         "......*..",
+         ".....*...",
+         ".....*.*.",
+         "...*.....",
+         "..*......",
+         ".*......*"],
+        [(r, c) for r in range(9) for c in range(9) if r + c <= 7],
+    )
+    solver = MinesweeperSolver(game)
+    t = time.monotonic()
+    probs = solver.mine_probabilities()
+    assert time.monotonic() - t < 10
+    assert len(probs) == 81 - len(game.revealed)
+    # The probabilities add up to the expected number of mines, which is all of them
+    assert sum(probs.values()) == pytest.approx(game.mines)
+    for idx, is_mine in MinesweeperSolver(game, solver_name='sat').find_determinable_cells():
+        assert probs[idx] == float(is_mine)
@@ -12,3 +12,45 @@ print("\nSolution:")
 for solution in solver.solve():
     print(solution.pretty())
     break  # Just show first solution
+
+
+def test_towers_session():
+    from logicpuzzles.towers.towers_solver import TowersSession
+    from logicpuzzles.utils.smt_utils import SolveStatus
+    board = TowersBoard(N=4)
+    session = TowersSession(board)
+    solution = session.solution()
+    assert solution is not None
+    for (r, c), face in solution.f.items():
+        assert not session.is_solved()
+        session.set_cell(r, c, face.val)
+        assert session.check() == SolveStatus.SAT
+    assert session.is_solved()
+    wrong = solution.f[(0, 0)].val % 4 + 1
+    session.set_cell(0, 0, wrong)
+    assert session.check() == SolveStatus.UNSAT
+    assert (0, 0) in session.conflicts()
+    session.clear_cell(0, 0)
+    assert session.check() == SolveStatus.SAT and not session.is_solved()
+    assert session.solution().f[(0, 0)].val == solution.f[(0, 0)].val
+
+
+def test_towers_nearest_solution():
+    import random
+    from logicpuzzles.towers.towers_solver import TowersSession
+    from logicpuzzles.utils.smt_utils import SolveStatus
+    random.seed(1)
+    board = TowersBoard(N=5)
+    session = TowersSession(board)
+    solution = session.solution()
+    assert session.nearest_solution()[1] == []
+    for (r, c), face in solution.f.items():
+        if (r + c) % 2 == 0:
+            session.set_cell(r, c, face.val)
+    for r, c in [(0, 0), (2, 2)]:
+        session.set_cell(r, c, solution.f[(r, c)].val % 5 + 1)
+    near, changed = session.nearest_solution()
+    assert 1 <= len(changed) <= 2
+    for cell, val in session.entries.items():
+        assert cell in changed or near.f[cell].val == val
+    assert session.check() == SolveStatus.UNSAT
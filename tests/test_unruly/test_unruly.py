@@ -67,6 +67,30 @@ def test_initial_constraints():
     assert solution[(0,0)] == 1  # white
     assert solution[(0,1)] == 0  # black
 
+def test_unruly_uniqueness():
+    clues = UnrulyBoard(6, [
+        [2, 2, 2, 2, 2, 2],
+        [2, 2, 1, 2, 2, 2],
+        [1, 2, 2, 2, 0, 1],
+        [1, 2, 2, 2, 2, 2],
+        [2, 0, 2, 2, 2, 2],
+        [2, 2, 2, 2, 2, 1],
+    ])
+    solver = UnrulySolver(clues, solver_name='sat')
+    assert solver.count_solutions() == 2
+    assert not solver.is_unique()
+    assert solver.count_solutions(limit=None) == 18
+    # Counting leaves the solver usable
+    solution = next(solver.solve())
+    # A full enumeration does not change later counts
+    assert sum(1 for _ in solver.solve_arrays(solver.face_layout, 0)) == 18
+    assert solver.count_solutions(limit=None) == 18
+
+    full = UnrulyBoard(6, [[solution.f[(r, c)].val for c in range(6)] for r in range(6)])
+    solver = UnrulySolver(full)
+    assert solver.count_solutions() == 1
+    assert solver.is_unique()
+
 #test_basic_unruly_solve()
 #test_initial_constraints()
 
@@ -0,0 +1,54 @@
+import random
+import threading
+import pytest
+from logicpuzzles.utils.smt_utils import SolveStatus
+from logicpuzzles.utils.batch import solve_many
+from logicpuzzles.towers.towers import TowersBoard
+from logicpuzzles.unruly.unruly import UnrulyBoard
+from logicpuzzles.dominosa.dominosa import DominosaBoard
+from logicpuzzles.flip.flip import FlipBoard
+
+
+def _boards():
+    random.seed(0)
+    return [TowersBoard(4), UnrulyBoard(6, percent_filled=0.1), DominosaBoard(4), FlipBoard(3), TowersBoard(5)]
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_solve_many(workers):
+    boards = _boards()
+    results = list(solve_many(boards, workers=workers, chunksize=2, ordered=True))
+    assert [r.index for r in results] == list(range(len(boards)))
+    assert all(r.error is None and r.elapsed > 0 for r in results)
+    assert results[0].solved and results[2].solved
+
+
+def test_solve_many_unordered():
+    boards = _boards()
+    results = list(solve_many(boards, workers=2, solver_kwargs={'solver_name': 'sat'}))
+    assert sorted(r.index for r in results) == list(range(len(boards)))
+
+
+def test_solve_many_cancel():
+    boards = (TowersBoard(4) for _ in range(100))
+    results = solve_many(boards, workers=2)
+    next(results)
+    results.close()
+
+    cancel = threading.Event()
+    cancel.set()
+    assert list(solve_many([TowersBoard(4)], workers=0, cancel=cancel)) == []
+
+
+def test_solve_many_error():
+    res, = solve_many([object()], workers=0)
+    assert res.error is not None and not res.solved
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_solve_many_budget(workers):
+    # A zero budget runs out before the first check
+    res, = solve_many([TowersBoard(4)], workers=workers, solver_kwargs={'timeout': 0})
+    assert res.error is None and res.status == SolveStatus.UNKNOWN and not res.solved
+    res, = solve_many([TowersBoard(4)], workers=workers)
+    assert res.status == SolveStatus.SAT and res.solved
@@ -0,0 +1,56 @@
+import random
+import pytest
+from logicpuzzles.utils.smt_utils import SMTConstraintProblem
+from logicpuzzles.towers.towers import TowersBoard
+from logicpuzzles.towers.towers_solver import TowersSolver
+from logicpuzzles.unruly.unruly import UnrulyBoard
+from logicpuzzles.unruly.unruly_solver import UnrulySolver
+
+
+def _check_towers(board, solution):
+    N = board.N
+    rows = [[solution.f[(r, c)].val for c in range(N)] for r in range(N)]
+    assert all(sorted(row) == list(range(1, N + 1)) for row in rows)
+    assert all(sorted(col) == list(range(1, N + 1)) for col in zip(*rows))
+
+
+def test_portfolio_towers():
+    random.seed(0)
+    board = TowersBoard(4)
+    portfolio = [{'solver_name': 'z3'}, {'solver_name': 'sat'}, {'solver_name': 'no-such-solver'}]
+    solver = TowersSolver(board, portfolio=portfolio)
+    _check_towers(board, next(solver.solve()))
+    res = solver.portfolio_result
+    assert res.config in portfolio[:2] and res.elapsed > 0
+    key = ('TowersSolver', tuple(sorted(res.config.items())))
+    assert SMTConstraintProblem.portfolio_wins[key] >= 1
+
+
+def test_portfolio_all_fail():
+    random.seed(0)
+    solver = TowersSolver(TowersBoard(3), portfolio=[{'solver_name': 'no-such-solver'}])
+    with pytest.raises(RuntimeError):
+        next(solver.solve())
+    assert list(solver.portfolio_result.errors) == [0]
+
+
+def test_unruly_encodings():
+    # Seven clues leave 18 solutions, few enough to enumerate on every encoding
+    board = UnrulyBoard(6, [
+        [2, 2, 2, 2, 2, 2],
+        [2, 2, 1, 2, 2, 2],
+        [1, 2, 2, 2, 0, 1],
+        [1, 2, 2, 2, 2, 2],
+        [2, 0, 2, 2, 2, 2],
+        [2, 2, 2, 2, 2, 1],
+    ])
+    counts = []
+    for encoding in UnrulySolver.NO_CONSECUTIVE_ENCODINGS:
+        solver = UnrulySolver(board, no_consecutive=encoding, solver_name='sat')
+        counts.append(solver.count_solutions(limit=None))
+    assert counts == [18, 18]
+
+    portfolio = [{'no_consecutive': e, 'solver_name': 'sat'} for e in UnrulySolver.NO_CONSECUTIVE_ENCODINGS]
+    solution = next(UnrulySolver(board, portfolio=portfolio).solve())
+    assert all(sum(solution.f[(r, c)].val for c in range(6)) == 3 for r in range(6))
+    assert solution.f[(1, 2)].val == 1 and solution.f[(4, 1)].val == 0
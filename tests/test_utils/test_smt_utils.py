@@ -0,0 +1,629 @@
+import itertools as it
+import json
+import math
+import numpy as np
+import shutil
+import subprocess
+import time
+import pytest
+from hwtypes import smt_utils as fc
+from concurrent.futures import ThreadPoolExecutor
+from logicpuzzles.utils.smt_utils import SMTConstraintProblem, SolveStatus, VarCache
+from logicpuzzles.utils.profiler import Profiler
+from logicpuzzles.utils.model_array import ModelLayout
+from logicpuzzles.utils.sat_solver import make_sat_solver
+
+SOLVERS = ['z3', 'z3-native', 'sat', 'sat-bundled']
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+def test_allsat_counts(solver_name):
+    problem = SMTConstraintProblem(default_bvlen=4, solver_name=solver_name)
+    x = problem.new_var("allsat_x", 0)
+    y = problem.new_var("allsat_y", 0)
+    v = problem.new_var("allsat_v")
+    problem.add_constraint(fc.Or([x, y]))
+    problem.add_constraint(v < 3)
+    models = list(problem.solve(0))
+    assert len(models) == 9
+    assert len({tuple(m.values()) for m in models}) == 9
+    assert problem.enum_stats.models == 9
+    assert problem.enum_stats.models_per_sec > 0
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+def test_allsat_positive_blocking(solver_name):
+    # Exactly one of three is true, so blocking on the true var alone is sound
+    problem = SMTConstraintProblem(block_mode='positive', solver_name=solver_name)
+    vs = [problem.new_var(f"onehot_{i}", 0) for i in range(3)]
+    problem.add_constraint(problem.gen_total(vs) == 1)
+    models = list(problem.solve(0))
+    assert sorted(tuple(m[v.value] for v in vs) for m in models) == [(0, 0, 1), (0, 1, 0), (1, 0, 0)]
+    assert problem.enum_stats.block_lits == 3
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+def test_allsat_leaves_problem_solvable(solver_name):
+    problem = SMTConstraintProblem(default_bvlen=3, solver_name=solver_name)
+    x = problem.new_var("leave_x")
+    b = problem.new_var("leave_b", 0)
+    problem.add_constraint(x == 5)
+    problem.add_constraint(b)
+    assert len(list(problem.solve(0))) == 1
+    assert problem.status == SolveStatus.UNSAT
+    # The blocking clauses of a finished enumeration do not outlive it
+    assert problem.check() == SolveStatus.SAT
+    assert problem.is_unique()
+    assert problem.backbone([x, b]) == {x.value: 5, b.value: 1}
+    assert len(list(problem.solve(0))) == 1
+    # Nor do those of one closed early
+    y = problem.new_var("leave_y")
+    problem.add_constraint(y < 2)
+    next(iter(problem.solve(0)))
+    assert problem.count_solutions(limit=None) == 2
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+def test_allsat_closed_after_reset(solver_name):
+    problem = SMTConstraintProblem(default_bvlen=3, solver_name=solver_name)
+    x = problem.new_var("reset_x")
+    problem.add_constraint(x < 3)
+    models = problem.AllSAT()
+    next(models)
+    problem.reset_solver()
+    x = problem.new_var("reset_x")
+    problem.add_constraint(x < 5)
+    # Closing the old enumeration must not touch the new solver
+    del models
+    assert problem.count_solutions(limit=None) == 5
+    assert len(list(problem.solve(0))) == 5
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+def test_solve_context(solver_name):
+    problem = SMTConstraintProblem(solver_name=solver_name)
+    x = problem.new_var("ctx_x", 0)
+    with problem.solve_context():
+        problem.add_constraint(x & ~x)
+        assert problem.is_unsat()
+    assert problem.is_sat()
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+@pytest.mark.parametrize('op, k', [('==', 2), ('!=', 2), ('<=', 1), ('<', 3), ('>=', 4), ('>', 0)])
+def test_total_comparisons(solver_name, op, k):
+    problem = SMTConstraintProblem(solver_name=solver_name)
+    vs = [problem.new_var(f"card_{i}", 0) for i in range(5)]
+    total = problem.gen_total(vs)
+    problem.add_constraint({
+        '==': total == k, '!=': total != k, '<=': total <= k,
+        '<': total < k, '>=': total >= k, '>': total > k,
+    }[op])
+    expected = sum(1 for bits in it.product((0, 1), repeat=5) if eval(f"{sum(bits)} {op} {k}"))
+    assert len(list(problem.solve(0))) == expected
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+def test_bitvector_ops(solver_name):
+    problem = SMTConstraintProblem(default_bvlen=3, solver_name=solver_name)
+    a = problem.new_var("bvops_a")
+    b = problem.new_var("bvops_b")
+    problem.add_constraint(((a + b) == (a * b)) | (a.bvslt(b) & ((a >> 1) == (b - a))))
+    models = {(m[a.value], m[b.value]) for m in problem.solve(0)}
+
+    def signed(x):
+        return x - 8 if x & 4 else x
+    expected = {
+        (x, y) for x in range(8) for y in range(8)
+        if (x + y) % 8 == (x * y) % 8 or (signed(x) < signed(y) and x >> 1 == (y - x) % 8)
+    }
+    assert models == expected
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+def test_var_registry(solver_name):
+    p1 = SMTConstraintProblem(solver_name=solver_name)
+    p2 = SMTConstraintProblem(solver_name=solver_name)
+    x1 = p1.new_var("reg_x", 0)
+    assert p1.new_var("reg_x", 0) is x1
+    assert len(p1.var_registry) == 1 and "reg_x_0" in p1.var_registry
+    x2 = p2.new_var("reg_x", 0)
+    p1.add_constraint(x1)
+    p2.add_constraint(~x2)
+    assert [m[x1.value] for m in p1.solve(0)] == [1]
+    assert [m[x2.value] for m in p2.solve(0)] == [0]
+    with p1:
+        pass
+    assert len(p1.var_registry) == 0
+
+
+def test_var_cache():
+    cache = VarCache(maxsize=2)
+    problems = [SMTConstraintProblem(var_cache=cache) for _ in range(2)]
+    a = problems[0].new_var("cache_a", 0)
+    assert problems[1].new_var("cache_a", 0) is a
+    problems[0].new_var("cache_b", 0)
+    problems[0].new_var("cache_c", 0)
+    assert len(cache) == 2
+    weak = VarCache(weak=True)
+    p = SMTConstraintProblem(var_cache=weak)
+    p.new_var("cache_w", 0)
+    assert len(weak) == 1
+    p.close()
+    del p
+    assert len(weak) == 0
+
+
+# z3-native builds terms on z3's main context, which is not thread safe
+@pytest.mark.parametrize('solver_name', [s for s in SOLVERS if s != 'z3-native'])
+def test_threads(solver_name):
+    def count(k):
+        problem = SMTConstraintProblem(default_bvlen=4, solver_name=solver_name)
+        v = problem.new_var("thread_v")
+        problem.add_constraint(v < k)
+        return len(list(problem.solve(0)))
+
+    with ThreadPoolExecutor(4) as pool:
+        assert list(pool.map(count, range(1, 9))) == list(range(1, 9))
+
+
+def _pigeonhole(problem, n):
+    # n + 1 pigeons in n holes: unsat, and hard for every solver we have
+    x = [[problem.new_var(f"php_{p}_{h}", 0) for h in range(n)] for p in range(n + 1)]
+    for row in x:
+        problem.add_constraint(fc.Or(row))
+    for h in range(n):
+        for p1, p2 in it.combinations(range(n + 1), 2):
+            problem.add_constraint(~(x[p1][h] & x[p2][h]))
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+def test_budget(solver_name):
+    problem = SMTConstraintProblem(solver_name=solver_name, timeout=200)
+    _pigeonhole(problem, 11)
+    t = time.monotonic()
+    assert problem.is_sat() is None
+    assert problem.is_unsat() is None
+    assert problem.status == SolveStatus.UNKNOWN
+    assert list(problem.solve()) == []
+    assert time.monotonic() - t < 10
+    assert problem.check(timeout=60000, conflicts=10) == SolveStatus.UNKNOWN
+
+    small = SMTConstraintProblem(solver_name=solver_name, timeout=200)
+    _pigeonhole(small, 2)
+    assert small.check() == SolveStatus.UNSAT
+    assert small.is_unsat() is True
+
+    # Without a timeout enumerations are unbounded and end by exhausting the models
+    unbounded = SMTConstraintProblem(default_bvlen=3, solver_name=solver_name)
+    assert unbounded.timeout is None
+    unbounded.new_var("budget_v")
+    assert len(list(unbounded.solve(0))) == 8 and unbounded.status == SolveStatus.UNSAT
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+def test_check_assumptions(solver_name):
+    problem = SMTConstraintProblem(default_bvlen=4, solver_name=solver_name)
+    x = problem.new_var("assume_x", 0)
+    y = problem.new_var("assume_y", 0)
+    v = problem.new_var("assume_v")
+    problem.add_constraint(fc.Implies(x, v < 3))
+    problem.add_constraint(x | y)
+    assumptions = [y, v == 5, x]
+    assert problem.check_assumptions(assumptions) == SolveStatus.UNSAT
+    assert sorted(map(id, problem.unsat_core())) == sorted(map(id, assumptions[1:]))
+    assert problem.check_assumptions([~y, v == 5]) == SolveStatus.UNSAT
+    assert problem.check_assumptions([y, v == 5]) == SolveStatus.SAT
+    model = problem.model()
+    assert model[y.value] == 1 and model[v.value] == 5 and model[x.value] == 0
+    with pytest.raises(ValueError):
+        problem.unsat_core()
+    # Assumptions do not stick
+    assert problem.check_assumptions([]) == SolveStatus.SAT
+    assert len(list(problem.solve(0))) == 22
+    with pytest.raises(ValueError):
+        problem.model()
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+def test_minimal_correction(solver_name):
+    problem = SMTConstraintProblem(default_bvlen=4, solver_name=solver_name)
+    bits = [problem.new_var(f"mcs_{i}", 0) for i in range(4)]
+    v = problem.new_var("mcs_v")
+    x = problem.new_int_var("mcs_x", 1, 5, encoding='order')
+    problem.add_constraint(~(bits[0] & bits[1]))
+    problem.add_constraint(fc.Implies(bits[2], v < 3))
+    problem.add_constraint(fc.Implies(x == 3, bits[2]))
+    problem.set_phases([(bits[0], 1), (bits[1], 1), (v, 7), (x, 3)])
+    soft = [bits[0], bits[1], bits[2], v == 7, x == 3, bits[3]]
+    dropped = problem.minimal_correction(soft)
+    # One of bits[0]/bits[1], and either v == 7 or both bits[2] and x == 3
+    assert len(dropped) in (2, 3) and not any(d is bits[3] for d in dropped)
+    assert sum(d is bits[0] or d is bits[1] for d in dropped) == 1
+    model = problem.model()
+    kept = [c for c in soft if not any(c is d for d in dropped)]
+    assert problem.check_assumptions(kept) == SolveStatus.SAT
+    for d in dropped:
+        assert problem.check_assumptions(kept + [d]) == SolveStatus.UNSAT
+    assert model[bits[3].value] == 1
+    assert problem.minimal_correction([bits[2], bits[3]]) == []
+
+    problem.add_constraint(bits[3] & ~bits[3])
+    assert problem.minimal_correction(soft) is None and problem.status == SolveStatus.UNSAT
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+def test_optimize(solver_name):
+    problem = SMTConstraintProblem(default_bvlen=5, solver_name=solver_name)
+    v = problem.new_var("opt_v")
+    w = problem.new_var("opt_w")
+    x = problem.new_int_var("opt_x", 2, 9, encoding='order')
+    problem.add_constraint(v + w == 20)
+    problem.add_constraint(v > 3)
+    problem.add_constraint(w <= 14)
+    problem.add_constraint(x.ge(4))
+    res = problem.minimize(v)
+    assert res.value == 6 and res.optimal and problem.model()[v.value] == 6
+    assert problem.maximize(v).value == 20
+    assert problem.minimize(x).value == 4 and problem.maximize(x).value == 9
+
+    bits = [problem.new_var(f"opt_b{i}", 0) for i in range(5)]
+    problem.add_constraint(~(bits[0] & bits[1]))
+    problem.add_constraint(~(bits[2] & bits[3]))
+    assert problem.maximize(problem.gen_total(bits)).value == 3
+    res = problem.maxsat(bits)
+    assert res.value == 2 and len(res.violated) == 2 and not any(b is bits[4] for b in res.violated)
+    res = problem.maxsat(bits, [1, 5, 2, 1, 3])
+    assert res.value == 2 and [b is bits[0] or b is bits[3] for b in res.violated] == [True, True]
+    with pytest.raises(ValueError):
+        problem.maxsat(bits, [1, 2])
+
+    problem.add_constraint(v == 2)
+    res = problem.minimize(v)
+    assert res.value is None and not res.optimal and problem.status == SolveStatus.UNSAT
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 32])
+@pytest.mark.parametrize("solver_name", SOLVERS)
+def test_backbone(solver_name, chunk_size):
+    problem = SMTConstraintProblem(default_bvlen=3, solver_name=solver_name)
+    bits = [problem.new_var(f"bb_{i}", 0) for i in range(6)]
+    v = problem.new_var("bb_v")
+    w = problem.new_var("bb_w")
+    problem.add_constraint(bits[0] | bits[1])
+    problem.add_constraint(~bits[0] | bits[2])
+    problem.add_constraint(~bits[1] | bits[2])
+    problem.add_constraint(~bits[3])
+    problem.add_constraint(fc.Implies(bits[2], v == 5))
+    problem.add_constraint(bits[4] ^ bits[5])
+    problem.add_constraint(w > 5)
+    vars = bits + [v, w]
+    with problem.solve_context():
+        models = list(problem.solve(0))
+    expected = {
+        x.value: models[0][x.value] for x in vars
+        if len({m[x.value] for m in models}) == 1
+    }
+    assert set(expected) == {bits[2].value, bits[3].value, v.value}
+    assert problem.backbone(vars, chunk_size=chunk_size) == expected
+    assert problem.status == SolveStatus.SAT
+    # The probes leave the problem unchanged
+    with problem.solve_context():
+        assert len(list(problem.solve(0))) == len(models)
+    problem.add_constraint(bits[3])
+    assert problem.backbone(vars, chunk_size=chunk_size) is None
+    assert problem.status == SolveStatus.UNSAT
+
+
+@pytest.mark.parametrize("solver_name", SOLVERS)
+def test_backbone_discards_model(solver_name):
+    profiler = Profiler()
+    problem = SMTConstraintProblem(solver_name=solver_name, profiler=profiler)
+    a, b = problem.new_var("bbm_a", 0), problem.new_var("bbm_b", 0)
+    problem.add_constraint(a | b)
+    assert problem.check_assumptions([b]) == SolveStatus.SAT
+    problem.model()
+    assert problem.backbone([a, b]) == {}
+    with pytest.raises(ValueError):
+        problem.model()
+    # The probes are recorded like any other check
+    assert profiler.report()['check']['calls'] > 1
+
+
+class _Built(SMTConstraintProblem):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.bs = [self.new_var(f"built_b_{i}", 0) for i in range(2)]
+
+    def build(self):
+        self.add_constraint(self.bs[0] & ~self.bs[1])
+
+
+@pytest.mark.parametrize("solver_name", SOLVERS)
+def test_backbone_builds(solver_name):
+    problem = _Built(solver_name=solver_name)
+    assert problem.backbone(problem.bs) == {problem.bs[0].value: 1, problem.bs[1].value: 0}
+
+
+@pytest.mark.parametrize("solver_name", SOLVERS)
+def test_count_solutions(solver_name):
+    problem = SMTConstraintProblem(default_bvlen=3, solver_name=solver_name)
+    x = problem.new_var("count_x")
+    problem.add_constraint(x < 4)
+    assert problem.count_solutions() == 2
+    assert problem.count_solutions(limit=3) == 3
+    assert problem.count_solutions(limit=None) == 4
+    assert not problem.is_unique()
+    with problem.solve_context():
+        problem.add_constraint(x == 2)
+        assert problem.count_solutions() == 1
+        assert problem.is_unique()
+    problem.add_constraint(x == 7)
+    assert problem.count_solutions() == 0
+    assert problem.is_unique() is False
+    with pytest.raises(ValueError):
+        problem.count_solutions(limit=0)
+
+
+@pytest.mark.parametrize("solver_name", SOLVERS)
+def test_count_models(solver_name):
+    problem = SMTConstraintProblem(default_bvlen=4, solver_name=solver_name, timeout=None)
+    xs = [problem.new_var(f"mc_{i}", 0) for i in range(8)]
+    v = problem.new_var("mc_v")
+    problem.add_constraint(problem.gen_total(xs) <= 3)
+    problem.add_constraint(xs[0] | xs[1])
+    problem.add_constraint(v < 11)
+    with problem.solve_context():
+        expected = len(list(problem.solve(0)))
+    assert expected == 11 * sum(
+        1 for bits in it.product((0, 1), repeat=8) if sum(bits) <= 3 and (bits[0] or bits[1])
+    )
+    estimate = problem.count_models(method='approx', epsilon=2, delta=0.5, seed=0)
+    assert expected / 3 <= estimate <= expected * 3
+    # Few enough solutions are counted exactly
+    assert problem.count_models(method='approx', projection=xs[:3], assumptions=[~xs[2]]) == 3
+    if solver_name.startswith('sat'):
+        assert problem.count_models() == expected
+        assert problem.count_models(projection=[v]) == 11
+        assert problem.count_models(assumptions=[xs[0], xs[1]]) == 11 * 7
+        assert problem.count_models_by_total(xs, projection=[]) == [0, 2, 13, 36, 0, 0, 0, 0, 0]
+    else:
+        with pytest.raises(ValueError):
+            problem.count_models(method='exact')
+
+
+@pytest.mark.parametrize("solver_name", SOLVERS)
+def test_constraint_ir(solver_name):
+    problem = SMTConstraintProblem(default_bvlen=4, solver_name=solver_name, verbose=True)
+    a = problem.new_var("ir_a")
+    b = problem.new_var("ir_b")
+    x = problem.new_var("ir_x", 0)
+    y = problem.new_var("ir_y", 0)
+    problem.add_constraint(a != b)
+    problem.add_constraint(b != a)
+    problem.add_constraint(fc.And([a != b, fc.And([x | y, a < 3])]))
+    problem.add_constraint(fc.Or([fc.Or([x, y]), problem.Bit(0)]))
+    problem.add_constraint(problem.Bit(1))
+    problem.add_constraint(fc.Implies(x, y))
+    assert len(problem.constraints) == 4
+    with problem.solve_context():
+        problem.add_constraint(a == b)
+        assert len(problem.constraints) == 5
+    assert len(problem.constraints) == 4
+    assert len(list(problem.solve(0))) == 3 * 15 * 2
+    with pytest.raises(ValueError):
+        problem.add_constraint(a)
+
+
+@pytest.mark.parametrize("encoding", SMTConstraintProblem.ALL_DIFFERENT_ENCODINGS)
+@pytest.mark.parametrize("solver_name", SOLVERS)
+def test_all_different(solver_name, encoding):
+    for n, domain in [(3, range(1, 4)), (3, range(0, 5)), (1, range(2, 4))]:
+        problem = SMTConstraintProblem(default_bvlen=3, solver_name=solver_name)
+        vs = [problem.new_var(f"ad_{i}") for i in range(n)]
+        if encoding == 'distinct':
+            for v in vs:
+                problem.add_constraint(v >= domain.start)
+                problem.add_constraint(v < domain.stop)
+        problem.all_different(vs, domain, encoding)
+        models = list(problem.solve(0))
+        assert len(models) == math.perm(len(domain), n)
+        for m in models:
+            vals = [m[v.value] for v in vs]
+            assert len(set(vals)) == n and all(val in domain for val in vals)
+    problem = SMTConstraintProblem(default_bvlen=2, solver_name=solver_name)
+    vs = [problem.new_var(f"ad_free_{i}") for i in range(3)]
+    if encoding == 'onehot':
+        with pytest.raises(ValueError):
+            problem.all_different(vs, encoding=encoding)
+    else:
+        problem.all_different(vs, encoding=encoding)
+        assert len(list(problem.solve(0))) == 4 * 3 * 2
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+@pytest.mark.parametrize('encoding', ['onehot', 'order', 'log'])
+def test_int_var(solver_name, encoding):
+    problem = SMTConstraintProblem(solver_name=solver_name)
+    x = problem.new_int_var("x", 2, 6, encoding)
+    y = problem.new_int_var("y", 0, 4, encoding)
+    z = problem.new_int_var("z", 1, 3, 'onehot' if encoding != 'onehot' else 'order')
+    problem.add_constraint(x > y)
+    problem.add_constraint(x != 4)
+    problem.add_constraint(y >= 1)
+    problem.add_constraint(x + 1 <= 6)
+    problem.add_constraint(z <= y)
+    problem.add_constraint(x.bv(4) + y.bv(4) != problem.BitVector[4](7))
+    expected = {
+        (a, b, c)
+        for a in range(2, 7) for b in range(0, 5) for c in range(1, 4)
+        if a > b and a != 4 and b >= 1 and a + 1 <= 6 and c <= b and a + b != 7
+    }
+    models = {(m[x.value], m[y.value], m[z.value]) for m in problem.solve(0)}
+    assert models == expected
+
+    problem = SMTConstraintProblem(solver_name=solver_name)
+    vs = [problem.new_int_var(f"p_{i}", 1, 3, encoding) for i in range(3)]
+    problem.all_different(vs, range(1, 4))
+    assert sorted(tuple(m[v.value] for v in vs) for m in problem.solve(0)) == sorted(it.permutations(range(1, 4)))
+    with pytest.raises(ValueError):
+        problem.new_int_var("empty", 3, 2, encoding)
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+@pytest.mark.parametrize('symmetry_breaking', [False, True])
+def test_symmetry_breaking(solver_name, symmetry_breaking):
+    # Three bits with exactly one set, symmetric under rotation
+    problem = SMTConstraintProblem(solver_name=solver_name, symmetry_breaking=symmetry_breaking)
+    bs = [problem.new_var(f"sym_b_{i}", 0) for i in range(3)]
+    problem.add_constraint(problem.gen_total(bs) == 1)
+    problem.add_symmetry(zip(bs, bs[1:] + bs[:1]))
+    problem.add_symmetry(zip(bs, bs[2:] + bs[:2]))
+    models = [tuple(m[b.value] for b in bs) for m in problem.solve(0)]
+    assert len(models) == (1 if symmetry_breaking else 3)
+
+    # Two different values out of 1..3, symmetric under swapping the vars
+    problem = SMTConstraintProblem(default_bvlen=2, solver_name=solver_name, symmetry_breaking=symmetry_breaking)
+    x, y = problem.new_var("sym_x"), problem.new_int_var("sym_y", 0, 3, 'order')
+    z = problem.new_int_var("sym_z", 0, 3, 'order')
+    problem.add_constraint(y != z)
+    problem.add_constraint(y >= 1)
+    problem.add_constraint(z >= 1)
+    problem.add_constraint(x == 0)
+    problem.add_symmetry([(y, z), (z, y), (x, x)])
+    models = {(m[y], m[z]) for m in problem.solve(0)}
+    if symmetry_breaking:
+        assert models == {(1, 2), (1, 3), (2, 3)}
+    else:
+        assert len(models) == 6
+    with pytest.raises(ValueError):
+        problem.add_symmetry([(y, z)])
+
+
+class _Profiled(SMTConstraintProblem):
+    def __init__(self, **kwargs):
+        super().__init__(default_bvlen=3, **kwargs)
+        self.bs = [self.new_var(f"prof_b_{i}", 0) for i in range(3)]
+        self.v = self.new_var("prof_v")
+
+    def constraint_bits(self):
+        self.add_constraint(self.gen_total(self.bs) == 1)
+        self.constraint_v()
+
+    def constraint_v(self):
+        self.add_constraint(self.v < 2)
+        self.add_constraint(self.v != 0)
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+def test_profiler(solver_name, tmp_path):
+    profiler = Profiler()
+    problem = _Profiled(solver_name=solver_name, profiler=profiler)
+    problem.constraint_bits()
+    assert len(list(problem.solve(0))) == 3
+    report = profiler.report()
+    # Nested calls are left out of their callers
+    assert report['build']['constraint_v']['assertions'] == 2
+    assert report['build']['constraint_bits']['assertions'] == 1
+    assert report['build']['constraint_bits']['dag_size'] > 0 and report['build']['constraint_v']['dag_size'] > 0
+    spans = {e['name']: e for e in profiler.events if e['cat'] == 'build'}
+    assert report['build']['constraint_bits']['time'] == pytest.approx(
+        spans['constraint_bits']['duration'] - spans['constraint_v']['duration'])
+    assert report['assert'] == dict(report['assert'], calls=1, constraints=3)
+    assert report['check']['results'] == {'sat': 3, 'unsat': 1}
+    [solve] = report['solve']
+    assert solve['status'] == 'UNSAT' and solve['models'] == 3
+    assert isinstance(solve['statistics'], dict)
+
+    path = tmp_path / "trace.json"
+    profiler.write_chrome_trace(str(path))
+    events = json.load(open(path))['traceEvents']
+    assert {e['cat'] for e in events} == {'build', 'assert', 'check', 'solve'}
+    assert all(e['ph'] == 'X' and e['dur'] >= 0 for e in events)
+
+
+def _dump_problem(solver_name):
+    problem = SMTConstraintProblem(default_bvlen=3, solver_name=solver_name)
+    x = problem.new_var("dump_x")
+    b = problem.new_var("dump_b", 0)
+    n = problem.new_int_var("dump_n", 2, 5, 'order')
+    problem.add_constraint(fc.Implies(b, x == n.bv(3) + 1))
+    problem.add_constraint(x > 4)
+    problem.add_constraint(b | (n == 2))
+    return problem, x, b, n
+
+
+@pytest.mark.skipif(shutil.which('z3') is None, reason="needs the z3 executable")
+@pytest.mark.parametrize('solver_name', SOLVERS)
+def test_dump_smt2(solver_name, tmp_path):
+    problem, x, b, n = _dump_problem(solver_name)
+    # Models blocked by the enumeration are not part of the dump
+    assert len(list(problem.solve(0))) == 5
+    path, out = tmp_path / "p.smt2", tmp_path / "p.out"
+    problem.dump(str(path))
+    out.write_text(subprocess.run(['z3', str(path)], capture_output=True, text=True, check=True).stdout)
+    model = problem.load_model(str(out))
+    assert model[x.value] > 4
+    assert not model[b.value] or model[x.value] == model[n] + 1
+    assert model[b.value] or model[n] == 2
+    with problem.solve_context():
+        problem.add_constraint(x < 4)
+        problem.dump(str(path))
+    out.write_text(subprocess.run(['z3', str(path)], capture_output=True, text=True).stdout)
+    assert problem.load_model(str(out)) is None
+    with pytest.raises(ValueError):
+        problem.dump(str(path), format='cnf')
+
+
+@pytest.mark.parametrize('solver_name', ['sat', 'sat-bundled'])
+def test_dump_dimacs(solver_name, tmp_path):
+    problem, x, b, n = _dump_problem(solver_name)
+    list(problem.solve(0))
+    path, out = tmp_path / "p.cnf", tmp_path / "p.out"
+    problem.dump(str(path), format='dimacs')
+    solver = make_sat_solver('bundled')
+    lines = path.read_text().splitlines()
+    assert lines[0].startswith("c var ")
+    for line in lines:
+        if line[0] not in 'cp':
+            solver.add_clause([int(l) for l in line.split()[:-1]])
+    assert solver.solve()
+    out.write_text("s SATISFIABLE\nv " + " ".join(map(str, solver.get_model())) + " 0\n")
+    model = problem.load_model(str(out), format='dimacs')
+    assert model[x.value] > 4
+    assert not model[b.value] or model[x.value] == model[n] + 1
+    assert model[b.value] or model[n] == 2
+    out.write_text("s UNSATISFIABLE\n")
+    assert problem.load_model(str(out), format='dimacs') is None
+
+
+def test_dump_dimacs_unsupported(tmp_path):
+    problem, *_ = _dump_problem('z3')
+    with pytest.raises(ValueError):
+        problem.dump(str(tmp_path / "p.cnf"), format='dimacs')
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+def test_solve_arrays(solver_name):
+    problem = SMTConstraintProblem(default_bvlen=3, solver_name=solver_name)
+    bs = [problem.new_var(f"arr_b_{i}", 0) for i in range(2)]
+    v = problem.new_var("arr_v")
+    ns = [problem.new_int_var(f"arr_n_{e}", 1, 3, e) for e in ('onehot', 'order', 'log')]
+    problem.add_constraint(bs[0] | bs[1])
+    problem.add_constraint(v == ns[2].bv(3))
+    problem.add_constraint(ns[0] != ns[1])
+    layout = ModelLayout.grid([[bs[0], bs[1], None], [v] + ns[:2], [ns[2], v, None]])
+    expected = {
+        (b0, b1, -1, n2, n0, n1, n2, n2, -1)
+        for b0, b1 in it.product((0, 1), repeat=2) if b0 or b1
+        for n0, n1, n2 in it.product((1, 2, 3), repeat=3) if n0 != n1
+    }
+    with problem.solve_context():
+        grids = list(problem.solve_arrays(layout, 0))
+    assert all(g.shape == (3, 3) and g.dtype == np.int64 for g in grids)
+    assert {tuple(g.ravel().tolist()) for g in grids} == expected
+    assert len(grids) == len(expected)
+    models = list(problem.solve(0))
+    assert {tuple(layout.from_model(m).ravel().tolist()) for m in models} == expected
+    with pytest.raises(ValueError):
+        ModelLayout(bs, shape=(3,))
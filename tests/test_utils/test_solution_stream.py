@@ -0,0 +1,59 @@
+import random
+import pytest
+from logicpuzzles.utils.smt_utils import SMTConstraintProblem, SolveStatus
+from logicpuzzles.utils.solution_stream import SolutionStream
+from logicpuzzles.dominosa.dominosa import DominosaBoard
+from logicpuzzles.dominosa.dominosa_solver import DominosaSolver
+
+
+def _board():
+    # 6 solutions
+    random.seed(3)
+    return DominosaBoard(4)
+
+
+@pytest.mark.parametrize('solver_name', ['z3', 'sat'])
+def test_stream_pages(solver_name):
+    board = _board()
+    expected = sorted(map(sorted, DominosaSolver(board, solver_name=solver_name).solve(0)))
+    with SolutionStream.for_board(board, {'solver_name': solver_name}, maxsize=2) as stream:
+        pages = [stream.take(4), stream.take(4), stream.take(4)]
+        assert [len(p) for p in pages] == [4, 2, 0]
+        # The enumeration ran until no model was left
+        assert stream.done and stream.status == SolveStatus.UNSAT
+        assert stream.count == 6
+    assert sorted(sorted(s) for p in pages for s in p) == expected
+
+
+class _Pairs(SMTConstraintProblem):
+    def __init__(self, **kwargs):
+        super().__init__(default_bvlen=2, **kwargs)
+        self.x = self.new_var("pair_x")
+        self.y = self.new_var("pair_y")
+
+    def build(self):
+        self.add_constraint(self.x + self.y == 3)
+
+
+def test_stream_named():
+    # Problems that do not decode models send them keyed by var name
+    with SolutionStream(_Pairs, kwargs={'solver_name': 'sat'}) as stream:
+        sols = stream.take(5)
+    assert sorted((s['pair_x_2'], s['pair_y_2']) for s in sols) == [(0, 3), (1, 2), (2, 1), (3, 0)]
+
+
+def test_stream_cancel():
+    stream = DominosaSolver(_board(), solver_name='sat').solve_stream(maxsize=1)
+    assert len(next(stream)) == 10
+    stream.cancel()
+    assert stream.done and list(stream) == [] and stream.take(3) == []
+    stream.close()
+    assert stream._proc.exitcode is not None
+
+
+def test_stream_error():
+    stream = SolutionStream(DominosaSolver, (_board(),), {'solver_name': 'no-such-solver'})
+    with pytest.raises(RuntimeError, match="no-such-solver"):
+        stream.take(1)
+    assert stream.done
+    stream.close()
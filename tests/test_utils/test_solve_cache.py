@@ -0,0 +1,59 @@
+import random
+from logicpuzzles.board import grid_symmetries
+from logicpuzzles.utils.solve_cache import SolveCache
+from logicpuzzles.towers.towers import TowersBoard
+from logicpuzzles.towers.towers_solver import TowersSolver
+from logicpuzzles.dominosa.dominosa import DominosaBoard
+from logicpuzzles.flip.flip import FlipBoard
+
+
+def _visible(line):
+    seen, tallest = 0, 0
+    for h in line:
+        if h > tallest:
+            seen, tallest = seen + 1, h
+    return seen
+
+
+def test_solve_cache_towers(tmp_path):
+    random.seed(0)
+    path = str(tmp_path / "solutions.sqlite")
+    cache = SolveCache(path=path)
+    board = TowersBoard(4)
+    first = cache.solve(board, solver_name='sat')
+    assert len(first) == 1 and (cache.hits, cache.misses) == (0, 1)
+    assert cache.solve(board)[0].f[(0, 0)].val == first[0].f[(0, 0)].val
+    # Every rotation and reflection is a hit, mapped back onto the board as given
+    for sym in grid_symmetries(4, 4):
+        moved = TowersBoard(4, board.transformed_clues(sym))
+        solution = cache.solve(moved)[0]
+        grid = [[solution.f[(r, c)].val for c in range(4)] for r in range(4)]
+        cols = [[grid[r][c] for r in range(4)] for c in range(4)]
+        assert [_visible(col) for col in cols] == moved.clues['T']
+        assert [_visible(col[::-1]) for col in cols] == moved.clues['B']
+        assert [_visible(row) for row in grid] == moved.clues['L']
+        assert [_visible(row[::-1]) for row in grid] == moved.clues['R']
+    assert cache.misses == 1 and cache.hits == 1 + len(grid_symmetries(4, 4))
+    cache.close()
+
+    # The SQLite tier outlives the cache
+    cache = SolveCache(path=path)
+    cache.solve(board)
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert TowersSolver.cache_entry(board).key == TowersSolver.cache_entry(TowersBoard(4, board.clues)).key
+
+
+def test_solve_cache_lru():
+    random.seed(1)
+    cache = SolveCache(maxsize=2)
+    boards = [DominosaBoard(3), FlipBoard(3), FlipBoard(3)]
+    for board in boards:
+        cache.solve(board, solver_name='sat')
+    assert len(cache) == 2 and cache.misses == 3
+    # goal_value changes the solutions, so it is part of the key
+    cache.solve(boards[2], goal_value=1, solver_name='sat')
+    assert cache.misses == 4
+    cache.solve(boards[0])
+    assert cache.misses == 5
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,80 @@
+import itertools as it
+import random
+import pytest
+from logicpuzzles.utils.smt_utils import SMTConstraintProblem, SolveStatus
+from logicpuzzles.unruly.unruly import UnrulyBoard
+from logicpuzzles.unruly.unruly_solver import UnrulySolver
+from logicpuzzles.dominosa.dominosa import DominosaBoard
+from logicpuzzles.dominosa.dominosa_solver import DominosaSolver
+
+SOLVERS = ['z3', 'z3-native', 'sat', 'sat-bundled']
+
+
+def _key(solver, model):
+    return tuple(model[v] for v in solver.unique_vars)
+
+
+def _all_models(solver):
+    solver.ensure_built()
+    return sorted(_key(solver, m) for m in SMTConstraintProblem.solve(solver, 0))
+
+
+@pytest.mark.parametrize('solver_name', SOLVERS)
+@pytest.mark.parametrize('workers', [0, 2])
+def test_solve_parallel_dominosa(solver_name, workers):
+    random.seed(3)
+    board = DominosaBoard(4)
+    expected = _all_models(DominosaSolver(board, solver_name=solver_name))
+    solver = DominosaSolver(board, solver_name=solver_name)
+    models = [_key(solver, m) for m in solver.solve_parallel(workers=workers, depth=4)]
+    assert sorted(models) == expected
+    assert solver.status == SolveStatus.UNSAT and solver.enum_stats.models == len(expected)
+    assert [solver.board_from_model(m) for m in solver.solve_parallel(workers=0)]
+
+
+def test_solve_parallel_cube_vars():
+    random.seed(0)
+    board = UnrulyBoard(6, percent_filled=0.2)
+    expected = _all_models(UnrulySolver(board, solver_name='sat'))
+    solver = UnrulySolver(board, solver_name='sat')
+    first_row = [solver.f[(0, c)].var for c in range(board.nC)]
+    models = [_key(solver, m) for m in solver.solve_parallel(cube_vars=first_row, workers=2)]
+    assert len(expected) == 28 and sorted(models) == expected
+
+    solver = UnrulySolver(board, solver_name='sat')
+    assert len(list(solver.solve_parallel(1, workers=2))) == 1
+    assert solver.status == SolveStatus.SAT
+
+
+def test_solve_parallel_bad_cube_vars():
+    random.seed(0)
+    solver = DominosaSolver(DominosaBoard(4))
+    with pytest.raises(ValueError):
+        list(solver.solve_parallel(cube_vars=[solver.Bit(1)], workers=0))
+
+
+@pytest.mark.parametrize('int_encoding', [None, 'order', 'onehot'])
+def test_solve_parallel_default_cubes(int_encoding):
+    from logicpuzzles.towers.towers import TowersBoard
+    from logicpuzzles.towers.towers_solver import TowersSolver
+    # 6 solutions
+    random.seed(15)
+    board = TowersBoard(4)
+    kwargs = {} if int_encoding is None else {'int_encoding': int_encoding}
+    expected = _all_models(TowersSolver(board, solver_name='sat', **kwargs))
+    solver = TowersSolver(board, solver_name='sat', **kwargs)
+    # Bit-vector and IntVar cells are split on too, a bit of each of the first cells
+    names = {v.value: name for name, v in solver.var_registry.items()}
+    cube_bits = solver._default_cube_bits(names, 3)
+    assert len({name for name, _ in cube_bits}) == 3
+    cubes = solver._parallel_cubes(cube_bits, it.product((0, 1), repeat=3), 2, None, None, None)
+    assert sum(1 for models, _ in cubes if models) > 1
+    models = [_key(solver, m) for m in solver.solve_parallel(workers=2, depth=3)]
+    assert len(expected) == 6 and sorted(models) == expected
+
+
+def test_solve_parallel_no_default_cubes():
+    problem = SMTConstraintProblem()
+    problem.new_var("no_cube_x", is_unique=False)
+    with pytest.raises(ValueError, match="cube_vars"):
+        list(problem.solve_parallel(workers=0))